@@ -0,0 +1,73 @@
+"""Local SQLite cache of which member account each student's name resolves to.
+
+The same students re-enroll month after month, so the account picked for a
+name in the register-user dialog is saved here the first time. Later runs
+add that account directly instead of searching the name and sorting out
+look-alike accounts again. An entry is dropped or replaced as soon as the
+site disagrees with it: the add does not show up, or a search resolves the
+name to a different account.
+"""
+import sqlite3
+import threading
+import time
+
+from attendance import format_student_name, normalize_name
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS accounts (
+    name_key TEXT PRIMARY KEY,
+    account_id TEXT,
+    account_name TEXT NOT NULL,
+    resolved_at REAL NOT NULL
+);
+"""
+
+def account_key(student_name: str) -> str:
+    return normalize_name(format_student_name(student_name))
+
+class AccountCache:
+    """Resolved member accounts keyed by normalized student name"""
+
+    def __init__(self, path: str):
+        self.path = path
+        # Shared by the sessions of a parallel or pipelined run
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.executescript(SCHEMA)
+        self.stats = {"hits": 0, "lookups": 0, "invalidated": 0}
+
+    def get(self, student_name: str):
+        """The saved (account_id, account_name) of a student, or None"""
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT account_id, account_name FROM accounts WHERE name_key = ?", (account_key(student_name),)
+            ).fetchone()
+        return tuple(row) if row else None
+
+    def put(self, student_name: str, account_id: str, account_name: str):
+        """Save the account a lookup resolved the student to, replacing a different one"""
+        with self.lock, self.connection:
+            self.stats["lookups"] += 1
+            self.connection.execute(
+                "INSERT OR REPLACE INTO accounts (name_key, account_id, account_name, resolved_at) VALUES (?, ?, ?, ?)",
+                (account_key(student_name), account_id, account_name, time.time()),
+            )
+
+    def hit(self):
+        with self.lock:
+            self.stats["hits"] += 1
+
+    def forget(self, student_name: str):
+        with self.lock, self.connection:
+            self.stats["invalidated"] += 1
+            self.connection.execute("DELETE FROM accounts WHERE name_key = ?", (account_key(student_name),))
+
+    def print_summary(self):
+        if any(self.stats.values()):
+            print(f"\nMember accounts: {self.stats['hits']} added straight from the cache, "
+                  f"{self.stats['lookups']} looked up, {self.stats['invalidated']} cache entries dropped")
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
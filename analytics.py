@@ -0,0 +1,232 @@
+"""Multi-month attendance analytics over the saved rosters.
+
+Every saved class roster becomes a boolean matrix (students x class dates).
+The matrices of all classes and months are stacked into club-wide arrays, so
+attendance rate, retention and drop-off for every class and month come out
+of a handful of NumPy operations instead of per-student loops:
+
+    python main.py analyze
+    python main.py analyze --rule "rate < 0.5" --rule "trailing_absences >= 2"
+
+Months are lined up per program from the newest saved month back, in the
+order they were scraped. NumPy is only needed for this command.
+"""
+import json
+import operator
+import re
+
+from attendance import LOW_ATTENDANCE_THRESHOLD
+import planner
+
+try:
+    import numpy as np
+except ImportError:  # Only the analyze command needs it
+    np = None
+
+
+RULE_PATTERN = re.compile(r"^\s*(present|absent|rate|trailing_absences)\s*(<=|>=|<|>|==)\s*([0-9]*\.?[0-9]+)\s*$")
+RULE_OPERATORS = {"<": operator.lt, "<=": operator.le, ">": operator.gt, ">=": operator.ge, "==": operator.eq}
+DEFAULT_RULE = f"present < {LOW_ATTENDANCE_THRESHOLD}"
+
+class AttendanceMatrix:
+    """Club attendance as stacked boolean arrays.
+
+    present  (classes, months, students, dates)  checkbox ticked
+    enrolled (classes, months, students)         on the class roster that month
+    dated    (classes, months, dates)            the class met on that date column
+    """
+
+    def __init__(self, classes: list, names: list, present, enrolled, dated):
+        self.classes = classes  # (program_name, day_name) per class row
+        self.names = names      # student name per student column
+        self.present = present
+        self.enrolled = enrolled
+        self.dated = dated
+
+    @classmethod
+    def from_snapshots(cls, snapshots: list):
+        """Stack saved rosters (as returned by SnapshotStore.all_snapshots) into matrices"""
+        # Order each program's months by when they were first scraped
+        months_by_program = {}
+        for snapshot in snapshots:
+            sessions = months_by_program.setdefault(snapshot["program_id"], {})
+            sessions.setdefault(snapshot["session_id"], snapshot["scraped_at"])
+        month_count = max((len(sessions) for sessions in months_by_program.values()), default=0)
+        month_index = {}
+        for program_id, sessions in months_by_program.items():
+            ordered = sorted(sessions, key=sessions.get)
+            # Line the newest month of every program up with the last column
+            for position, session_id in enumerate(ordered):
+                month_index[(program_id, session_id)] = month_count - len(ordered) + position
+
+        classes = {}
+        names = {}
+        date_count = 1
+        for snapshot in snapshots:
+            classes.setdefault((snapshot["program_name"], snapshot["day_name"]), len(classes))
+            for student in snapshot["roster"]["students"]:
+                names.setdefault(student["name"], len(names))
+                date_count = max(date_count, len(student["dates"]))
+
+        shape = (len(classes), month_count, len(names))
+        present = np.zeros(shape + (date_count,), dtype=bool)
+        enrolled = np.zeros(shape, dtype=bool)
+        dated = np.zeros((len(classes), month_count, date_count), dtype=bool)
+        for snapshot in snapshots:
+            c = classes[(snapshot["program_name"], snapshot["day_name"])]
+            m = month_index[(snapshot["program_id"], snapshot["session_id"])]
+            for student in snapshot["roster"]["students"]:
+                s = names[student["name"]]
+                enrolled[c, m, s] = True
+                present[c, m, s, :len(student["dates"])] = student["dates"]
+                dated[c, m, :len(student["dates"])] = True
+        return cls(list(classes), list(names), present, enrolled, dated)
+
+    def present_counts(self):
+        return self.present.sum(axis=-1)
+
+    def session_counts(self):
+        """Class dates per class and month, broadcast to (classes, months, 1)"""
+        return self.dated.sum(axis=-1)[..., None]
+
+    def metric(self, name: str):
+        """A per-student metric of shape (classes, months, students)"""
+        present = self.present_counts()
+        sessions = self.session_counts()
+        if name == "present":
+            return present
+        if name == "absent":
+            return sessions - present
+        if name == "rate":
+            return np.divide(present, sessions, out=np.zeros(present.shape), where=sessions > 0)
+        if name == "trailing_absences":
+            # Dates after the last ticked checkbox; the dates of a class fill the leftmost columns
+            date_count = self.present.shape[-1]
+            last_present = np.where(self.present.any(axis=-1),
+                                    date_count - 1 - np.argmax(self.present[..., ::-1], axis=-1), -1)
+            return sessions - (last_present + 1)
+        raise ValueError(f"Unknown attendance metric: {name}")
+
+    def flagged(self, rules: list):
+        """Enrolled students matching any of the rules, e.g. 'present < 3' or 'rate <= 0.5'"""
+        matched = np.zeros(self.enrolled.shape, dtype=bool)
+        for rule in rules:
+            metric, op, value = parse_rule(rule)
+            matched |= RULE_OPERATORS[op](self.metric(metric), value)
+        return matched & self.enrolled
+
+    def attendance_rates(self):
+        """Share of checkboxes ticked per class and month (NaN where a class has no roster that month)"""
+        possible = self.enrolled.sum(axis=-1) * self.dated.sum(axis=-1)
+        ticked = (self.present & self.enrolled[..., None]).sum(axis=(-1, -2))
+        return np.divide(ticked, possible, out=np.full(possible.shape, np.nan), where=possible > 0)
+
+    def retention(self):
+        """(retained, previous) per class for each month to the next, shape (classes, months - 1)"""
+        both_months = self.enrolled.any(axis=-1)
+        compared = (both_months[:, :-1] & both_months[:, 1:])[..., None]
+        previous = (self.enrolled[:, :-1] & compared).sum(axis=-1)
+        retained = (self.enrolled[:, :-1] & self.enrolled[:, 1:]).sum(axis=-1)
+        return retained, previous
+
+    def club_retention(self):
+        """(retained, previous, dropped student columns) club-wide for each month to the next"""
+        club = self.enrolled.any(axis=0)
+        stayed = club[:-1] & club[1:]
+        dropped = club[:-1] & ~club[1:]
+        return stayed.sum(axis=-1), club[:-1].sum(axis=-1), dropped
+
+    def save(self, path: str):
+        """Write the matrices bit-packed to a compressed .npz file"""
+        np.savez_compressed(
+            path,
+            present=np.packbits(self.present, axis=-1), enrolled=np.packbits(self.enrolled, axis=-1),
+            dated=np.packbits(self.dated, axis=-1), shape=np.array(self.present.shape),
+            classes=np.array(json.dumps(self.classes)), names=np.array(json.dumps(self.names)),
+        )
+
+def parse_rule(rule: str) -> tuple:
+    match = RULE_PATTERN.match(rule)
+    if not match:
+        raise ValueError(f"Rules look like 'present < 3', 'absent >= 2', 'rate < 0.5' or 'trailing_absences >= 2', not {rule!r}")
+    return match.group(1), match.group(2), float(match.group(3))
+
+def month_label(month: int, month_count: int) -> str:
+    back = month_count - 1 - month
+    return "latest" if back == 0 else f"latest-{back}"
+
+def build_report(matrix: AttendanceMatrix, rules: list) -> dict:
+    """Per-class rates and flags, per-class and club retention, and who dropped off"""
+    month_count = matrix.enrolled.shape[1]
+    rates = matrix.attendance_rates()
+    flagged = matrix.flagged(rules)
+    present = matrix.present_counts()
+    retained, previous = matrix.retention()
+    club_retained, club_previous, dropped = matrix.club_retention()
+    report = {"rules": rules, "classes": [], "club": []}
+    for c, (program_name, day_name) in enumerate(matrix.classes):
+        months = []
+        for m in range(month_count):
+            if not matrix.enrolled[c, m].any():
+                continue
+            entry = {
+                "month": month_label(m, month_count),
+                "students": int(matrix.enrolled[c, m].sum()),
+                "attendance_rate": round(float(rates[c, m]), 3),
+                "flagged": [{"name": matrix.names[s], "present": int(present[c, m, s])} for s in np.flatnonzero(flagged[c, m])],
+            }
+            if m > 0 and previous[c, m - 1]:
+                entry["retention"] = round(float(retained[c, m - 1] / previous[c, m - 1]), 3)
+            months.append(entry)
+        report["classes"].append({"program": program_name, "day": day_name, "months": months})
+    for m in range(month_count - 1):
+        report["club"].append({
+            "from": month_label(m, month_count),
+            "to": month_label(m + 1, month_count),
+            "students": int(club_previous[m]),
+            "retained": int(club_retained[m]),
+            "retention": round(float(club_retained[m] / club_previous[m]), 3) if club_previous[m] else None,
+            "dropped": [matrix.names[s] for s in np.flatnonzero(dropped[m])],
+        })
+    return report
+
+def print_report(report: dict):
+    print(f"\n=== Attendance by Class ({' or '.join(report['rules'])} flagged) ===")
+    for entry in report["classes"]:
+        print(f"\n{entry['program']} - {entry['day']}:")
+        for month in entry["months"]:
+            retention = f", retention {month['retention']:.0%}" if "retention" in month else ""
+            print(f"  {month['month']}: {month['students']} students, attendance {month['attendance_rate']:.0%}{retention}")
+            for student in month["flagged"]:
+                print(f"    ⚠️  {student['name']} ({student['present']} present)")
+    if report["club"]:
+        print("\n=== Club Retention ===")
+        for step in report["club"]:
+            retention = f"{step['retention']:.0%}" if step["retention"] is not None else "n/a"
+            print(f"  {step['from']} -> {step['to']}: {step['retained']} of {step['students']} stayed ({retention})")
+            for name in step["dropped"]:
+                print(f"    Dropped off: {name}")
+
+def run_analyze(args):
+    if np is None:
+        print("The analyze command needs NumPy: pip install numpy")
+        return
+    rules = args.rule or [DEFAULT_RULE]
+    try:
+        for rule in rules:
+            parse_rule(rule)
+    except ValueError as e:
+        print(str(e))
+        return
+    snapshots = planner.load_snapshots(args.store, args.snapshots)
+    if not snapshots:
+        print("No saved attendance found. Run `python main.py scrape` first.")
+        return
+    matrix = AttendanceMatrix.from_snapshots(snapshots)
+    report = build_report(matrix, rules)
+    print_report(report)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as report_json:
+            json.dump(report, report_json, indent=2)
+    if args.save_matrix:
+        matrix.save(args.save_matrix)
@@ -0,0 +1,307 @@
+"""Roster parsing and name helpers shared by the browser and HTTP engines.
+
+Nothing in here talks to Selenium, so it can be used to work on scraped
+attendance data without starting a browser.
+"""
+from html.parser import HTMLParser
+import csv
+import hashlib
+import os
+
+
+# Helper to normalize and expand day names
+DAY_ALIASES = {
+    'mon': 'monday', 'monday': 'monday',
+    'tue': 'tuesday', 'tues': 'tuesday', 'tuesday': 'tuesday',
+    'wed': 'wednesday', 'weds': 'wednesday', 'wednesday': 'wednesday',
+    'thu': 'thursday', 'thurs': 'thursday', 'thursday': 'thursday',
+    'fri': 'friday', 'friday': 'friday',
+    'sat': 'saturday', 'saturday': 'saturday',
+    'sun': 'sunday', 'sunday': 'sunday',
+}
+def normalize_days(day_field):
+    days = set()
+    if not day_field:
+        return days
+    for part in day_field.lower().replace('/', ',').replace('&', ',').split(','):
+        part = part.strip()
+        for alias, norm in DAY_ALIASES.items():
+            if part.startswith(alias):
+                days.add(norm)
+    return days
+
+def normalize_name(name):
+    return ' '.join(name.strip().lower().split())
+
+# Students with fewer present checkboxes than this are flagged as low attendance
+LOW_ATTENDANCE_THRESHOLD = 3
+
+# Section header rows of the special enrollment sheet (e.g., 'Jr. Beginning Picklball')
+SPECIAL_ENROLLMENT_SECTION_WORDS = ('jr.', 'tots', 'foundations', 'competition', 'training', 'tournament')
+
+def special_enrollment_key(name: str) -> str:
+    """Normalized 'first last' key of a name written as 'Last, First' or 'First Last'"""
+    return normalize_name(format_student_name(name))
+
+def add_special_enrollment_row(index: dict, row: list):
+    name = row[0].strip() if row else ''
+    # Ignore empty, whitespace, or section header rows
+    if not name or any(word in name.lower() for word in SPECIAL_ENROLLMENT_SECTION_WORDS):
+        return
+    index.setdefault(special_enrollment_key(name), []).append({
+        "name": name,
+        "days": sorted(normalize_days(row[1] if len(row) > 1 else '')),
+        "comment": row[2].strip() if len(row) > 2 else '',
+    })
+
+def load_special_enrollment_index(csv_path='special_enrollment.csv', txt_path='special_enrollment.txt') -> dict:
+    """Map each normalized name on the special enrollment sheet to its rows (name, days, comment)"""
+    index = {}
+    try:
+        with open(csv_path, newline='', encoding='utf-8') as csvfile:
+            for row in csv.reader(csvfile):
+                add_special_enrollment_row(index, row)
+    except Exception:
+        try:
+            with open(txt_path, encoding='utf-8') as txtfile:
+                for line in txtfile:
+                    add_special_enrollment_row(index, line.strip().split(','))
+        except Exception:
+            pass
+    return index
+
+# Parsed special enrollment sheets, keyed by the files' paths and modification times
+SPECIAL_ENROLLMENT_CACHE = {}
+
+def file_stamp(path: str):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+def special_enrollment_index(csv_path='special_enrollment.csv', txt_path='special_enrollment.txt') -> dict:
+    """The special enrollment index, read on first use and again only when a file changes"""
+    key = (csv_path, file_stamp(csv_path), txt_path, file_stamp(txt_path))
+    index = SPECIAL_ENROLLMENT_CACHE.get(key)
+    if index is None:
+        index = load_special_enrollment_index(csv_path, txt_path)
+        SPECIAL_ENROLLMENT_CACHE[key] = index
+    return index
+
+def match_special_enrollment(index: dict, student_name: str, day_name: str):
+    """The sheet row that applies to a student in a class on day_name, or None.
+
+    Rows without a day apply to every class; rows with days only to classes on those days.
+    """
+    class_days = normalize_days(day_name)
+    for entry in index.get(special_enrollment_key(student_name), ()):
+        if not entry["days"] or not class_days or class_days.intersection(entry["days"]):
+            return entry
+    return None
+
+def format_student_name(name: str) -> str:
+    """Turn 'LastName, FirstName' into 'FirstName LastName'; other names are returned as is"""
+    if ',' in name:
+        last_name, first_name = [x.strip() for x in name.split(",", 1)]
+        return f"{first_name} {last_name}"
+    return name.strip()
+
+def parse_attendance_rows(rows: list) -> dict:
+    """Split raw attendance rows into enrolled students, waitlist and make-ups"""
+    roster = {"students": [], "waitlist": [], "makeup": []}
+    section = "students"
+    for row in rows:
+        cls = row.get("cls") or ""
+        # Separator rows switch the section the following rows belong to
+        if "separator" in cls:
+            separator_text = row.get("separator") or ""
+            if "Waitlisted" in separator_text:
+                section = "waitlist"
+            elif "Make-up" in separator_text:
+                section = "makeup"
+            continue
+        if not row.get("cells") or not row.get("name"):
+            continue
+        try:
+            last_name, first_name = row["name"].split(", ")
+        except ValueError:
+            continue  # Silently skip rows without a 'Last, First' name
+        current_name = f"{first_name} {last_name}"
+        if section != "students":
+            roster[section].append(current_name)
+            continue
+        dates = row.get("dates") or []
+        roster["students"].append({
+            "name": current_name,
+            "phone": row.get("phone") or "No phone number available",
+            "present_count": sum(1 for present in dates if present),
+            "dates": list(dates),
+        })
+    return roster
+
+def roster_name_set(rows: list) -> set:
+    """Normalized 'first last' names of every row on an attendance table, in any section"""
+    return {normalize_name(format_student_name(row["name"])) for row in rows if row.get("name")}
+
+def roster_fingerprint(roster_names: set) -> str:
+    """Row count and hash of a class roster's names; it changes whenever someone joins or leaves"""
+    digest = hashlib.sha1("\n".join(sorted(roster_names)).encode("utf-8")).hexdigest()[:16]
+    return f"{len(roster_names)}:{digest}"
+
+def plan_registrations(previous_names: list, roster_names: set, skip=()) -> tuple:
+    """Diff last month's names against the class's current roster index.
+
+    Returns (to_register, already_registered); names in skip are left out of both.
+    """
+    skip = {normalize_name(format_student_name(name)) for name in skip}
+    to_register = []
+    already_registered = []
+    for name in previous_names:
+        key = normalize_name(format_student_name(name))
+        if key in skip:
+            continue
+        if key in roster_names:
+            already_registered.append(name)
+        else:
+            to_register.append(name)
+    return to_register, already_registered
+
+def summarize_attendance(roster: dict, program_name: str, day_name: str) -> tuple:
+    """Print the attendance alerts for a roster and return names and waitlisted students"""
+    names = [student["name"] for student in roster["students"]]
+    waitlist_names = list(roster["waitlist"])
+    low_attendance_students = [student for student in roster["students"] if student["present_count"] < LOW_ATTENDANCE_THRESHOLD]
+
+    if waitlist_names:
+        print(f"\n⚠️  Scheduler Alert: {len(waitlist_names)} student(s) on waitlist for {program_name} - {day_name}")
+        print("   Consider enrolling them if there is space available.")
+
+    # Print attendance summary
+    if names:
+        print(f"\n{program_name} - {day_name}:")
+        for name in names:
+            print(f"  {name}")
+
+    # Alert about low attendance students
+    if low_attendance_students:
+        print(f"\n⚠️  Scheduler Alert: {len(low_attendance_students)} student(s) with low attendance in {program_name} - {day_name}")
+        for student in low_attendance_students:
+            print(f"\n  Student: {student['name']}")
+            print(f"  Phone: {student['phone']}")
+            print(f"  Present: {student['present_count']} out of 4 sessions")
+            response = 'n'  # Automatically skip re-enrollment prompts
+            if response.lower() == 'y':
+                print(f"  ✓ Added to re-enrollment list: {student['name']}")
+                names.append(student['name'])
+
+    return names, waitlist_names
+
+
+VOID_TAGS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "source", "track", "wbr"}
+
+class AttendanceTableParser(HTMLParser):
+    """Collect #table-body rows from an attendance page in the same shape as ATTENDANCE_TABLE_SCRIPT"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.rows = []
+        self.stack = []      # (tag, classes) of the open elements
+        self.body_depth = None
+        self.row = None
+        self.captures = {}   # field name -> stack depth its text is read until
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        classes = (attrs.get("class") or "").split()
+        if tag not in VOID_TAGS:
+            self.stack.append((tag, classes))
+        depth = len(self.stack)
+        if attrs.get("id") == "table-body":
+            self.body_depth = depth
+            return
+        if self.body_depth is None:
+            return
+        if tag == "tr":
+            self.row = {"cls": attrs.get("class") or "", "cells": 0, "separator": None,
+                        "name": None, "phone": None, "dates": []}
+            self.rows.append(self.row)
+            return
+        if self.row is None:
+            return
+        if tag == "td":
+            self.row["cells"] += 1
+            if "separator" in classes and self.row["separator"] is None:
+                self._capture("separator", depth)
+        elif tag == "a" and "checkbox" in classes and self._inside("td", "date"):
+            self.row["dates"].append("active" in classes)
+        elif tag == "a" and self.row["name"] is None and self._inside(None, "second-col"):
+            self._capture("name", depth)
+        if "staff-phone" in classes and self.row["phone"] is None:
+            self._capture("phone", depth)
+
+    def handle_endtag(self, tag):
+        # Pop up to the matching tag so unclosed cells do not derail the parse
+        for index in range(len(self.stack) - 1, -1, -1):
+            if self.stack[index][0] == tag:
+                break
+        else:
+            return
+        while len(self.stack) > index:
+            depth = len(self.stack)
+            for field, field_depth in list(self.captures.items()):
+                if field_depth == depth:
+                    self.row[field] = self.row[field].strip()
+                    del self.captures[field]
+            popped, _ = self.stack.pop()
+            if popped == "tr" and self.body_depth is not None:
+                self.row = None
+            if self.body_depth is not None and depth == self.body_depth:
+                self.body_depth = None
+
+    def handle_data(self, data):
+        for field in self.captures:
+            self.row[field] += data
+
+    def _capture(self, field, depth):
+        self.row[field] = ""
+        self.captures[field] = depth
+
+    def _inside(self, tag, cls):
+        return any((tag is None or t == tag) and cls in classes for t, classes in self.stack)
+
+def parse_attendance_html(html: str) -> list:
+    """Return the raw attendance rows found in an attendance page or fragment"""
+    parser = AttendanceTableParser()
+    parser.feed(html)
+    parser.close()
+    return parser.rows
+
+class TreeLinkParser(HTMLParser):
+    """Collect (id, text) pairs for links whose id starts with a prefix"""
+
+    def __init__(self, prefix: str):
+        super().__init__(convert_charrefs=True)
+        self.prefix = prefix
+        self.links = []
+        self.current = None
+
+    def handle_starttag(self, tag, attrs):
+        link_id = dict(attrs).get("id") or ""
+        if tag == "a" and link_id.startswith(self.prefix):
+            self.current = [link_id[len(self.prefix):], ""]
+            self.links.append(self.current)
+
+    def handle_endtag(self, tag):
+        if tag == "a":
+            self.current = None
+
+    def handle_data(self, data):
+        if self.current is not None:
+            self.current[1] += data
+
+def parse_tree_links(html: str, prefix: str) -> list:
+    """Return (id, name) for every 'row_program_'/'row_session_'/'row_day_' style link"""
+    parser = TreeLinkParser(prefix)
+    parser.feed(html)
+    parser.close()
+    return [(link_id, ' '.join(text.split())) for link_id, text in parser.links]
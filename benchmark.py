@@ -0,0 +1,130 @@
+"""Time full runs against a local mock club.
+
+Starts mock_clubautomation.py in-process with synthetic clubs of 10, 100 and
+1000 students (by default), runs process_programs against each, and reports
+wall time per run, per class scraped, per class registered and per student
+added. Use it to check performance changes on a plain Linux box:
+
+    python benchmark.py --latency 0.02
+    python benchmark.py --engine browser --headless --sizes 10
+"""
+from contextlib import redirect_stdout
+import argparse
+import io
+import json
+import statistics
+import time
+
+import main
+from mock_clubautomation import make_club, start_server
+
+
+class TimedEngine:
+    """Wraps an engine and records how long each class takes to scrape and to register"""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.scrape_times = []
+        self.register_times = []
+        self.students_added = 0
+        self.class_started = None
+
+    def __getattr__(self, name):
+        return getattr(self.engine, name)
+
+    def read_attendance(self, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return self.engine.read_attendance(*args, **kwargs)
+        finally:
+            self.scrape_times.append(time.perf_counter() - started)
+
+    def open_class(self, *args, **kwargs):
+        self.class_started = time.perf_counter()
+        return self.engine.open_class(*args, **kwargs)
+
+    def register_students(self, student_names, *args, **kwargs):
+        results = self.engine.register_students(student_names, *args, **kwargs)
+        self.students_added += len(student_names)
+        if self.class_started is not None:
+            self.register_times.append(time.perf_counter() - self.class_started)
+            self.class_started = None
+        return results
+
+def club_for(size: int, class_size: int, days: int) -> dict:
+    """A synthetic club with about `size` students last month, `class_size` per class"""
+    class_size = min(class_size, max(1, size // days))
+    programs = max(1, round(size / (class_size * days)))
+    return make_club(programs=programs, students=class_size, days=("Monday", "Wednesday", "Friday")[:days])
+
+def make_engine(args, base_url: str):
+    if args.engine == "http":
+        from http_engine import HttpEngine
+        engine = HttpEngine(base_url)
+        engine.login("bench", "bench")
+        return engine
+    import browser
+    driver = browser.create_driver(browser.resolve_driver_path(), headless=args.headless, lean=args.lean)
+    browser.login(driver, reuse_session=False, base_url=base_url)
+    # Re-logins and deep links have to go to the mock too, never to the live site or its saved cookies
+    return browser.SeleniumEngine(driver, base_url=base_url, reuse_session=False)
+
+def run_size(args, size: int) -> dict:
+    club = club_for(size, args.class_size, args.days)
+    students = sum(len(day["students"]) for program in club["programs"] for day in program["sessions"][-2]["days"])
+    server, base_url = start_server(club, latency=args.latency)
+    try:
+        # Keep the run's own output out of the report
+        with redirect_stdout(io.StringIO()):
+            engine = TimedEngine(make_engine(args, base_url))
+            started = time.perf_counter()
+            try:
+                _, failures = main.process_programs(engine, summary=False)
+            finally:
+                run_time = time.perf_counter() - started
+                engine.close()
+    finally:
+        server.shutdown()
+
+    def ms(values, stat):
+        return round(stat(values) * 1000, 1) if values else None
+
+    return {
+        "students": students,
+        "classes": len(engine.scrape_times),
+        "run_s": round(run_time, 3),
+        "scrape_class_ms_p50": ms(engine.scrape_times, statistics.median),
+        "register_class_ms_p50": ms(engine.register_times, statistics.median),
+        "per_student_ms": round(sum(engine.register_times) * 1000 / engine.students_added, 1) if engine.students_added else None,
+        "students_added": engine.students_added,
+        "failures": len(failures),
+    }
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark full runs against a local mock club")
+    parser.add_argument("--engine", choices=["http", "browser"], default="http")
+    parser.add_argument("--headless", action="store_true", help="run Chrome without a window (browser engine)")
+    parser.add_argument("--lean", action="store_true", help="use the lean Chrome profile (browser engine)")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000],
+                        help="club sizes in students (default: 10 100 1000)")
+    parser.add_argument("--class-size", type=int, default=10, help="students per class (default: 10)")
+    parser.add_argument("--days", type=int, default=2, choices=[1, 2, 3], help="class days per program (default: 2)")
+    parser.add_argument("--latency", type=float, default=0, help="average seconds the mock adds per response")
+    parser.add_argument("--json", default=None, help="also write the results to this file")
+    return parser.parse_args(argv)
+
+def bench_main(argv=None):
+    args = parse_args(argv)
+    results = []
+    print(f"{'students':>8} {'classes':>7} {'run s':>8} {'scrape/class ms':>16} {'register/class ms':>18} {'per student ms':>15} {'failures':>8}")
+    for size in args.sizes:
+        result = run_size(args, size)
+        results.append(result)
+        print(f"{result['students']:>8} {result['classes']:>7} {result['run_s']:>8} {str(result['scrape_class_ms_p50']):>16} "
+              f"{str(result['register_class_ms_p50']):>18} {str(result['per_student_ms']):>15} {result['failures']:>8}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as results_json:
+            json.dump({"engine": args.engine, "latency": args.latency, "results": results}, results_json, indent=2)
+
+if __name__ == "__main__":
+    bench_main()
@@ -0,0 +1,1000 @@
+"""Selenium side of the tool: waits, the program tree clicks, the attendance
+table reads, the register-user dialog, and Chrome startup and login.
+
+Only imported when a run uses the browser engine, so the other commands start
+without loading Selenium.
+"""
+from selenium import webdriver
+from selenium.webdriver.chrome.service import Service
+from selenium.webdriver.chrome.options import Options
+from webdriver_manager.chrome import ChromeDriverManager
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.common.exceptions import (
+    TimeoutException, WebDriverException, SessionNotCreatedException,
+    StaleElementReferenceException,
+)
+from urllib.parse import urlparse
+import json
+import re
+import threading
+import os
+
+try:
+    import psutil
+except ImportError:  # Browser memory is then read from /proc, where there is one
+    psutil = None
+
+from attendance import format_student_name, normalize_name, parse_attendance_rows, roster_name_set
+from settings import BASE_URL, AVAC_USERNAME, AVAC_PASSWORD, START_PATH, ATTENDANCE_LINK_PATH
+from governor import governed
+from retries import (
+    ACCOUNT_NOT_FOUND, AMBIGUOUS_ACCOUNT, ERROR, NOT_ADDED, SESSION_EXPIRED, STALE_ELEMENT, TIMEOUT,
+    with_retries,
+)
+from spans import TRACER, span, traced
+
+
+@traced("wait_and_click")
+def wait_and_click(driver, by, value, timeout=None):
+    """Wait for element to be clickable and click it"""
+    timeout = timeout or WAIT_TIMEOUTS["click"]
+    try:
+        # Wait for element to be clickable
+        element = WebDriverWait(driver, timeout).until(
+            EC.element_to_be_clickable((by, value))
+        )
+        # Scroll element into view (instant, so no delay is needed)
+        driver.execute_script("arguments[0].scrollIntoView({block: 'center', behavior: 'instant'});", element)
+        
+        # Try regular click first
+        try:
+            element.click()
+        except WebDriverException:
+            # If regular click fails (covered, or intercepted), try JavaScript click
+            try:
+                driver.execute_script("arguments[0].click();", element)
+            except WebDriverException:
+                # If both fail, try to refresh the element and click again
+                element = WebDriverWait(driver, timeout).until(
+                    EC.element_to_be_clickable((by, value))
+                )
+                driver.execute_script("arguments[0].click();", element)
+        # Let the ajax request started by the click finish
+        wait_for_ajax(driver)
+        return True
+    except Exception as e:
+        print(f"Error clicking element {value}: {str(e)}")
+        return False
+
+def wait_for_element(driver, by, value, timeout=10):
+    """Wait for element to be present"""
+    try:
+        element = WebDriverWait(driver, timeout).until(
+            EC.presence_of_element_located((by, value))
+        )
+        return element
+    except TimeoutException:
+        print(f"Timeout waiting for element: {value}")
+        return None
+
+def wait_for_element_visible(driver, by, value, timeout=10):
+    """Wait for element to be visible"""
+    try:
+        element = WebDriverWait(driver, timeout).until(
+            EC.visibility_of_element_located((by, value))
+        )
+        return element
+    except TimeoutException:
+        print(f"Timeout waiting for element to be visible: {value}")
+        return None
+
+# Per-step timeouts (seconds) for the readiness waits below
+WAIT_TIMEOUTS = {
+    "click": 10,
+    "ajax": 10,
+    "settle": 5,
+    "autocomplete": 5,
+    "row": 5,
+}
+
+# Counts the page's in-flight XHR/fetch requests; installed once per page load
+REQUEST_TRACKER_SCRIPT = """
+if (!window.__avacPending) {
+    window.__avacPending = {count: 0};
+    var pending = window.__avacPending;
+    var send = XMLHttpRequest.prototype.send;
+    XMLHttpRequest.prototype.send = function () {
+        pending.count++;
+        this.addEventListener('loadend', function () {
+            pending.count--;
+            if (this.status === 401 || this.status === 403) { pending.authFailed = true; }
+        });
+        return send.apply(this, arguments);
+    };
+    if (window.fetch) {
+        var originalFetch = window.fetch;
+        window.fetch = function () {
+            pending.count++;
+            return originalFetch.apply(this, arguments).then(function (response) {
+                if (response.status === 401 || response.status === 403) { pending.authFailed = true; }
+                return response;
+            }).finally(function () { pending.count--; });
+        };
+    }
+}
+"""
+
+AJAX_IDLE_SCRIPT = """
+if (document.readyState === 'loading') { return false; }
+if (window.jQuery && window.jQuery.active > 0) { return false; }
+return !window.__avacPending || window.__avacPending.count <= 0;
+"""
+
+# Set by the request tracker once the site refuses a request for want of a login
+AUTH_FAILED_SCRIPT = "return !!(window.__avacPending && window.__avacPending.authFailed);"
+
+# Records the time of the last DOM change under an element
+MUTATION_WATCH_SCRIPT = """
+var el = arguments[0];
+if (!el.__avacObserver) {
+    el.__avacLastMutation = Date.now();
+    el.__avacObserver = new MutationObserver(function () { el.__avacLastMutation = Date.now(); });
+    el.__avacObserver.observe(el, {childList: true, subtree: true, attributes: true, characterData: true});
+}
+return Date.now() - el.__avacLastMutation;
+"""
+
+ROW_PRESENT_SCRIPT = """
+var wanted = arguments[0];
+var normalize = function (name) {
+    name = name.trim();
+    if (name.indexOf(',') >= 0) {
+        var parts = name.split(',');
+        name = parts.slice(1).join(',').trim() + ' ' + parts[0].trim();
+    }
+    return name.toLowerCase().split(/\\s+/).join(' ');
+};
+var links = document.querySelectorAll('#table-body .second-col a');
+for (var i = 0; i < links.length; i++) {
+    if (normalize(links[i].textContent) === wanted) { return true; }
+}
+return false;
+"""
+
+@traced("wait_for_ajax")
+def wait_for_ajax(driver, timeout=None) -> bool:
+    """Wait until the page has no pending jQuery/XHR/fetch requests"""
+    try:
+        driver.execute_script(REQUEST_TRACKER_SCRIPT)
+        WebDriverWait(driver, timeout or WAIT_TIMEOUTS["ajax"], poll_frequency=0.05).until(
+            lambda d: d.execute_script(AJAX_IDLE_SCRIPT)
+        )
+        return True
+    except TimeoutException:
+        print("Timeout waiting for page requests to finish")
+        return False
+    except WebDriverException:
+        return False
+
+@traced("wait_for_dom_settled")
+def wait_for_dom_settled(driver, by, value, quiet_ms=150, timeout=None) -> bool:
+    """Wait until the element has had no DOM mutations for quiet_ms"""
+    try:
+        element = WebDriverWait(driver, timeout or WAIT_TIMEOUTS["settle"]).until(
+            EC.presence_of_element_located((by, value))
+        )
+        WebDriverWait(driver, timeout or WAIT_TIMEOUTS["settle"], poll_frequency=0.05).until(
+            lambda d: d.execute_script(MUTATION_WATCH_SCRIPT, element) >= quiet_ms
+        )
+        return True
+    except TimeoutException:
+        print(f"Timeout waiting for {value} to settle")
+        return False
+    except WebDriverException:
+        return False
+
+@traced("wait_for_row")
+def wait_for_row(driver, student_name: str, timeout=None) -> bool:
+    """Wait until the attendance table lists the student (either name order)"""
+    try:
+        WebDriverWait(driver, timeout or WAIT_TIMEOUTS["row"], poll_frequency=0.1).until(
+            lambda d: d.execute_script(ROW_PRESENT_SCRIPT, normalize_name(format_student_name(student_name)))
+        )
+        return True
+    except (TimeoutException, WebDriverException):
+        return False
+
+@traced("select_program")
+def select_program(driver, program_id):
+    """Select a program by its ID"""
+    program_link = f"row_program_{program_id}"
+    try:
+        # First check if the program is already selected
+        element = WebDriverWait(driver, 5).until(
+            EC.presence_of_element_located((By.ID, program_link))
+        )
+        if "selected_row" in element.get_attribute("class"):
+            return True
+        return wait_and_click(driver, By.ID, program_link)
+    except TimeoutException:
+        return False
+
+@traced("select_session")
+def select_session(driver, session_id):
+    """Select a session by its ID"""
+    session_link = f"row_session_{session_id}"
+    return wait_and_click(driver, By.ID, session_link)
+
+@traced("select_day")
+def select_day(driver, day_id):
+    """Select a day by its ID"""
+    day_link = f"row_day_{day_id}"
+    return wait_and_click(driver, By.ID, day_link)
+
+@traced("read_class_rows")
+def read_class_rows(driver) -> list:
+    """The raw rows of the open attendance table (none if it did not load)"""
+    try:
+        table_body = WebDriverWait(driver, WAIT_TIMEOUTS["ajax"]).until(
+            EC.presence_of_element_located((By.CSS_SELECTOR, ".attendance_container.attendance_table_container #table-body"))
+        )
+    except TimeoutException:
+        return []
+    return read_attendance_rows(driver, table_body)
+
+def read_roster_names(driver) -> set:
+    """Build the normalized-name index of everyone on the open attendance table"""
+    return roster_name_set(read_class_rows(driver))
+
+def session_expired(driver) -> bool:
+    """Whether the site has logged the session out: a page request was refused or the login form is showing"""
+    try:
+        return bool(driver.execute_script(AUTH_FAILED_SCRIPT)) or bool(driver.find_elements(By.NAME, "login"))
+    except WebDriverException:
+        return False
+
+def account_matches(norm_name: str, option_text: str) -> bool:
+    """Whether an autocomplete entry is the student, e.g. 'Ann Lee (12)' for 'ann lee' but not 'Ann Leeds'"""
+    text = normalize_name(option_text)
+    return normalize_name(format_student_name(option_text)) == norm_name or re.search(rf"\b{re.escape(norm_name)}\b", text) is not None
+
+def wait_for_account_options(driver) -> list:
+    """The autocomplete entries of the register dialog; an empty list once the search has finished without any"""
+    try:
+        return WebDriverWait(driver, WAIT_TIMEOUTS["autocomplete"], poll_frequency=0.05).until(
+            lambda d: d.find_elements(By.CSS_SELECTOR, "#ac_ul [name]")
+        )
+    except TimeoutException:
+        # No entries and no search still running means no account matched
+        if driver.execute_script(AJAX_IDLE_SCRIPT):
+            return []
+        raise
+
+@traced("register_student")
+def register_student(driver, student_name: str, program_name: str, day_name: str, roster_names: set = None,
+                     reuse_dialog: bool = False):
+    """Register a student in the current class; returns None once registered, otherwise the failure kind.
+
+    roster_names is the class's normalized-name index from read_roster_names;
+    it is read here when not given, and updated in place after each add.
+    """
+    # Format the name as 'FirstName LastName' for registration
+    formatted_name = format_student_name(student_name)
+    norm_formatted_name = normalize_name(formatted_name)
+    try:
+        # First check if student is already enrolled in this class
+        if roster_names is None:
+            roster_names = read_roster_names(driver)
+        if norm_formatted_name in roster_names:
+            print(f"  ✓ Already registered: {formatted_name}")
+            return None
+        # If student is not enrolled, proceed with registration
+        print(f"  Attempting to register: {student_name}")
+        # Click the Register User button using JavaScript, unless the dialog is still open from the last add
+        with span("register.open_dialog"):
+            if not (reuse_dialog and any(field.is_displayed() for field in driver.find_elements(By.ID, "userInput"))):
+                register_button = WebDriverWait(driver, 10).until(
+                    EC.presence_of_element_located((By.ID, "registerUserLink"))
+                )
+                driver.execute_script("arguments[0].click();", register_button)
+            # Find and fill the input field once the dialog shows it
+            input_field = WebDriverWait(driver, WAIT_TIMEOUTS["click"]).until(
+                EC.visibility_of_element_located((By.ID, "userInput"))
+            )
+            input_field.clear()  # Clear any existing text
+            input_field.send_keys(formatted_name)  # Type the student name
+        # Pick the student's account once the autocomplete has loaded
+        with span("register.autocomplete"):
+            wait_for_ajax(driver, WAIT_TIMEOUTS["autocomplete"])
+            options = wait_for_account_options(driver)
+            if not options:
+                if session_expired(driver):
+                    return SESSION_EXPIRED
+                print(f"  ✗ No matching accounts found for: {student_name}")
+                return ACCOUNT_NOT_FOUND
+            matches = [option for option in options if account_matches(norm_formatted_name, option.text)]
+            if len(matches) > 1:
+                print(f"\n⚠️  Scheduler Alert: Multiple accounts found for {student_name} in {program_name} - {day_name}")
+                print("   Please manually select the correct account.")
+                return AMBIGUOUS_ACCOUNT
+            # The first entry (name='1') when none of them spells the name out
+            (matches or options)[0].click()
+        # Then click the element with value='Add'
+        with span("register.add"):
+            add_elem = WebDriverWait(driver, WAIT_TIMEOUTS["autocomplete"]).until(
+                EC.element_to_be_clickable((By.CSS_SELECTOR, "input[value='Add']"))
+            )
+            add_elem.click()
+            # Wait for the add request
+            wait_for_ajax(driver)
+        # Then check for the child's row
+        with span("register.verify"):
+            found = wait_for_row(driver, formatted_name)
+        if found:
+            roster_names.add(norm_formatted_name)
+            print(f"  ✓ Successfully registered: {formatted_name}")
+            return None
+        return SESSION_EXPIRED if session_expired(driver) else NOT_ADDED
+    except StaleElementReferenceException:
+        return STALE_ELEMENT
+    except TimeoutException:
+        return SESSION_EXPIRED if session_expired(driver) else TIMEOUT
+    except WebDriverException as e:
+        print(f"  ⚠️  Could not register {formatted_name}: {e.msg}")
+        return ERROR
+
+# Reads every row of #table-body in one round trip instead of several
+# WebDriver calls per row and per date cell.
+ATTENDANCE_TABLE_SCRIPT = """
+var body = arguments[0];
+var text = function (el) { return el ? (el.innerText || el.textContent || '').trim() : null; };
+var rows = [];
+body.querySelectorAll('tr').forEach(function (tr) {
+    var separator = tr.querySelector('td.separator');
+    var dates = [];
+    tr.querySelectorAll('td.date').forEach(function (cell) {
+        var checkbox = cell.querySelector('a.checkbox');
+        if (checkbox) {
+            dates.push(checkbox.classList.contains('active'));
+        }
+    });
+    rows.push({
+        cls: tr.className || '',
+        cells: tr.querySelectorAll('td').length,
+        separator: text(separator),
+        name: text(tr.querySelector('.second-col a')),
+        phone: text(tr.querySelector('.staff-phone')),
+        dates: dates
+    });
+});
+return rows;
+"""
+
+def scan_attendance_rows(table_body) -> list:
+    """Read the attendance rows one WebDriver call at a time (slow fallback)"""
+    rows = []
+    for row in table_body.find_elements(By.TAG_NAME, "tr"):
+        try:
+            separators = row.find_elements(By.CSS_SELECTOR, "td.separator")
+            names = row.find_elements(By.CSS_SELECTOR, ".second-col a")
+            phones = row.find_elements(By.CSS_SELECTOR, ".staff-phone")
+            dates = []
+            for cell in row.find_elements(By.CSS_SELECTOR, "td.date"):
+                checkboxes = cell.find_elements(By.CSS_SELECTOR, "a.checkbox")
+                if checkboxes:
+                    dates.append("active" in checkboxes[0].get_attribute("class"))
+            rows.append({
+                "cls": row.get_attribute("class") or "",
+                "cells": len(row.find_elements(By.CSS_SELECTOR, "td")),
+                "separator": separators[0].text if separators else None,
+                "name": names[0].text.strip() if names else None,
+                "phone": phones[0].text.strip() if phones else None,
+                "dates": dates,
+            })
+        except Exception:
+            continue  # Silently skip rows that went stale mid-scan
+    return rows
+
+def read_attendance_rows(driver, table_body, bulk: bool = True) -> list:
+    """Return the raw attendance rows, in one round trip when bulk is set"""
+    if bulk:
+        try:
+            rows = driver.execute_script(ATTENDANCE_TABLE_SCRIPT, table_body)
+            if isinstance(rows, list):
+                return rows
+        except WebDriverException as e:
+            print(f"Bulk attendance read failed, falling back to row scan: {str(e)}")
+    return scan_attendance_rows(table_body)
+
+@traced("read_attendance")
+def read_attendance(driver, program_name: str, day_name: str, bulk: bool = True) -> dict:
+    """Open the attendance page for the selected day and return its parsed roster (None if the page did not open)"""
+    # Click the Attendance button with retry
+    max_retries = 3
+    for attempt in range(max_retries):
+        if wait_and_click(driver, By.ID, "attendance"):
+            break
+        if attempt == max_retries - 1:
+            print(f"Failed to access attendance for {program_name} - {day_name}")
+            return None
+        # Retry once the page's pending requests are done
+        wait_for_ajax(driver)
+    
+    # Wait for the attendance table to load and finish rendering
+    with span("attendance.wait_table"):
+        try:
+            table_body = WebDriverWait(driver, WAIT_TIMEOUTS["ajax"]).until(
+                EC.presence_of_element_located((By.ID, "table-body"))
+            )
+        except TimeoutException:
+            print(f"No attendance data found for {program_name} - {day_name}")
+            return parse_attendance_rows([])
+        wait_for_dom_settled(driver, By.ID, "table-body")
+    
+    with span("attendance.read_rows"):
+        return parse_attendance_rows(read_attendance_rows(driver, table_body, bulk=bulk))
+
+# Reads every tree link under a container in one round trip
+TREE_LINKS_SCRIPT = """
+var prefix = arguments[1];
+var links = arguments[0].querySelectorAll("a[id^='" + prefix + "']");
+var result = [];
+for (var i = 0; i < links.length; i++) {
+    result.push([links[i].id.slice(prefix.length), links[i].innerText.trim()]);
+}
+return result;
+"""
+
+# Ids of the program, session and day currently selected in the tree
+TREE_STATE_SCRIPT = """
+var selected = function (prefix) {
+    var link = document.querySelector("a.selected_row[id^='" + prefix + "']");
+    return link ? link.id.slice(prefix.length) : null;
+};
+return {program: selected('row_program_'), session: selected('row_session_'), day: selected('row_day_'),
+        attendance: !!document.getElementById('table-body')};
+"""
+
+def tree_links(container, prefix: str) -> list:
+    """Return (id, name) for the tree links under a program or session list"""
+    return [tuple(link) for link in container.parent.execute_script(TREE_LINKS_SCRIPT, container, prefix)]
+
+def tree_state(driver) -> dict:
+    try:
+        return driver.execute_script(TREE_STATE_SCRIPT) or {}
+    except WebDriverException:
+        return {}
+
+JS_HEAP_SCRIPT = "return window.performance && performance.memory ? performance.memory.usedJSHeapSize : null;"
+
+def js_heap_mb(driver):
+    """JS heap in use by the open page, in MB (None when the browser does not report it)"""
+    try:
+        used = driver.execute_script(JS_HEAP_SCRIPT)
+    except WebDriverException:
+        return None
+    return used / 2**20 if used else None
+
+def process_tree_rss(root_pid: int):
+    """Resident memory of a process and all its descendants in bytes, from /proc (Linux without psutil)"""
+    children = {}
+    try:
+        for entry in os.listdir("/proc"):
+            if not entry.isdigit():
+                continue
+            try:
+                with open(f"/proc/{entry}/stat", encoding="utf-8") as stat:
+                    # The fields after the parenthesized command name are: state, ppid, ...
+                    ppid = int(stat.read().rsplit(")", 1)[1].split()[1])
+            except (OSError, IndexError, ValueError):
+                continue
+            children.setdefault(ppid, []).append(int(entry))
+    except OSError:
+        return None
+    total = 0
+    pending = [root_pid]
+    while pending:
+        pid = pending.pop()
+        pending.extend(children.get(pid, ()))
+        try:
+            with open(f"/proc/{pid}/statm", encoding="utf-8") as statm:
+                total += int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+        except (OSError, IndexError, ValueError):
+            continue
+    return total
+
+def browser_rss_mb(driver):
+    """Resident memory of chromedriver and the Chrome processes it started, in MB (None where it cannot be read)"""
+    try:
+        pid = driver.service.process.pid
+    except AttributeError:
+        return None
+    if psutil is not None:
+        try:
+            root = psutil.Process(pid)
+            return sum(process.memory_info().rss for process in [root, *root.children(recursive=True)]) / 2**20
+        except psutil.Error:
+            return None
+    if not os.path.isdir("/proc"):
+        return None
+    rss = process_tree_rss(pid)
+    return rss / 2**20 if rss else None
+
+class DriverLifecycle:
+    """Decides when a long-lived Chrome should be swapped for a fresh one.
+
+    Checked between classes: once the browser's processes reach max_rss_mb,
+    the page's JS heap reaches max_heap_mb, or max_classes classes have been
+    opened with it, the engine restarts the driver before the next class.
+    A limit of 0 turns that check off.
+    """
+
+    def __init__(self, max_rss_mb: float = 1500, max_heap_mb: float = 512, max_classes: int = 250):
+        self.max_rss_mb = max_rss_mb
+        self.max_heap_mb = max_heap_mb
+        self.max_classes = max_classes
+        self.classes = 0  # opened with the current driver
+        self.restarts = 0
+        self.peak_rss_mb = 0
+        self.peak_heap_mb = 0
+
+    def due(self, driver):
+        """Why the driver should be restarted before the next class, or None"""
+        with span("driver.memory_check") as attrs:
+            rss = browser_rss_mb(driver) if self.max_rss_mb else None
+            heap = js_heap_mb(driver) if self.max_heap_mb else None
+            attrs.update(rss_mb=round(rss or 0), heap_mb=round(heap or 0), classes=self.classes)
+        self.peak_rss_mb = max(self.peak_rss_mb, rss or 0)
+        self.peak_heap_mb = max(self.peak_heap_mb, heap or 0)
+        if rss and rss >= self.max_rss_mb:
+            return f"browser memory {rss:.0f} MB"
+        if heap and heap >= self.max_heap_mb:
+            return f"page JS heap {heap:.0f} MB"
+        if self.max_classes and self.classes >= self.max_classes:
+            return f"{self.classes} classes opened"
+        return None
+
+    def opened_class(self):
+        self.classes += 1
+
+    def restarted(self):
+        self.classes = 0
+        self.restarts += 1
+
+    def print_summary(self):
+        if self.peak_rss_mb or self.peak_heap_mb or self.restarts:
+            print(f"\nChrome: peak {self.peak_rss_mb:.0f} MB across its processes, peak {self.peak_heap_mb:.0f} MB page JS heap, "
+                  f"restarted {self.restarts} time(s)")
+
+# Exceptions of a governed step that mean the site is slow or unreachable, not that the page changed
+OVERLOAD_ERRORS = (TimeoutException,)
+
+class SeleniumEngine:
+    """Runs the program/session/day operations by clicking through the ClubAutomation UI.
+
+    HttpEngine in http_engine.py exposes the same methods, so process_programs
+    works with either one.
+    """
+
+    def __init__(self, driver, base_url: str = BASE_URL, deep_links: bool = False,
+                 restart=None, lifecycle: DriverLifecycle = None, governor=None, reuse_session: bool = True):
+        self.driver = driver
+        # restart(cookies) returns a new driver logged in with this session's cookies; lifecycle says when to use it
+        self.restart = restart
+        # Whether this session logs in again from the saved cookie file (only the first session of a run does)
+        self.reuse_session = reuse_session
+        self.lifecycle = lifecycle
+        # Governor shared by every session of the run; each page step takes one of its slots
+        self.governor = governor
+        self.base_url = base_url
+        self.roster_names = None
+        self.enrolled_count = 0
+        self.current_class = None
+        # Jump to a class's attendance by URL instead of clicking through the tree
+        self.deep_links = deep_links and ATTENDANCE_LINK_PATH is not None
+        # The program -> session -> day tree, read once per run
+        self.programs = None
+        self.sessions = {}
+        self.days = {}
+
+    def list_programs(self) -> list:
+        if self.programs is None:
+            if not wait_for_program_list(self.driver):
+                return []
+            self.programs = tree_links(self.driver.find_element(By.ID, "programBlock"), "row_program_")
+        return self.programs
+
+    def list_sessions(self, program_id: str):
+        if program_id not in self.sessions:
+            with governed(self.governor, "list_sessions", OVERLOAD_ERRORS):
+                if not self.open_program(program_id):
+                    return None
+                # Wait for the session list to be visible
+                session_list = wait_for_element_visible(self.driver, By.ID, f"program_{program_id}_list")
+                if not session_list:
+                    return None
+                self.sessions[program_id] = tree_links(session_list, "row_session_")
+        return self.sessions[program_id]
+
+    def list_days(self, program_id: str, session_id: str):
+        if session_id not in self.days:
+            with governed(self.governor, "list_days", OVERLOAD_ERRORS):
+                if not self.open_session(program_id, session_id):
+                    return None
+                # Wait for the day list to be visible
+                day_list = wait_for_element_visible(self.driver, By.ID, f"session_{session_id}_list")
+                if not day_list:
+                    return None
+                self.days[session_id] = tree_links(day_list, "row_day_")
+        return self.days[session_id]
+
+    def open_program(self, program_id: str, state: dict = None) -> bool:
+        """Select a program unless the tree already has it selected"""
+        state = tree_state(self.driver) if state is None else state
+        if state.get("program") == program_id:
+            return True
+        with governed(self.governor, "select_program", OVERLOAD_ERRORS):
+            return select_program(self.driver, program_id)
+
+    def open_session(self, program_id: str, session_id: str, state: dict = None) -> bool:
+        """Select a program's session, clicking only the nodes that are not selected yet"""
+        state = tree_state(self.driver) if state is None else state
+        if state.get("program") == program_id and state.get("session") == session_id:
+            return True
+        if not self.open_program(program_id, state):
+            return False
+        return select_session(self.driver, session_id)
+
+    def open_day(self, program_id: str, session_id: str, day_id: str) -> bool:
+        """Select a class day, clicking only the nodes that are not selected yet"""
+        state = tree_state(self.driver)
+        if state.get("program") == program_id and state.get("session") == session_id and state.get("day") == day_id:
+            return True
+        if not self.open_session(program_id, session_id, state):
+            return False
+        return select_day(self.driver, day_id)
+
+    def jump_to_class(self, program_id: str, day_id: str) -> bool:
+        """Load a class's attendance view straight from its URL; turns deep links off if the site ignores them"""
+        with span("jump_to_class", program_id=program_id, day_id=day_id):
+            try:
+                load_page(self.driver, self.base_url + ATTENDANCE_LINK_PATH.format(program_id=program_id, day_id=day_id))
+                def class_open(driver):
+                    state = tree_state(driver)
+                    return state.get("day") == day_id and state.get("attendance")
+                WebDriverWait(self.driver, WAIT_TIMEOUTS["ajax"], poll_frequency=0.1).until(class_open)
+                wait_for_ajax(self.driver)
+                return True
+            except (TimeoutException, WebDriverException):
+                print("Direct attendance links did not open the class; clicking through the tree for the rest of the run")
+                self.deep_links = False
+                return False
+
+    def class_boundary(self):
+        """Between classes: restart Chrome if it has grown past a lifecycle limit, then count the class"""
+        if self.lifecycle is None:
+            return
+        if self.restart is not None:
+            reason = self.lifecycle.due(self.driver)
+            if reason:
+                self.restart_driver(reason)
+        self.lifecycle.opened_class()
+
+    def restart_driver(self, reason: str):
+        """Swap in a fresh logged-in Chrome; the next class is then opened from the start page"""
+        print(f"\n♻️  Restarting Chrome ({reason})...")
+        with span("driver.restart", reason=reason):
+            # The new driver picks this session's login up from its cookies when it is still valid
+            try:
+                cookies = self.driver.get_cookies()
+            except WebDriverException:
+                cookies = None
+            try:
+                self.driver.quit()
+            except WebDriverException:
+                pass
+            self.driver = self.restart(cookies)
+        self.lifecycle.restarted()
+
+    def read_attendance(self, program_id: str, session_id: str, day_id: str, program_name: str, day_name: str):
+        self.class_boundary()
+        with governed(self.governor, "read_attendance", OVERLOAD_ERRORS) as call:
+            # Jump to the class, or click the day
+            if not (self.deep_links and self.jump_to_class(program_id, day_id)):
+                if not self.open_day(program_id, session_id, day_id):
+                    # A class that does not load within the waits is what a struggling site looks like
+                    call["overload"] = True
+                    return None
+            return read_attendance(self.driver, program_name, day_name)
+
+    def open_class(self, program_id: str, session_id: str, day_id: str) -> bool:
+        self.class_boundary()
+        with governed(self.governor, "open_class", OVERLOAD_ERRORS) as call:
+            # Jump to the class, or click the day, then the attendance button
+            if not (self.deep_links and self.jump_to_class(program_id, day_id)):
+                if not (self.open_day(program_id, session_id, day_id) and wait_and_click(self.driver, By.ID, "attendance")):
+                    call["overload"] = True
+                    return False
+            # Index the roster once; duplicate checks are then local lookups
+            rows = read_class_rows(self.driver)
+        self.roster_names = roster_name_set(rows)
+        self.enrolled_count = len(parse_attendance_rows(rows)["students"])
+        self.current_class = (program_id, session_id, day_id)
+        return True
+
+    def recover(self, failure: str):
+        """Get the class page usable again after a failed add: log back in if needed and re-read the roster"""
+        try:
+            if failure == SESSION_EXPIRED:
+                print("  Session expired; logging in again...")
+                with governed(self.governor, "login", OVERLOAD_ERRORS):
+                    login(self.driver, reuse_session=self.reuse_session, base_url=self.base_url)
+                if self.current_class and self.open_class(*self.current_class):
+                    return
+            # An add that timed out may still have gone through
+            self.roster_names = read_roster_names(self.driver)
+        except WebDriverException as e:
+            print(f"  Could not recover the class page: {e.msg}")
+
+    def register_student(self, student_name: str, program_name: str, day_name: str, reuse_dialog: bool = False) -> str:
+        """Register one student, retrying transient failures; returns None or the failure kind"""
+        def attempt(try_number: int) -> str:
+            with governed(self.governor, "register_student", OVERLOAD_ERRORS) as call:
+                # A retry starts from a fresh dialog
+                failure = register_student(self.driver, student_name, program_name, day_name, self.roster_names,
+                                           reuse_dialog=reuse_dialog and try_number == 0)
+                call["overload"] = failure == TIMEOUT
+            return failure
+        return with_retries(attempt, self.recover)
+
+    def register_students(self, student_names: list, program_name: str, day_name: str) -> list:
+        """Register a batch of students, keeping the register dialog open between adds"""
+        return [(student_name, self.register_student(student_name, program_name, day_name, reuse_dialog=i > 0))
+                for i, student_name in enumerate(student_names)]
+
+    def refresh(self):
+        """Forget the cached program tree and reload the start page, logging in again if the session ran out"""
+        self.programs = None
+        self.sessions = {}
+        self.days = {}
+        with governed(self.governor, "login", OVERLOAD_ERRORS):
+            login(self.driver, reuse_session=self.reuse_session, base_url=self.base_url)
+
+    def return_to_program(self, program_id: str) -> bool:
+        # Go back to program selection, unless it is still selected
+        return self.open_program(program_id)
+
+    def close(self):
+        if self.lifecycle:
+            self.lifecycle.print_summary()
+        self.driver.quit()
+
+@traced("wait_for_program_list")
+def wait_for_program_list(driver) -> int:
+    """Wait for the events tree to load and return the number of programs"""
+    # Wait for the all-events container to be present
+    try:
+        events_container = WebDriverWait(driver, 10).until(
+            EC.presence_of_element_located((By.ID, "all-events-container"))
+        )
+    except TimeoutException:
+        print("Failed to load events container")
+        return 0
+
+    # Wait for the events block to be present
+    try:
+        events_block = WebDriverWait(driver, 10).until(
+            EC.presence_of_element_located((By.ID, "eventsBlock"))
+        )
+    except TimeoutException:
+        print("Failed to load events block")
+        return 0
+
+    # Get all program links from the first column
+    return len(driver.find_elements(By.CSS_SELECTOR, "#programBlock a[id^='row_program_']"))
+
+DRIVER_PATH_CACHE = ".chromedriver_path"
+COOKIE_FILE = ".avac_cookies.json"
+# Serializes writes to the cookie file when several sessions log in at once
+COOKIE_LOCK = threading.Lock()
+
+def resolve_driver_path(refresh: bool = False) -> str:
+    """Return a chromedriver path, only asking webdriver_manager when nothing is cached"""
+    pinned = os.environ.get("CHROMEDRIVER_PATH")
+    if pinned and os.path.exists(pinned):
+        return pinned
+    if not refresh:
+        try:
+            with open(DRIVER_PATH_CACHE, encoding="utf-8") as cache:
+                cached = cache.read().strip()
+            if cached and os.path.exists(cached):
+                return cached
+        except OSError:
+            pass
+    driver_path = ChromeDriverManager().install()
+    try:
+        with open(DRIVER_PATH_CACHE, "w", encoding="utf-8") as cache:
+            cache.write(driver_path)
+    except OSError:
+        pass
+    return driver_path
+
+# Requests the pages never need: images, fonts, media and analytics/ad hosts
+BLOCKED_URL_PATTERNS = [
+    "*.png", "*.jpg", "*.jpeg", "*.gif", "*.webp", "*.svg", "*.ico", "*.bmp",
+    "*.woff", "*.woff2", "*.ttf", "*.otf", "*.eot",
+    "*.mp4", "*.webm", "*.mp3", "*.ogg", "*.wav",
+    "*google-analytics.com*", "*googletagmanager.com*", "*doubleclick.net*", "*googlesyndication.com*",
+    "*facebook.net*", "*facebook.com/tr*", "*hotjar.com*", "*newrelic.com*", "*nr-data.net*",
+    "*fullstory.com*", "*clarity.ms*", "*intercom.io*", "*zendesk.com*",
+]
+
+# Chrome features a scripted run has no use for
+LEAN_CHROME_ARGUMENTS = [
+    '--disable-extensions',
+    '--disable-background-networking',
+    '--disable-component-update',
+    '--disable-default-apps',
+    '--disable-sync',
+    '--disable-notifications',
+    '--disable-features=Translate,MediaRouter,OptimizationHints,AutofillServerCommunication',
+    '--blink-settings=imagesEnabled=false',
+    '--mute-audio',
+    '--no-first-run',
+]
+
+def load_page(driver, url: str):
+    """driver.get, timed per page path so lean and full profile runs can be compared"""
+    with span(f"page_load {urlparse(url).path or '/'}"):
+        driver.get(url)
+
+def create_driver(driver_path: str, headless: bool = False, profile_dir: str = None, lean: bool = False):
+    """Start a Chrome session using an already installed chromedriver.
+
+    With lean, pages return as soon as their DOM is ready and images, fonts,
+    media and tracking requests are blocked.
+    """
+    chrome_options = Options()
+    chrome_options.add_argument('--log-level=3')  # Suppress console logs
+    chrome_options.add_experimental_option('excludeSwitches', ['enable-logging'])  # Disable logging
+    if lean:
+        # The readiness waits cover the ajax content, so the load event is not needed
+        chrome_options.page_load_strategy = 'eager'
+        for argument in LEAN_CHROME_ARGUMENTS:
+            chrome_options.add_argument(argument)
+        chrome_options.add_experimental_option('prefs', {
+            'profile.managed_default_content_settings.images': 2,
+            'profile.default_content_setting_values.notifications': 2,
+        })
+    if headless:
+        chrome_options.add_argument('--headless=new')
+        chrome_options.add_argument('--disable-gpu')
+        chrome_options.add_argument('--window-size=1400,1000')
+    # chrome_options.add_argument('--no-sandbox')
+    if profile_dir:
+        # A persistent profile keeps the login cookies between runs
+        chrome_options.add_argument(f'--user-data-dir={os.path.abspath(profile_dir)}')
+    service = Service(driver_path)
+    driver = webdriver.Chrome(service=service, options=chrome_options)
+    if lean:
+        try:
+            driver.execute_cdp_cmd("Network.enable", {})
+            driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": BLOCKED_URL_PATTERNS})
+        except WebDriverException as e:
+            print(f"Could not block page resources: {str(e)}")
+    return driver
+
+PAGE_TIMINGS_FILE = ".page_timings.json"
+# Steps compared between profiles besides the page loads
+NAVIGATION_STEPS = ("select_program", "select_session", "select_day", "jump_to_class", "open_class", "read_attendance", "login")
+
+def compare_page_timings(lean: bool, timings_file: str = PAGE_TIMINGS_FILE):
+    """Print the time the lean profile saves per page against the full profile's p50 step timings.
+
+    A --lean run saves its timings each time; a default run only saves the
+    first full-profile timings to compare against, and prints nothing.
+    """
+    try:
+        with open(timings_file, encoding="utf-8") as timings_json:
+            timings = json.load(timings_json)
+    except (OSError, ValueError):
+        timings = {}
+    if not lean and timings.get("full"):
+        return
+    steps = {name: p50 for name, _, p50, _, _ in TRACER.summary()
+             if name.startswith("page_load ") or name in NAVIGATION_STEPS}
+    if not steps:
+        return
+    timings["lean" if lean else "full"] = steps
+    try:
+        with open(timings_file, "w", encoding="utf-8") as timings_json:
+            json.dump(timings, timings_json, indent=2)
+    except OSError:
+        pass
+    full, lean_steps = timings.get("full"), timings.get("lean")
+    if not lean:
+        return
+    if not full:
+        print("\nRun once without --lean to see the time the lean profile saves per page.")
+        return
+    print("\n=== Lean Profile Time Saved (p50 ms) ===")
+    print(f"  {'page/step':<36} {'full':>9} {'lean':>9} {'saved':>9}")
+    for name in sorted(set(full) & set(lean_steps)):
+        print(f"  {name:<36} {full[name]:>9.1f} {lean_steps[name]:>9.1f} {full[name] - lean_steps[name]:>9.1f}")
+
+def save_cookies(driver, cookie_file: str = COOKIE_FILE):
+    """Save the logged-in session cookies for the next run"""
+    try:
+        with COOKIE_LOCK, open(cookie_file, "w", encoding="utf-8") as cookies:
+            json.dump(driver.get_cookies(), cookies)
+    except (OSError, WebDriverException) as e:
+        print(f"Could not save session cookies: {str(e)}")
+
+def load_cookies(driver, cookie_file: str = COOKIE_FILE, base_url: str = BASE_URL) -> bool:
+    """Add saved session cookies to the browser; returns False when there are none"""
+    try:
+        with COOKIE_LOCK, open(cookie_file, encoding="utf-8") as cookies:
+            saved = json.load(cookies)
+    except (OSError, ValueError):
+        return False
+    return add_cookies(driver, saved, base_url)
+
+def add_cookies(driver, saved: list, base_url: str = BASE_URL) -> bool:
+    """Add session cookies to the browser; returns False when there are none"""
+    # Cookies can only be set for the site that is currently open
+    load_page(driver, base_url + "/")
+    for cookie in saved:
+        if "expiry" in cookie:
+            cookie["expiry"] = int(cookie["expiry"])
+        try:
+            driver.add_cookie(cookie)
+        except WebDriverException:
+            continue
+    return bool(saved)
+
+def wait_for_start_page(driver, timeout=10) -> str:
+    """Wait until the start page shows the login form, the position prompt or the events tree"""
+    markers = {
+        "login": (By.NAME, "login"),
+        "position": (By.NAME, "selectPosButton"),
+        "events": (By.ID, "all-events-container"),
+    }
+    try:
+        return WebDriverWait(driver, timeout).until(
+            lambda d: next((state for state, marker in markers.items() if d.find_elements(*marker)), False)
+        )
+    except TimeoutException:
+        return "unknown"
+
+@traced("login")
+def login(driver, reuse_session: bool = True, base_url: str = BASE_URL, cookies: list = None):
+    """Log in to AVAC and select the point-of-sale position, reusing a saved session when it is still valid.
+
+    reuse_session loads and saves the shared cookie file; cookies are a
+    restarted session's own cookies, loaded instead of the file.
+    """
+    # Every wait is explicit; an implicit wait would make each empty find_elements cost the full wait
+    driver.implicitly_wait(0)
+    if cookies:
+        add_cookies(driver, cookies, base_url)
+    elif reuse_session:
+        load_cookies(driver, base_url=base_url)
+    load_page(driver, base_url + START_PATH)
+    state = wait_for_start_page(driver)
+    if state == "events":
+        print("Reusing saved session...")
+        return
+    
+    if state != "position":
+        print("Logging in...")
+        driver.find_element(By.NAME, "login").send_keys(AVAC_USERNAME)
+        driver.find_element(By.NAME, "password").send_keys(AVAC_PASSWORD)
+        driver.find_element(By.ID, "loginButton").click()
+    
+    print("Selecting position...")
+    if not wait_and_click(driver, By.NAME, "selectPosButton"):
+        raise TimeoutException("Position selection did not appear after logging in")
+    if reuse_session:
+        save_cookies(driver)
@@ -0,0 +1,176 @@
+"""Shared rate and concurrency limit for the calls every session makes to the site.
+
+Each navigation and registration call of every session takes a slot from one
+Governor. At most `limit` calls run at once, and with max_rate at most that
+many start per second. The limit adapts AIMD style. It grows by a fifth of a
+slot per round of calls that come back quickly and cleanly. It halves when
+several calls of a kind in a row take well over their smoothed usual latency,
+or when the site answers with a timeout, a 429 or a 5xx (the engine says
+which of its exceptions are timeouts and dropped connections); after such an
+answer no call starts for a moment (the Retry-After time when the site gives
+one). The limit, the calls in flight and the calls waiting are recorded as
+trace counters.
+"""
+from contextlib import contextmanager, nullcontext
+import math
+import threading
+import time
+
+from spans import TRACER, span
+
+
+# A call this many times slower than the usual latency of its kind is slow...
+LATENCY_TOLERANCE = 3.0
+# ...when it is also at least this many seconds slower, so jitter on fast calls is ignored
+LATENCY_SLACK = 0.1
+# Weight of each call in the usual (exponentially smoothed) latency of its kind; a slow call
+# counts as only LATENCY_TOLERANCE times the usual and weighs less, so a slowdown keeps
+# counting for a couple of dozen calls before it becomes the new usual
+LATENCY_SMOOTHING = 0.1
+SLOW_SMOOTHING = 0.05
+# Slow calls of a kind in a row that count as congestion; a single slow step is ordinary variation
+SLOW_STREAK = 3
+# Slots added per round of `limit` clean calls; small, since probing past what the site takes costs a pause
+ADDITIVE_INCREASE = 0.2
+# After a decrease, more congestion is ignored this long, while the calls already in flight drain
+DECREASE_COOLDOWN = 1.0
+# Seconds no call starts after the site refused one without saying how long to wait
+OVERLOAD_PAUSE = 1.0
+
+def is_overload(error, overload_errors: tuple = ()) -> bool:
+    """Whether a failed call suggests the site is struggling: a 429 or 5xx reply, or one of overload_errors"""
+    status = getattr(getattr(error, "response", None), "status_code", None)
+    if status is not None:
+        return status == 429 or status >= 500
+    return isinstance(error, overload_errors)
+
+def retry_after(error):
+    """Seconds from a refused call's Retry-After header, or None"""
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("Retry-After"))
+    except (TypeError, ValueError):
+        return None
+
+class Governor:
+    """Hands out call slots to every session of a run and adapts how many it allows"""
+
+    def __init__(self, max_limit: int = 1, max_rate: float = None, min_limit: int = 1):
+        self.max_limit = max(1, max_limit)
+        self.min_limit = max(1, min(min_limit, self.max_limit))
+        self.limit = float(self.max_limit)
+        self.max_rate = max_rate
+        self.condition = threading.Condition()
+        self.local = threading.local()
+        self.in_flight = 0
+        self.queued = 0
+        self.next_start = 0.0  # monotonic time the next call may start (rate cap and pauses)
+        self.usual = {}        # call kind -> smoothed latency in seconds
+        self.slow_streak = {}  # call kind -> slow calls in a row
+        self.last_decrease = 0.0
+        self.stats = {"calls": 0, "overloads": 0, "slow": 0, "decreases": 0, "peak_queue": 0,
+                      "wait": 0.0, "lowest_limit": self.limit}
+
+    @contextmanager
+    def slot(self, kind: str, overload_errors: tuple = ()):
+        """Run a call in a slot; yields a dict the caller can set 'overload' in for failures that do not raise.
+
+        overload_errors are the engine's exceptions for timeouts and dropped
+        connections; other exceptions are the call's own problem.
+        """
+        if getattr(self.local, "busy", False):
+            # A governed call made from inside another one shares its slot
+            yield {}
+            return
+        with span("governor.wait", call=kind) as attrs:
+            self._acquire(attrs)
+        self.local.busy = True
+        call = {"overload": False}
+        started = time.perf_counter()
+        try:
+            yield call
+        except Exception as e:
+            if is_overload(e, overload_errors):
+                call["overload"] = True
+                call["retry_after"] = retry_after(e)
+            raise
+        finally:
+            self.local.busy = False
+            self._release(kind, time.perf_counter() - started, call)
+
+    def _acquire(self, attrs: dict):
+        started = time.perf_counter()
+        with self.condition:
+            self.queued += 1
+            self.stats["peak_queue"] = max(self.stats["peak_queue"], self.queued)
+            attrs.update(queued=self.queued, limit=round(self.limit, 2))
+            self._record()
+            while True:
+                now = time.monotonic()
+                has_room = self.in_flight < math.floor(self.limit)
+                if has_room and now >= self.next_start:
+                    break
+                # Wake up for the rate cap or pause; a finished call notifies otherwise
+                self.condition.wait(self.next_start - now if has_room else None)
+            self.queued -= 1
+            self.in_flight += 1
+            if self.max_rate:
+                self.next_start = max(now, self.next_start) + 1 / self.max_rate
+            self.stats["wait"] += time.perf_counter() - started
+            self._record()
+
+    def _release(self, kind: str, latency: float, call: dict):
+        with self.condition:
+            self.in_flight -= 1
+            self.stats["calls"] += 1
+            usual = self.usual.get(kind)
+            slow = usual is not None and latency > usual * LATENCY_TOLERANCE and latency - usual > LATENCY_SLACK
+            if usual is None:
+                self.usual[kind] = latency
+            elif slow:
+                self.usual[kind] = usual + SLOW_SMOOTHING * (usual * LATENCY_TOLERANCE - usual)
+            else:
+                self.usual[kind] = usual + LATENCY_SMOOTHING * (latency - usual)
+            streak = self.slow_streak[kind] = self.slow_streak.get(kind, 0) + 1 if slow else 0
+            congested = streak >= SLOW_STREAK
+            if congested:
+                self.slow_streak[kind] = 0
+            if call.get("overload"):
+                self.stats["overloads"] += 1
+                pause = call.get("retry_after") or OVERLOAD_PAUSE
+                self.next_start = max(self.next_start, time.monotonic() + pause)
+            if slow:
+                self.stats["slow"] += 1
+            if call.get("overload") or congested:
+                self._decrease()
+            elif not slow:
+                # Additive increase, spread over a round of `limit` calls
+                self.limit = min(self.max_limit, self.limit + ADDITIVE_INCREASE / self.limit)
+            self._record()
+            self.condition.notify_all()
+
+    def _decrease(self):
+        now = time.monotonic()
+        if now - self.last_decrease < DECREASE_COOLDOWN:
+            return
+        self.last_decrease = now
+        self.limit = max(self.min_limit, self.limit / 2)
+        self.stats["decreases"] += 1
+        self.stats["lowest_limit"] = min(self.stats["lowest_limit"], self.limit)
+
+    def _record(self):
+        TRACER.counter("governor", limit=round(self.limit, 2), in_flight=self.in_flight, queued=self.queued)
+
+    def print_summary(self):
+        stats = self.stats
+        if not stats["calls"]:
+            return
+        print("\n=== Request Governor ===")
+        print(f"  {stats['calls']} calls, limit now {self.limit:.1f} of {self.max_limit} "
+              f"(lowest {stats['lowest_limit']:.1f}, lowered {stats['decreases']} time(s))")
+        print(f"  {stats['overloads']} refused or timed out, {stats['slow']} slow; "
+              f"peak queue {stats['peak_queue']}, {stats['wait']:.1f} s spent waiting for a slot")
+
+def governed(governor, kind: str, overload_errors: tuple = ()):
+    """A slot of the run's governor, or a no-op when the engine runs without one"""
+    return governor.slot(kind, overload_errors) if governor else nullcontext({})
@@ -0,0 +1,236 @@
+"""Browserless engine that calls the ClubAutomation endpoints behind the UI.
+
+The attendance page loads the program/session/day tree, the attendance table
+and the register-user dialog through ajax requests. HttpEngine replays those
+requests over one keep-alive session and parses the returned HTML/JSON, so a
+run skips the Chrome rendering entirely. It has the same methods as
+SeleniumEngine in main.py.
+"""
+import requests
+from requests.adapters import HTTPAdapter
+
+from attendance import (
+    format_student_name, normalize_name, parse_attendance_html,
+    parse_attendance_rows, parse_tree_links, roster_name_set,
+)
+from governor import governed
+from retries import (
+    ACCOUNT_NOT_FOUND, AMBIGUOUS_ACCOUNT, ERROR, NOT_ADDED, SERVER_ERROR, SESSION_EXPIRED, TIMEOUT, with_retries,
+)
+from spans import span
+
+
+# Paths of the requests made by the view-all/attendance page. Kept in one
+# place so they can be updated if the site changes. Only confirmed against
+# mock_clubautomation.py so far; login() checks the live site accepts them.
+ENDPOINTS = {
+    "login": "/user/login",
+    "select_position": "/user/select-position",
+    "tree": "/event/view-all-tree",
+    "attendance": "/event/attendance-table",
+    "user_search": "/event/register-user-search",
+    "add_registrant": "/event/register-user",
+}
+
+# Request failures that mean the site is slow or unreachable
+OVERLOAD_ERRORS = (requests.Timeout, requests.ConnectionError)
+
+# Sends of a request the site refuses with a 429 (each after the governor's pause) before giving up
+REFUSED_ATTEMPTS = 3
+
+class LoginFailed(requests.RequestException):
+    """The site did not accept the login: wrong credentials, or ENDPOINTS no longer match the site"""
+
+class HttpEngine:
+    """Runs the program/session/day operations over plain HTTP"""
+
+    def __init__(self, base_url: str, timeout: float = 15, pool_size: int = 8, accounts=None, governor=None):
+        self.base_url = base_url.rstrip("/")
+        # AccountCache of the member account each name resolved to before
+        self.accounts = accounts
+        # Governor shared by every session of the run; each request takes one of its slots
+        self.governor = governor
+        self.timeout = timeout
+        # One pooled keep-alive session; the cookie jar holds the login
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers["X-Requested-With"] = "XMLHttpRequest"
+        self.day_id = None
+        self.roster_names = set()
+        self.enrolled_count = 0
+        self.credentials = None
+
+    def _request(self, method: str, endpoint: str, **kwargs):
+        for attempt in range(REFUSED_ATTEMPTS):
+            try:
+                with governed(self.governor, f"http.{endpoint}", OVERLOAD_ERRORS), span(f"http.{endpoint}"):
+                    response = self.session.request(method, self.base_url + ENDPOINTS[endpoint], timeout=self.timeout, **kwargs)
+                    response.raise_for_status()
+                return response
+            except requests.HTTPError as e:
+                # A refused request was never handled, so it is safe to send again once the governor lets it
+                if e.response is None or e.response.status_code != 429 or attempt + 1 == REFUSED_ATTEMPTS:
+                    raise
+
+    def _get(self, endpoint: str, **params):
+        return self._request("GET", endpoint, params=params)
+
+    def _post(self, endpoint: str, data: dict):
+        return self._request("POST", endpoint, data=data)
+
+    def login(self, username: str, password: str):
+        """Log in and select the point-of-sale position, then check the session can load the program tree"""
+        print("Logging in...")
+        self.credentials = (username, password)
+        try:
+            self._post("login", {"login": username, "password": password})
+            print("Selecting position...")
+            self._post("select_position", {"selectPosButton": "1"})
+            tree = self._get("tree").text
+        except requests.HTTPError as e:
+            if e.response is None or e.response.status_code not in (401, 403):
+                raise
+            raise LoginFailed(f"Login was not accepted ({e})") from e
+        # An unauthenticated request can also come back as the login form
+        if 'name="login"' in tree:
+            raise LoginFailed("Login was not accepted (the site showed the login form again)")
+
+    def list_programs(self) -> list:
+        try:
+            return parse_tree_links(self._get("tree").text, "row_program_")
+        except requests.RequestException as e:
+            print(f"Failed to load programs: {str(e)}")
+            return []
+
+    def list_sessions(self, program_id: str):
+        try:
+            return parse_tree_links(self._get("tree", program_id=program_id).text, "row_session_")
+        except requests.RequestException as e:
+            print(f"Failed to load sessions for program {program_id}: {str(e)}")
+            return None
+
+    def list_days(self, program_id: str, session_id: str):
+        try:
+            return parse_tree_links(self._get("tree", session_id=session_id).text, "row_day_")
+        except requests.RequestException as e:
+            print(f"Failed to load days for session {session_id}: {str(e)}")
+            return None
+
+    def fetch_rows(self, day_id: str) -> list:
+        """Fetch the raw attendance rows of a day"""
+        return parse_attendance_html(self._get("attendance", day_id=day_id).text)
+
+    def fetch_roster(self, day_id: str) -> dict:
+        """Fetch and parse the attendance table of a day"""
+        return parse_attendance_rows(self.fetch_rows(day_id))
+
+    def read_attendance(self, program_id: str, session_id: str, day_id: str, program_name: str, day_name: str):
+        try:
+            return self.fetch_roster(day_id)
+        except requests.RequestException as e:
+            print(f"Failed to access attendance for {program_name} - {day_name}: {str(e)}")
+            return None
+
+    def open_class(self, program_id: str, session_id: str, day_id: str) -> bool:
+        try:
+            rows = self.fetch_rows(day_id)
+        except requests.RequestException as e:
+            print(f"Failed to open attendance for day {day_id}: {str(e)}")
+            return False
+        self.day_id = day_id
+        self.roster_names = roster_name_set(rows)
+        self.enrolled_count = len(parse_attendance_rows(rows)["students"])
+        return True
+
+    def try_register(self, student_name: str, program_name: str, day_name: str) -> str:
+        """Register a student in the class opened with open_class; returns None once registered, otherwise the failure kind"""
+        formatted_name = format_student_name(student_name)
+        norm_formatted_name = normalize_name(formatted_name)
+        if norm_formatted_name in self.roster_names:
+            print(f"  ✓ Already registered: {formatted_name}")
+            return None
+        print(f"  Attempting to register: {student_name}")
+        try:
+            cached = self.accounts.get(formatted_name) if self.accounts else None
+            if cached and cached[0]:
+                # Add the account saved for this name without searching for it
+                with span("register.cached_add"):
+                    added = self.add_account(cached[0], norm_formatted_name)
+                if added:
+                    self.accounts.hit()
+                    self.roster_names.add(norm_formatted_name)
+                    print(f"  ✓ Successfully registered: {formatted_name} (saved account)")
+                    return None
+                # The saved account is not this student's any more
+                self.accounts.forget(formatted_name)
+            accounts = self._get("user_search", day_id=self.day_id, q=formatted_name).json()
+            matches = [account for account in accounts if normalize_name(account["name"]) == norm_formatted_name]
+            if not matches:
+                print(f"  ✗ No matching accounts found for: {student_name}")
+                return ACCOUNT_NOT_FOUND
+            if len(matches) > 1:
+                print(f"\n⚠️  Scheduler Alert: Multiple accounts found for {student_name} in {program_name} - {day_name}")
+                print("   Please manually select the correct account.")
+                return AMBIGUOUS_ACCOUNT
+            added = self.add_account(matches[0]["id"], norm_formatted_name)
+            if added and self.accounts:
+                self.accounts.put(formatted_name, matches[0]["id"], matches[0]["name"])
+        except requests.HTTPError as e:
+            print(f"  ⚠️  Could not register {formatted_name}: {e}")
+            status = e.response.status_code if e.response is not None else 0
+            if status in (401, 403):
+                return SESSION_EXPIRED
+            return SERVER_ERROR if status >= 500 or status == 429 else ERROR
+        except (requests.Timeout, requests.ConnectionError) as e:
+            print(f"  ⚠️  Could not register {formatted_name}: {e}")
+            return TIMEOUT
+        except (requests.RequestException, ValueError, KeyError) as e:
+            print(f"  ⚠️  Could not register {formatted_name}: {e}")
+            return ERROR
+        if added:
+            self.roster_names.add(norm_formatted_name)
+            print(f"  ✓ Successfully registered: {formatted_name}")
+            return None
+        return NOT_ADDED
+
+    def add_account(self, user_id: str, norm_name: str) -> bool:
+        """Add a member account to the open class and check the refreshed attendance table for the name"""
+        try:
+            self._post("add_registrant", {"day_id": self.day_id, "user_id": user_id})
+        except requests.HTTPError as e:
+            # An unknown account is refused; anything else is for the caller to classify
+            if e.response is None or e.response.status_code != 404:
+                raise
+            return False
+        return norm_name in roster_name_set(self.fetch_rows(self.day_id))
+
+    def recover(self, failure: str):
+        """Log back in if the session expired, and re-read the roster in case a failed add went through"""
+        try:
+            if failure == SESSION_EXPIRED and self.credentials:
+                print("  Session expired; logging in again...")
+                self.login(*self.credentials)
+            self.roster_names = roster_name_set(self.fetch_rows(self.day_id))
+        except requests.RequestException as e:
+            print(f"  Could not recover the class page: {str(e)}")
+
+    def register_student(self, student_name: str, program_name: str, day_name: str) -> str:
+        """Register one student, retrying transient failures; returns None or the failure kind"""
+        return with_retries(lambda attempt: self.try_register(student_name, program_name, day_name), self.recover)
+
+    def register_students(self, student_names: list, program_name: str, day_name: str) -> list:
+        """Register a batch of students in the class opened with open_class, as (name, failure) pairs"""
+        return [(student_name, self.register_student(student_name, program_name, day_name)) for student_name in student_names]
+
+    def refresh(self):
+        """Log in again; nothing else is cached between watch cycles"""
+        if self.credentials:
+            self.login(*self.credentials)
+
+    def return_to_program(self, program_id: str) -> bool:
+        return True  # Nothing to navigate back from
+
+    def close(self):
+        self.session.close()
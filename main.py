@@ -1,612 +1,320 @@
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
-from webdriver_manager.chrome import ChromeDriverManager
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import TimeoutException, NoSuchElementException
-import time
-import os
-import csv
+"""Command line entry point: scrape, plan, register and report.
 
+Selenium is only imported once a command actually starts a browser (see
+browser.py), so `plan` and `report` start without it.
+"""
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import queue
+import sys
+import threading
+import time
 
-def wait_and_click(driver, by, value, timeout=10):
-    """Wait for element to be clickable and click it"""
-    try:
-        # Wait for element to be clickable
-        element = WebDriverWait(driver, timeout).until(
-            EC.element_to_be_clickable((by, value))
-        )
-        # Scroll element into view
-        driver.execute_script("arguments[0].scrollIntoView(true);", element)
-        time.sleep(0.2)  # Reduced delay for scroll
-        
-        # Try regular click first
-        try:
-            element.click()
-        except:
-            # If regular click fails, try JavaScript click
-            try:
-                driver.execute_script("arguments[0].click();", element)
-            except:
-                # If both fail, try to refresh the element and click again
-                element = WebDriverWait(driver, timeout).until(
-                    EC.element_to_be_clickable((by, value))
-                )
-                driver.execute_script("arguments[0].click();", element)
-        return True
-    except Exception as e:
-        print(f"Error clicking element {value}: {str(e)}")
-        return False
+from attendance import (
+    LOW_ATTENDANCE_THRESHOLD, format_student_name, normalize_name, summarize_attendance, plan_registrations,
+    roster_fingerprint,
+)
+from settings import BASE_URL, AVAC_USERNAME, AVAC_PASSWORD
+from account_cache import AccountCache
+from governor import Governor
+from snapshot_store import SnapshotStore
+from result_sink import ResultSink
+from retries import ATTENDANCE_NOT_READ, CLASS_NOT_OPENED, failure_label, is_transient
+from run_journal import RunJournal, read_failures
+from special_decisions import SpecialDecisions
+from waitlist_promotion import WaitlistPromotion
+from spans import TRACER, span
+import planner
 
-def wait_for_element(driver, by, value, timeout=10):
-    """Wait for element to be present"""
-    try:
-        element = WebDriverWait(driver, timeout).until(
-            EC.presence_of_element_located((by, value))
-        )
-        return element
-    except TimeoutException:
-        print(f"Timeout waiting for element: {value}")
-        return None
 
-def wait_for_element_visible(driver, by, value, timeout=10):
-    """Wait for element to be visible"""
-    try:
-        element = WebDriverWait(driver, timeout).until(
-            EC.visibility_of_element_located((by, value))
-        )
-        return element
-    except TimeoutException:
-        print(f"Timeout waiting for element to be visible: {value}")
-        return None
+def scrape_program(engine, program: tuple, all_names: dict, store=None, journal=None, sink=None, promotion=None,
+                   failures=None):
+    """Scrape last month's attendance for one program and return its session links (None when there is nothing to register).
 
-def select_program(driver, program_id):
-    """Select a program by its ID"""
-    program_link = f"row_program_{program_id}"
-    try:
-        # First check if the program is already selected
-        element = WebDriverWait(driver, 5).until(
-            EC.presence_of_element_located((By.ID, program_link))
-        )
-        if "selected_row" in element.get_attribute("class"):
-            return True
-        return wait_and_click(driver, By.ID, program_link)
-    except TimeoutException:
-        return False
-
-def select_session(driver, session_id):
-    """Select a session by its ID"""
-    session_link = f"row_session_{session_id}"
-    return wait_and_click(driver, By.ID, session_link)
-
-def select_day(driver, day_id):
-    """Select a day by its ID"""
-    day_link = f"row_day_{day_id}"
-    return wait_and_click(driver, By.ID, day_link)
-
-# Helper to normalize and expand day names
-DAY_ALIASES = {
-    'mon': 'monday', 'monday': 'monday',
-    'tue': 'tuesday', 'tues': 'tuesday', 'tuesday': 'tuesday',
-    'wed': 'wednesday', 'weds': 'wednesday', 'wednesday': 'wednesday',
-    'thu': 'thursday', 'thurs': 'thursday', 'thursday': 'thursday',
-    'fri': 'friday', 'friday': 'friday',
-    'sat': 'saturday', 'saturday': 'saturday',
-    'sun': 'sunday', 'sunday': 'sunday',
-}
-def normalize_days(day_field):
-    days = set()
-    if not day_field:
-        return days
-    for part in day_field.lower().replace('/', ',').replace('&', ',').split(','):
-        part = part.strip()
-        for alias, norm in DAY_ALIASES.items():
-            if part.startswith(alias):
-                days.add(norm)
-    return days
-
-def normalize_name(name):
-    return ' '.join(name.strip().lower().split())
-
-# Load special enrollment list at the global scope (names only, case-insensitive, stripped, normalized, ignore headers/sections)
-SPECIAL_ENROLLMENT_NAMES = set()
-try:
-    with open('special_enrollment.csv', newline='', encoding='utf-8') as csvfile:
-        for i, row in enumerate(csv.reader(csvfile)):
-            if not row:
-                continue
-            name = row[0].strip()
-            # Ignore empty, whitespace, or section header rows (e.g., 'Jr. Beginning Picklball')
-            if not name or 'jr.' in name.lower() or 'tots' in name.lower() or 'foundations' in name.lower() or 'competition' in name.lower() or 'training' in name.lower() or 'tournament' in name.lower():
-                continue
-            SPECIAL_ENROLLMENT_NAMES.add(normalize_name(name))
-except Exception:
-    try:
-        with open('special_enrollment.txt', encoding='utf-8') as txtfile:
-            for line in txtfile:
-                parts = line.strip().split(',')
-                if parts:
-                    name = parts[0].strip()
-                    if name:
-                        SPECIAL_ENROLLMENT_NAMES.add(normalize_name(name))
-    except Exception:
-        pass
-print("[DEBUG] Special enrollment names loaded:", SPECIAL_ENROLLMENT_NAMES)
-
-def register_student(driver, student_name: str, program_name: str, day_name: str):
-    """Register a student in the current class"""
-    try:
-        # Format the name as 'FirstName LastName' for registration
-        # If the name is in 'LastName, FirstName' format, convert it
-        if ',' in student_name:
-            last_name, first_name = [x.strip() for x in student_name.split(",", 1)]
-            formatted_name = f"{first_name} {last_name}"
-        else:
-            formatted_name = student_name
-        norm_formatted_name = normalize_name(formatted_name)
-        print(f"[DEBUG] Checking special enrollment for: '{norm_formatted_name}'")
-        # First check if student is already enrolled in this class
-        try:
-            attendance_container = WebDriverWait(driver, 5).until(
-                EC.presence_of_element_located((By.CSS_SELECTOR, ".attendance_container.attendance_table_container"))
-            )
-            table_body = attendance_container.find_element(By.ID, "table-body")
-            rows = table_body.find_elements(By.TAG_NAME, "tr")
-            for row in rows:
-                try:
-                    name_elements = row.find_elements(By.CSS_SELECTOR, ".second-col a")
-                    for name_element in name_elements:
-                        full_name = name_element.text.strip()
-                        if ',' in full_name:
-                            last_name, first_name = [x.strip() for x in full_name.split(",", 1)]
-                            current_name = f"{first_name} {last_name}"
-                        else:
-                            current_name = full_name
-                        if normalize_name(current_name) == norm_formatted_name:
-                            print(f"  ✓ Already registered: {formatted_name}")
-                            return True
-                except Exception:
-                    continue
-        except Exception:
-            pass
-        # If student is not enrolled, proceed with registration
-        print(f"  Attempting to register: {student_name}")
-        # Check special enrollment names before enrolling
-        if norm_formatted_name in SPECIAL_ENROLLMENT_NAMES:
-            while True:
-                user_input = input(f"  {formatted_name} is on the special enrollment spreadsheet. Enroll as normal? (y/n): ").strip().lower()
-                if user_input == 'y':
-                    break
-                elif user_input == 'n':
-                    print(f"  Skipping enrollment for {formatted_name} as per user input.")
-                    return True  # Skip normal Add, treat as handled
-        # Click the Register User button using JavaScript
-        register_button = WebDriverWait(driver, 10).until(
-            EC.presence_of_element_located((By.ID, "registerUserLink"))
-        )
-        driver.execute_script("arguments[0].click();", register_button)
-        time.sleep(0.3)  # Reduced wait time
-        # Find and fill the input field
-        input_field = WebDriverWait(driver, 10).until(
-            EC.presence_of_element_located((By.ID, "userInput"))
-        )
-        input_field.clear()  # Clear any existing text
-        input_field.send_keys(formatted_name)  # Type the student name
-        time.sleep(0.3)  # Reduced wait time
-        # Click the element with name='1' after typing the name
-        try:
-            name1_elem = WebDriverWait(driver, 3).until(
-                EC.element_to_be_clickable((By.NAME, "1"))
-            )
-            name1_elem.click()
-            time.sleep(0.1)
-            # After clicking name='1', click the element with value='Add'
-            add_elem = WebDriverWait(driver, 3).until(
-                EC.element_to_be_clickable((By.CSS_SELECTOR, "input[value='Add']"))
-            )
-            add_elem.click()
-            time.sleep(0.1)  # Minimal wait for UI update
-            # After pressing Add, scan the attendance table for the child's name
-            try:
-                attendance_container = WebDriverWait(driver, 10).until(
-                    EC.presence_of_element_located((By.CSS_SELECTOR, ".attendance_container.attendance_table_container"))
-                )
-                table_body = attendance_container.find_element(By.ID, "table-body")
-                rows = table_body.find_elements(By.TAG_NAME, "tr")
-                found = False
-                for row in rows:
-                    try:
-                        name_elements = row.find_elements(By.CSS_SELECTOR, ".second-col a")
-                        for name_element in name_elements:
-                            full_name = name_element.text.strip()
-                            if ',' in full_name:
-                                last_name, first_name = [x.strip() for x in full_name.split(",", 1)]
-                                current_name = f"{first_name} {last_name}"
-                            else:
-                                current_name = full_name
-                            if current_name == formatted_name:
-                                found = True
-                                break
-                        if found:
-                            break
-                    except Exception:
-                        continue
-                if found:
-                    print(f"  ✓ Successfully registered: {formatted_name}")
-                    return True
-                else:
-                    print(f"  ✗ Failed to register: {formatted_name}")
-                    return False
-            except Exception as e:
-                print(f"  ✗ Failed to register: {formatted_name} (attendance table not found, error: {e})")
-                return False
-        except Exception as e:
-            print(f"  ⚠️  Could not click element with name='1' or value='Add': {e}")
-            return False
-        
-        # Wait for the dropdown menu to appear
-        dropdown = WebDriverWait(driver, 10).until(
-            EC.presence_of_element_located((By.ID, "ac_ul"))
-        )
-        
-        # Get all matching student entries
-        student_entries = dropdown.find_elements(By.XPATH, f".//span[contains(., '{student_name}')]")
-        
-        if not student_entries:
-            print(f"  ✗ No matching accounts found for: {student_name}")
-            return False
-            
-        if len(student_entries) > 1:
-            print(f"\n⚠️  Scheduler Alert: Multiple accounts found for {student_name} in {program_name} - {day_name}")
-            print("   Please manually select the correct account.")
-            return False
-            
-        # Get the parent element that contains the full student info
-        student_element = student_entries[0].find_element(By.XPATH, "./..")
-        
-        # Click the student entry using JavaScript
-        driver.execute_script("arguments[0].click();", student_element)
-        time.sleep(0.3)  # Reduced wait time
-        
-        # Click the Add button using JavaScript
-        add_button = WebDriverWait(driver, 10).until(
-            EC.presence_of_element_located((By.CSS_SELECTOR, "input.button.bold[value='Add']"))
-        )
-        driver.execute_script("arguments[0].click();", add_button)
-        
-        # Wait for the registration to complete
-        time.sleep(0.5)  # Reduced wait time
-        
-        # Verify the student was actually registered by searching the attendance table in the correct container
-        try:
-            attendance_container = WebDriverWait(driver, 10).until(
-                EC.presence_of_element_located((By.CSS_SELECTOR, ".attendance_container.attendance_table_container"))
-            )
-            table_body = attendance_container.find_element(By.ID, "table-body")
-            rows = table_body.find_elements(By.TAG_NAME, "tr")
-            check_name = formatted_name
-            found = False
-            for row in rows:
-                try:
-                    # Only look for rows with a second-col
-                    name_elements = row.find_elements(By.CSS_SELECTOR, ".second-col a")
-                    for name_element in name_elements:
-                        full_name = name_element.text.strip()
-                        if ',' in full_name:
-                            last_name, first_name = [x.strip() for x in full_name.split(",", 1)]
-                            current_name = f"{first_name} {last_name}"
-                        else:
-                            current_name = full_name
-                        if current_name == check_name:
-                            found = True
-                            break
-                    if found:
-                        break
-                except Exception:
-                    continue
-            if found:
-                print(f"  ✓ Successfully registered: {check_name}")
-                return True
-            else:
-                print(f"  ✗ Failed to register: {check_name}")
-                return False
-        except Exception as e:
-            print(f"  ✗ Failed to register: {check_name} (attendance table not found, error: {e})")
-            return False
-        
-    except Exception as e:
-        print(f"Failed to register student {student_name}: {str(e)}")
-        return False
-
-def process_students(driver, program_name: str, day_name: str, student_names: list):
-    """Process students for a specific class"""
-    print(f"\n🔄 Processing students for {program_name} - {day_name}")
-    
-    # Click the program
-    program_id = driver.find_element(By.CSS_SELECTOR, "a[id^='row_program_'].selected_row").get_attribute("id").replace("row_program_", "")
-    if not select_program(driver, program_id):
-        return
-    
-    # Get all session links
-    session_list = wait_for_element_visible(driver, By.ID, f"program_{program_id}_list")
-    if not session_list:
-        return
+    A class whose attendance does not load is added to failures, for the end-of-run pass.
+    """
+    program_id, program_name = program
     
-    session_links = session_list.find_elements(By.CSS_SELECTOR, "a[id^='row_session_']")
-    if not session_links:
-        return
-    
-    # Select the last month (April 2025)
-    last_session = session_links[-1]
-    session_id = last_session.get_attribute("id").replace("row_session_", "")
-    if not select_session(driver, session_id):
-        return
-    
-    # Get the first day
-    day_list = wait_for_element_visible(driver, By.ID, f"session_{session_id}_list")
-    if not day_list:
-        return
+    # Initialize the program's dictionary if it doesn't exist
+    if program_name not in all_names:
+        all_names[program_name] = {}
     
-    day_links = day_list.find_elements(By.CSS_SELECTOR, "a[id^='row_day_']")
-    if not day_links:
-        return
-    
-    # Select the first day
-    first_day = day_links[0]
-    day_id = first_day.get_attribute("id").replace("row_day_", "")
-    if not select_day(driver, day_id):
-        return
+    # Finished before an interrupted run stopped
+    if journal and journal.program_done(program_id):
+        all_names[program_name].update(journal.program_names(program_id))
+        print(f"\nSkipping {program_name} (finished in the previous run)")
+        return None
     
-    # Process attendance page
-    if not wait_and_click(driver, By.ID, "attendance"):
-        return
+    # Get all sessions of the program
+    session_links = engine.list_sessions(program_id)
+    if session_links is None:
+        return None
     
-    # Register each student
-    for student_name in student_names:
-        print(f"  Attempting to register: {student_name}")
-        if register_student(driver, student_name, program_name, day_name):
-            print(f"  ✓ Successfully registered: {student_name}")
+    # Always select previous month for attendance (second-to-last session)
+    if len(session_links) >= 2:
+        previous_session_id, previous_session_name = session_links[-2]  # Second to last month
+        # A newer month exists, so this one is finished and its saved attendance can be reused
+        previous_day_links = store.get_days(program_id, previous_session_id) if store else None
+        if previous_day_links is None:
+            previous_day_links = engine.list_days(program_id, previous_session_id)
+            if previous_day_links is None:
+                return None
+        # Process all available days in previous month
+        scraped_all = True
+        for previous_day_id, previous_day_name in previous_day_links:
+            journal_names = journal.scraped(program_id, previous_session_id, previous_day_id) if journal else None
+            if journal_names is not None:
+                print(f"\nAlready scraped {program_name} - {previous_day_name}")
+                if promotion:
+                    promotion.collect(program_name, previous_day_name,
+                                      journal.scraped_waitlist(program_id, previous_session_id, previous_day_id))
+                if journal_names:
+                    all_names[program_name][previous_day_name] = journal_names
+                continue
+            roster = store.get(program_id, previous_session_id, previous_day_id) if store else None
+            if roster is not None:
+                print(f"\nUsing saved attendance for {program_name} - {previous_day_name}")
+            else:
+                with span("scrape_class", session_id=previous_session_id, day_id=previous_day_id, day=previous_day_name):
+                    roster = engine.read_attendance(program_id, previous_session_id, previous_day_id, program_name, previous_day_name)
+                if roster is None:
+                    scraped_all = False
+                    if failures is not None:
+                        failures.append({"program": program_name, "day": previous_day_name, "student": "whole class",
+                                         "failure": ATTENDANCE_NOT_READ, "program_id": program_id,
+                                         "session_id": previous_session_id, "day_id": previous_day_id})
+                    continue
+                # Empty rosters are usually a page that failed to load, so they are not saved
+                if store and roster["students"]:
+                    store.put(program_id, previous_session_id, previous_day_id, program_name, previous_day_name, roster, finished=True)
+                else:
+                    scraped_all = False
+                if not engine.return_to_program(program_id):
+                    break
+            # Process previous month attendance and collect names
+            previous_names, waitlist_names = summarize_attendance(roster, program_name, previous_day_name)
+            if promotion:
+                promotion.collect(program_name, previous_day_name, waitlist_names)
+            if sink:
+                sink.roster(program_name, previous_day_name, roster, LOW_ATTENDANCE_THRESHOLD)
+            if previous_names:
+                all_names[program_name][previous_day_name] = previous_names
+            if journal:
+                journal.record("scrape", program_id=program_id, session_id=previous_session_id, day_id=previous_day_id,
+                               program=program_name, day=previous_day_name, names=previous_names, waitlist=waitlist_names)
         else:
-            print(f"  ✗ Failed to register: {student_name}")
-
-def process_attendance(driver, program_name: str, day_name: str) -> tuple:
-    """Process the attendance page and return list of participant names and waitlisted students"""
-    # Click the Attendance button with retry
-    max_retries = 3
-    for attempt in range(max_retries):
-        if wait_and_click(driver, By.ID, "attendance"):
-            break
-        if attempt == max_retries - 1:
-            print(f"Failed to access attendance for {program_name} - {day_name}")
-            return [], []
-        time.sleep(1)
-    
-    # Wait for the attendance table to load
-    try:
-        table_body = WebDriverWait(driver, 10).until(
-            EC.presence_of_element_located((By.ID, "table-body"))
-        )
-    except TimeoutException:
-        print(f"No attendance data found for {program_name} - {day_name}")
-        return [], []
-    
-    names = []
-    waitlist_names = []
-    low_attendance_students = []
-    
-    # Find all rows in the table
-    rows = table_body.find_elements(By.TAG_NAME, "tr")
+            if store and scraped_all:
+                store.put_days(program_id, previous_session_id, previous_day_links)
+    return session_links
+
+def register_program(engine, program: tuple, session_links: list, all_names: dict, failures: list,
+                     journal=None, decisions=None, sink=None, promotion=None, store=None, only_days=None):
+    """Register this month's classes of one program from the names scraped for it.
+
+    With a store, each class handled without failures gets its roster fingerprint
+    saved, and students staff removed from a class since an earlier pass are
+    not added back; only_days limits the pass to those day ids.
+    """
+    program_id, program_name = program
+    if decisions is None:
+        decisions = SpecialDecisions()
     
-    for row in rows:
-        try:
-            # Check for waitlist section
-            if "attendance-separator" in row.get_attribute("class"):
-                separator_text = row.find_element(By.CSS_SELECTOR, "td.separator").text
-                if "Waitlisted" in separator_text:
-                    # Get waitlisted student names
-                    waitlist_rows = row.find_elements(By.XPATH, "following-sibling::tr[not(contains(@class, 'separator')) and not(contains(@class, 'attendance-separator'))]")
-                    for waitlist_row in waitlist_rows:
-                        if waitlist_row.find_elements(By.CSS_SELECTOR, "td"):
-                            name_element = waitlist_row.find_element(By.CSS_SELECTOR, ".second-col a")
-                            full_name = name_element.text.strip()
-                            last_name, first_name = full_name.split(", ")
-                            waitlist_names.append(f"{first_name} {last_name}")
-                    
-                    if waitlist_names:
-                        print(f"\n⚠️  Scheduler Alert: {len(waitlist_names)} student(s) on waitlist for {program_name} - {day_name}")
-                        print("   Consider enrolling them if there is space available.")
-                    break
-                elif "Make-up" in separator_text:
-                    break
-                    
-            # Skip separator rows and empty rows
-            if "separator" in row.get_attribute("class") or "attendance-separator" in row.get_attribute("class"):
+    # Always select the last available month for registration
+    if len(session_links) >= 1:
+        last_session_id, last_session_name = session_links[-1]  # Last available month
+        last_day_links = engine.list_days(program_id, last_session_id)
+        if last_day_links is None:
+            return
+        # Process all available days in last available month
+        finished = True
+        for last_day_id, last_day_name in last_day_links:
+            if only_days is not None and last_day_id not in only_days:
                 continue
-                
-            if not row.find_elements(By.CSS_SELECTOR, "td"):
-                continue
-                
-            # Get the full name and split it into first and last
-            name_element = row.find_element(By.CSS_SELECTOR, ".second-col a")
-            full_name = name_element.text.strip()
-            last_name, first_name = full_name.split(", ")
-            current_name = f"{first_name} {last_name}"
-            
-            # Get phone number if available
-            try:
-                phone_element = row.find_element(By.CSS_SELECTOR, ".staff-phone")
-                phone_number = phone_element.text.strip()
-            except NoSuchElementException:
-                phone_number = "No phone number available"
-            
-            # Count present checkboxes
-            present_count = 0
-            checkbox_cells = row.find_elements(By.CSS_SELECTOR, "td.date")
-            for cell in checkbox_cells:
-                try:
-                    checkbox = cell.find_element(By.CSS_SELECTOR, "a.checkbox")
-                    if "active" in checkbox.get_attribute("class"):
-                        present_count += 1
-                except NoSuchElementException:
+            student_names = all_names[program_name].get(last_day_name, [])
+            if journal:
+                student_names = [name for name in student_names if not journal.registered(program_id, last_day_id, name)]
+                if last_day_name in all_names[program_name] and not student_names:
+                    print(f"\nAlready registered {program_name} - {last_day_name} in the previous run")
                     continue
-            
-            # If student has less than 3 present checkboxes, add to low attendance list
-            if present_count < 3:
-                low_attendance_students.append({
-                    "name": current_name,
-                    "phone": phone_number,
-                    "present_count": present_count
-                })
-            
-            names.append(current_name)
-            
-        except NoSuchElementException:
-            continue  # Silently skip rows without name elements
-        except Exception:
-            continue  # Silently skip any other errors
-    
-    # Print attendance summary
-    if names:
-        print(f"\n{program_name} - {day_name}:")
-        for name in names:
-            print(f"  {name}")
-    
-    # Alert about low attendance students
-    if low_attendance_students:
-        print(f"\n⚠️  Scheduler Alert: {len(low_attendance_students)} student(s) with low attendance in {program_name} - {day_name}")
-        for student in low_attendance_students:
-            print(f"\n  Student: {student['name']}")
-            print(f"  Phone: {student['phone']}")
-            print(f"  Present: {student['present_count']} out of 4 sessions")
-            response = 'n'  # Automatically skip re-enrollment prompts
-            if response.lower() == 'y':
-                print(f"  ✓ Added to re-enrollment list: {student['name']}")
-                names.append(student['name'])
-    
-    return names, waitlist_names
+            with span("open_class", session_id=last_session_id, day_id=last_day_id, day=last_day_name):
+                opened = engine.open_class(program_id, last_session_id, last_day_id)
+            if not opened:
+                finished = False
+                if last_day_name in all_names[program_name]:
+                    # Nobody could be tried; the end-of-run pass opens the class again
+                    to_register, held = decisions.screen(student_names, program_name, last_day_name)
+                    hold_students(held, program_id, program_name, last_day_id, last_day_name, failures, journal, sink)
+                    print(f"\n↻ Retrying {program_name} - {last_day_name} at the end of the run (class page did not open)")
+                    for student_name in to_register:
+                        failures.append({"program": program_name, "day": last_day_name, "student": student_name,
+                                         "failure": CLASS_NOT_OPENED, "program_id": program_id,
+                                         "session_id": last_session_id, "day_id": last_day_id})
+                        if sink:
+                            sink.registration(program_name, last_day_name, student_name, "failed", failure_label(CLASS_NOT_OPENED))
+                        if journal:
+                            journal.record("register", program_id=program_id, day_id=last_day_id, program=program_name,
+                                           day=last_day_name, student=student_name, status="failed", failure=CLASS_NOT_OPENED)
+                continue
+            failures_before = len(failures)
+            # Register students for this day
+            if last_day_name in all_names[program_name]:
+                print(f"\n🔄 Registering students for {program_name} - {last_day_name}")
+                # Someone who left the roster after an earlier pass was dropped on purpose
+                removed = store.removed_students(program_id, last_session_id, last_day_id, engine.roster_names) if store else set()
+                for student_name in student_names:
+                    if normalize_name(format_student_name(student_name)) in removed:
+                        print(f"  Not adding back {format_student_name(student_name)}: removed from this class after an earlier run")
+                        if sink:
+                            sink.registration(program_name, last_day_name, student_name, "skipped", "removed from the class")
+                # Only the students missing from this month's roster need browser work
+                to_register, already_registered = plan_registrations(student_names, engine.roster_names, skip=removed)
+                # Waitlisted students fill the spots left after the continuing students, in this same pass
+                promoted = []
+                if promotion:
+                    promoted, waiting = promotion.promote(program_name, last_day_name, engine.enrolled_count,
+                                                          to_register, engine.roster_names | removed)
+                    for student_name in promoted:
+                        print(f"  ⬆ Promoting from the waitlist: {format_student_name(student_name)}")
+                    for student_name in waiting:
+                        print(f"  Still waitlisted (class full): {format_student_name(student_name)}")
+                # Special enrollment students only go ahead with a decision made before the run
+                to_register, held = decisions.screen(to_register + promoted, program_name, last_day_name)
+                print(f"  {len(to_register)} to register, {len(already_registered)} already registered")
+                hold_students(held, program_id, program_name, last_day_id, last_day_name, failures, journal, sink)
+                results = [(student_name, None) for student_name in already_registered]
+                for student_name, _ in results:
+                    print(f"  ✓ Already registered: {format_student_name(student_name)}")
+                with span("register_class", session_id=last_session_id, day_id=last_day_id, day=last_day_name,
+                          students=len(to_register)):
+                    results += engine.register_students(to_register, program_name, last_day_name)
+                # Successes were already reported as each add happened
+                for index, (student_name, failure) in enumerate(results):
+                    if failure is None:
+                        status = "ok"
+                    else:
+                        # Only the final summary says "Failed to register"; the end-of-run pass may still add them
+                        if is_transient(failure):
+                            print(f"  ↻ Retrying at the end of the run: {student_name} ({failure_label(failure)})")
+                        else:
+                            print(f"  ⚠️  Needs a person: {student_name} ({failure_label(failure)})")
+                        failures.append({"program": program_name, "day": last_day_name, "student": student_name,
+                                         "failure": failure, "program_id": program_id,
+                                         "session_id": last_session_id, "day_id": last_day_id})
+                        status = "failed"
+                    if sink:
+                        sink_status = status
+                        if index < len(already_registered):
+                            sink_status = "already_registered"
+                        elif status == "ok" and student_name in promoted:
+                            sink_status = "promoted"
+                        sink.registration(program_name, last_day_name, student_name, sink_status,
+                                          failure_label(failure) if failure else None)
+                    if journal:
+                        journal.record("register", program_id=program_id, day_id=last_day_id, program=program_name,
+                                       day=last_day_name, student=student_name, status=status, failure=failure)
+            # The roster as it now stands, our own adds included, so a watch cycle only revisits it when it changes
+            if store:
+                store.put_class_names(program_id, last_session_id, last_day_id, engine.roster_names)
+                if len(failures) == failures_before:
+                    store.put_fingerprint(program_id, last_session_id, last_day_id, roster_fingerprint(engine.roster_names))
+            if not engine.return_to_program(program_id):
+                finished = False
+                break
+        # A class whose last month did not load still has to be registered by the end-of-run pass
+        scrape_failed = any(failure.get("failure") == ATTENDANCE_NOT_READ and failure["program_id"] == program_id
+                            for failure in failures)
+        if journal and finished and not scrape_failed:
+            journal.record("program_done", program_id=program_id, program=program_name)
 
-def process_programs(driver):
-    """Process all programs and their associated sessions and days"""
-    # Store all names by program and day for summary
-    all_names = {}
-    
-    # Wait for the all-events container to be present
-    try:
-        events_container = WebDriverWait(driver, 10).until(
-            EC.presence_of_element_located((By.ID, "all-events-container"))
-        )
-    except TimeoutException:
-        print("Failed to load events container")
-        return
+def hold_students(held: list, program_id: str, program_name: str, day_id: str, day_name: str, failures: list,
+                  journal=None, sink=None):
+    """Report the students a special enrollment decision holds back; those still without one go to failures"""
+    for student_name, hold in held:
+        if hold == "skipped":
+            print(f"  Skipping enrollment for {format_student_name(student_name)} as decided")
+        else:
+            print(f"  ? Special enrollment decision needed: {format_student_name(student_name)}")
+            failures.append({"program": program_name, "day": day_name,
+                             "student": f"{student_name} (special enrollment decision needed)"})
+        if journal:
+            journal.record("register", program_id=program_id, day_id=day_id,
+                           program=program_name, day=day_name, student=student_name, status=hold)
+        if sink:
+            sink.registration(program_name, day_name, student_name, hold)
 
-    # Wait for the events block to be present
-    try:
-        events_block = WebDriverWait(driver, 10).until(
-            EC.presence_of_element_located((By.ID, "eventsBlock"))
-        )
-    except TimeoutException:
-        print("Failed to load events block")
-        return
+def process_program(engine, program: tuple, all_names: dict, failures: list, store=None, journal=None,
+                    register: bool = True, decisions=None, sink=None, promotion=None):
+    """Scrape last month and, unless register is False, register this month for one program"""
+    session_links = scrape_program(engine, program, all_names, store, journal, sink, promotion, failures)
+    if register and session_links is not None:
+        register_program(engine, program, session_links, all_names, failures, journal, decisions, sink, promotion, store)
 
-    # Get all program links from the first column
-    program_count = len(driver.find_elements(By.CSS_SELECTOR, "#programBlock a[id^='row_program_']"))
-    for i in range(program_count):
-        # Re-fetch the program links every time
-        program_links = driver.find_elements(By.CSS_SELECTOR, "#programBlock a[id^='row_program_']")
-        program_link = program_links[i]
-        program_id = program_link.get_attribute("id").replace("row_program_", "")
-        program_name = program_link.text
-        
-        # Initialize the program's dictionary if it doesn't exist
-        if program_name not in all_names:
-            all_names[program_name] = {}
-        
-        # Click the program
-        if not select_program(driver, program_id):
-            continue
-            
-        # Wait for the session list to be visible
-        session_list = wait_for_element_visible(driver, By.ID, f"program_{program_id}_list")
-        if not session_list:
-            continue
-            
-        # Get all session links from the visible list
-        session_links = session_list.find_elements(By.CSS_SELECTOR, "a[id^='row_session_']")
-        
-        # Always select previous month for attendance (second-to-last session)
-        if len(session_links) >= 2:
-            previous_session = session_links[-2]  # Second to last month
-            previous_session_id = previous_session.get_attribute("id").replace("row_session_", "")
-            previous_session_name = previous_session.text
-            
-            # Click the previous session
-            if not select_session(driver, previous_session_id):
-                continue
-            
-            # Wait for the day list to be visible
-            previous_day_list = wait_for_element_visible(driver, By.ID, f"session_{previous_session_id}_list")
-            if not previous_day_list:
-                continue
-            
-            # Get all day links from the visible list
-            previous_day_links = previous_day_list.find_elements(By.CSS_SELECTOR, "a[id^='row_day_']")
-            # Process all available days in previous month
-            for previous_day_link in previous_day_links:
-                previous_day_id = previous_day_link.get_attribute("id").replace("row_day_", "")
-                previous_day_name = previous_day_link.text
-                # Click the previous day
-                if not select_day(driver, previous_day_id):
-                    continue
-                # Process previous month attendance and collect names
-                previous_names, _ = process_attendance(driver, program_name, previous_day_name)
-                if previous_names:
-                    all_names[program_name][previous_day_name] = previous_names
-                # Go back to program selection
-                if not select_program(driver, program_id):
-                    break
-        
-        # Always select the last available month for registration
-        if len(session_links) >= 1:
-            last_session = session_links[-1]  # Last available month
-            last_session_id = last_session.get_attribute("id").replace("row_session_", "")
-            last_session_name = last_session.text
-            
-            # Click the last session
-            if not select_session(driver, last_session_id):
+def retry_failed_registrations(engine, failures: list, journal=None, sink=None, decisions=None, promotion=None, store=None):
+    """Give every registration that failed for a transient reason one more pass, class by class.
+
+    Classes that did not open are opened again, and classes whose last month
+    did not load are scraped again and then registered. Registered students
+    are taken off the failures list; what is left needs a person.
+    """
+    queued = {}
+    rescrape = {}
+    for failure in failures:
+        if failure.get("failure") == ATTENDANCE_NOT_READ:
+            rescrape.setdefault((failure["program_id"], failure["program"]), []).append(failure)
+        elif is_transient(failure.get("failure")):
+            queued.setdefault((failure["program_id"], failure["session_id"], failure["day_id"]), []).append(failure)
+    if not queued and not rescrape:
+        return
+    if queued:
+        print(f"\n🔁 Retrying {sum(len(class_failures) for class_failures in queued.values())} failed registration(s)...")
+    for (program_id, session_id, day_id), class_failures in queued.items():
+        program_name, day_name = class_failures[0]["program"], class_failures[0]["day"]
+        with span("retry_class", program_id=program_id, program=program_name, session_id=session_id,
+                  day_id=day_id, day=day_name, students=len(class_failures)):
+            if not engine.open_class(program_id, session_id, day_id):
+                # Its students stay on the failures list for a person
+                print(f"\n⚠️  {program_name} - {day_name} did not open again")
                 continue
-            
-            # Wait for the current day list to be visible
-            last_day_list = wait_for_element_visible(driver, By.ID, f"session_{last_session_id}_list")
-            if not last_day_list:
+            print(f"\n🔄 Retrying {program_name} - {day_name}")
+            # Some of the adds may have gone through after all
+            names = [failure["student"] for failure in class_failures]
+            to_register, already_registered = plan_registrations(names, engine.roster_names)
+            outcomes = dict.fromkeys(already_registered)
+            outcomes.update(engine.register_students(to_register, program_name, day_name))
+            if store:
+                store.put_class_names(program_id, session_id, day_id, engine.roster_names)
+            engine.return_to_program(program_id)
+        for failure in class_failures:
+            outcome = outcomes[failure["student"]]
+            if outcome is None:
+                print(f"  ✓ Registered on retry: {failure['student']}")
+                failures.remove(failure)
+            else:
+                failure["failure"] = outcome
+            if sink:
+                sink.registration(program_name, day_name, failure["student"], "failed" if outcome else "ok",
+                                  failure_label(outcome) if outcome else "retry pass")
+            if journal:
+                journal.record("register", program_id=program_id, day_id=day_id, program=program_name, day=day_name,
+                               student=failure["student"], status="failed" if outcome else "ok", failure=outcome)
+    for program, scrape_failures in rescrape.items():
+        day_names = {failure["day"] for failure in scrape_failures}
+        print(f"\n🔁 Scraping {program[1]} - {', '.join(sorted(day_names))} again...")
+        for failure in scrape_failures:
+            failures.remove(failure)
+        with span("retry_program", program_id=program[0], program=program[1]):
+            all_names = {}
+            # A class that still does not load goes back on the failures list, now for a person
+            session_links = scrape_program(engine, program, all_names, store, journal, sink, promotion, failures)
+            if session_links is None:
                 continue
-            
-            # Get all current day links
-            last_day_links = last_day_list.find_elements(By.CSS_SELECTOR, "a[id^='row_day_']")
-            # Process all available days in last available month
-            for last_day_link in last_day_links:
-                last_day_id = last_day_link.get_attribute("id").replace("row_day_", "")
-                last_day_name = last_day_link.text
-                # Click the current day
-                if not select_day(driver, last_day_id):
-                    continue
-                # Click attendance button
-                if not wait_and_click(driver, By.ID, "attendance"):
-                    continue
-                # Register students for this day
-                if last_day_name in all_names[program_name]:
-                    print(f"\n🔄 Registering students for {program_name} - {last_day_name}")
-                    for student_name in all_names[program_name][last_day_name]:
-                        if register_student(driver, student_name, program_name, last_day_name):
-                            print(f"  ✓ Successfully registered: {student_name}")
-                        else:
-                            print(f"  ✗ Failed to register: {student_name}")
-                # Go back to program selection
-                if not select_program(driver, program_id):
-                    break
+            all_names = {program[1]: {day: names for day, names in all_names.get(program[1], {}).items() if day in day_names}}
+            days = engine.list_days(program[0], session_links[-1][0]) or []
+            register_program(engine, program, session_links, all_names, failures, journal, decisions, sink, promotion,
+                             store, only_days={day_id for day_id, day_name in days if day_name in day_names})
 
-    # Print final summary
+def print_final_summary(all_names: dict, failures: list):
+    """Print the names collected per program and day plus any failed registrations"""
     print("\n=== Final Summary ===")
     for program, days in all_names.items():
         print(f"\n{program}:")
@@ -614,41 +322,516 @@ def process_programs(driver):
             print(f"  {day}:")
             for name in names:
                 print(f"    {name}")
+    if failures:
+        print("\n=== Failed to Register ===")
+        for failure in failures:
+            reason = f" ({failure_label(failure['failure'])})" if failure.get("failure") else ""
+            print(f"  {failure['program']} - {failure['day']}: {failure['student']}{reason}")
 
+def process_programs(engine, programs=None, summary: bool = True, store=None, journal=None,
+                     register: bool = True, decisions=None, sink=None, promotion=None) -> tuple:
+    """Process all programs and their associated sessions and days"""
+    # Store all names by program and day for summary
+    all_names = {}
+    failures = []
 
-def main():
-    """Main function to run the registration tool"""
-    chrome_options = Options()
-    chrome_options.add_argument('--log-level=3')  # Suppress console logs
-    chrome_options.add_experimental_option('excludeSwitches', ['enable-logging'])  # Disable logging
-    # chrome_options.add_argument('--headless=new')
-    # chrome_options.add_argument('--disable-gpu')
-    # chrome_options.add_argument('--no-sandbox')
-    service = Service(ChromeDriverManager().install())
-    driver = webdriver.Chrome(service=service, options=chrome_options)
+    if programs is None:
+        programs = engine.list_programs()
+    for program in programs:
+        with span("program", program_id=program[0], program=program[1]):
+            process_program(engine, program, all_names, failures, store, journal, register, decisions, sink, promotion)
+        # The sink already has the program's names, so the summary does not need to keep them
+        if sink:
+            all_names.pop(program[1], None)
+    if register:
+        retry_failed_registrations(engine, failures, journal, sink, decisions, promotion, store)
+
+    # Print final summary
+    if summary:
+        print_final_summary(all_names, failures)
+    return all_names, failures
+
+def process_programs_parallel(engine, make_engine, workers: int, store=None, journal=None,
+                              register: bool = True, decisions=None, sink=None, promotion=None) -> tuple:
+    """Shard the programs across several logged-in sessions and merge the results"""
+    programs = engine.list_programs()
+    if not programs:
+        return {}, []
+    workers = max(1, min(workers, len(programs)))
+    # Round-robin shards so long and short programs spread evenly
+    shards = [list(enumerate(programs))[w::workers] for w in range(workers)]
+    print(f"Processing {len(programs)} programs across {workers} sessions...")
 
+    def run_shard(worker_id: int, shard: list) -> tuple:
+        # The first shard reuses the already logged-in session
+        worker_engine = engine if worker_id == 0 else None
+        results = []
+        failures = []
+        try:
+            if worker_engine is None:
+                worker_engine = make_engine()
+            for i, program in shard:
+                program_names = {}
+                with span("program", program_id=program[0], program=program[1], worker=worker_id + 1):
+                    process_program(worker_engine, program, program_names, failures, store, journal, register, decisions,
+                                    sink, promotion)
+                results.append((i, {} if sink else program_names))
+        except Exception as e:
+            print(f"\nWorker {worker_id + 1} stopped: {str(e)}")
+            done = {i for i, _ in results}
+            for i, (_, program_name) in shard:
+                if i not in done:
+                    failures.append({"program": program_name, "day": "all days", "student": f"not processed ({str(e)})"})
+        finally:
+            if worker_engine is not None and worker_engine is not engine:
+                worker_engine.close()
+        return results, failures
+
+    all_results = []
+    failures = []
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for results, worker_failures in pool.map(run_shard, range(workers), shards):
+            all_results.extend(results)
+            failures.extend(worker_failures)
+    if register:
+        # The first session is free again once every shard is done
+        retry_failed_registrations(engine, failures, journal, sink, decisions, promotion, store)
+
+    # Merge in program order so the summary matches the serial run
+    all_names = {}
+    for _, program_names in sorted(all_results, key=lambda result: result[0]):
+        for program_name, days in program_names.items():
+            all_names.setdefault(program_name, {}).update(days)
+    print_final_summary(all_names, failures)
+    return all_names, failures
+
+def process_programs_pipelined(engine, make_engine, store=None, journal=None, decisions=None, depth: int = 2,
+                               sink=None, promotion=None) -> tuple:
+    """Scrape the next programs in one session while a second session registers the ones already scraped.
+
+    The stages are joined by a queue of at most `depth` scraped programs, so the
+    scraper never runs far ahead of registration.
+    """
+    programs = engine.list_programs()
+    if not programs:
+        return {}, []
+    all_names = {}
+    failures = []
+    scraped = queue.Queue(maxsize=max(1, depth))
+    stop = threading.Event()
+    scrape_errors = []
+    attempted = set()
+
+    def scrape_stage():
+        try:
+            for program in programs:
+                if stop.is_set():
+                    break
+                with span("scrape_program", program_id=program[0], program=program[1]):
+                    session_links = scrape_program(engine, program, all_names, store, journal, sink, promotion, failures)
+                # Only now: a program whose scrape raised is reported as not processed
+                attempted.add(program[0])
+                if session_links is not None:
+                    scraped.put((program, session_links))
+                elif sink:
+                    all_names.pop(program[1], None)
+        except Exception as e:
+            scrape_errors.append(e)
+        finally:
+            scraped.put(None)
+
+    print(f"Pipelining {len(programs)} programs: one session scrapes while another registers...")
+    scraper = threading.Thread(target=scrape_stage, name="scrape-stage", daemon=True)
+    scraper.start()
+    register_engine = None
+    try:
+        # The second session logs in while the first one is already scraping
+        register_engine = make_engine()
+        while True:
+            item = scraped.get()
+            if item is None:
+                break
+            program, session_links = item
+            with span("register_program", program_id=program[0], program=program[1]):
+                # Open the program in the register session before working in its days
+                if register_engine.list_sessions(program[0]) is None:
+                    failures.append({"program": program[1], "day": "all days", "student": "not processed (program did not open)"})
+                    continue
+                register_program(register_engine, program, session_links, all_names, failures, journal, decisions,
+                                 sink, promotion, store)
+            if sink:
+                all_names.pop(program[1], None)
+    finally:
+        # Unblock the scraper if registration stopped early
+        stop.set()
+        while scraper.is_alive():
+            try:
+                scraped.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        if register_engine is not None:
+            register_engine.close()
+
+    for e in scrape_errors:
+        print(f"\nScraping stopped: {str(e)}")
+        for program_id, program_name in programs:
+            if program_id not in attempted:
+                failures.append({"program": program_name, "day": "all days", "student": f"not processed ({str(e)})"})
+    # The scrape session has finished, so it takes the retry pass
+    retry_failed_registrations(engine, failures, journal, sink, decisions, promotion, store)
+    # Keep the summary in program order
+    all_names = {program_name: all_names[program_name] for _, program_name in programs if program_name in all_names}
+    print_final_summary(all_names, failures)
+    return all_names, failures
+
+def changed_classes(engine, program: tuple, store) -> tuple:
+    """Open this month's classes of a program and return (session_links, day ids whose roster fingerprint changed)"""
+    program_id, program_name = program
+    session_links = engine.list_sessions(program_id)
+    if not session_links:
+        return session_links, set()
+    last_session_id = session_links[-1][0]
+    changed = set()
+    for day_id, day_name in engine.list_days(program_id, last_session_id) or []:
+        with span("fingerprint_class", program_id=program_id, program=program_name, day_id=day_id, day=day_name):
+            # A class that does not open is left for the registration pass to report
+            if not engine.open_class(program_id, last_session_id, day_id):
+                changed.add(day_id)
+                continue
+            if roster_fingerprint(engine.roster_names) != store.get_fingerprint(program_id, last_session_id, day_id):
+                changed.add(day_id)
+    engine.return_to_program(program_id)
+    return session_links, changed
+
+def watch_cycle(engine, store, decisions=None, sink=None, promotion=None) -> list:
+    """Scrape and register only the classes whose roster changed since they were last handled; returns the failures"""
+    failures = []
+    revisited = 0
+    programs = engine.list_programs()
+    for program in programs:
+        with span("watch_program", program_id=program[0], program=program[1]):
+            session_links, changed = changed_classes(engine, program, store)
+            if not changed:
+                continue
+            print(f"\n🔎 {program[1]}: {len(changed)} class(es) changed")
+            revisited += len(changed)
+            all_names = {}
+            session_links = scrape_program(engine, program, all_names, store, None, sink, promotion, failures)
+            if session_links is not None:
+                register_program(engine, program, session_links, all_names, failures, None, decisions, sink,
+                                 promotion, store, only_days=changed)
+    retry_failed_registrations(engine, failures, None, sink, decisions, promotion, store)
+    print(f"\nChecked {len(programs)} programs; {revisited} class(es) had changed.")
+    if failures:
+        print_final_summary({}, failures)
+    return failures
+
+def watch(engine, store, interval: float, cycles: int = 0, decisions=None, sink=None, promotion=None):
+    """Run a watch cycle every `interval` minutes, `cycles` times (0 = until stopped)"""
+    cycle = 0
+    try:
+        while True:
+            cycle += 1
+            print(f"\n=== Watch cycle {cycle} ({time.strftime('%Y-%m-%d %H:%M')}) ===")
+            with span("watch_cycle", cycle=cycle):
+                # Pick up programs and months added since the last cycle
+                engine.refresh()
+                watch_cycle(engine, store, decisions, sink, promotion)
+            if cycles and cycle >= cycles:
+                break
+            print(f"\nNext check in {interval:g} minutes (Ctrl+C to stop)...")
+            time.sleep(interval * 60)
+    except KeyboardInterrupt:
+        print("\nWatch stopped.")
+
+COMMANDS = ("scrape", "plan", "decide", "register", "watch", "report", "analyze")
+
+def parse_args(argv=None):
+    if argv is None:
+        argv = sys.argv[1:]
+    # A bare `python main.py [options]` is a full registration run, as before
+    if not argv or (argv[0].startswith("-") and argv[0] not in ("-h", "--help")):
+        argv = ["register", *argv]
+
+    engine_options = argparse.ArgumentParser(add_help=False)
+    engine_options.add_argument("--workers", type=int, default=1,
+                                help="number of sessions to process programs with (default: 1)")
+    engine_options.add_argument("--max-concurrency", type=int, default=None, metavar="CALLS",
+                                help="most calls to the site in flight at once across sessions (default: one per session); "
+                                     "lowered automatically while the site slows down or refuses calls")
+    engine_options.add_argument("--max-rate", type=float, default=None, metavar="PER_SECOND",
+                                help="most calls to the site started per second across sessions (default: no cap)")
+    engine_options.add_argument("--engine", choices=["browser", "http"], default="browser",
+                                help="drive Chrome, or call the site's endpoints directly without a browser")
+    engine_options.add_argument("--base-url", default=BASE_URL,
+                                help="ClubAutomation site to use, e.g. a local mock_clubautomation.py")
+    engine_options.add_argument("--headless", action="store_true",
+                                help="run Chrome without a window")
+    engine_options.add_argument("--lean", action="store_true",
+                                help="return from page loads at DOM ready and block images, fonts, media and trackers")
+    engine_options.add_argument("--restart-rss", type=float, default=1500, metavar="MB",
+                                help="restart Chrome between classes once its processes use this much memory (default: 1500, 0 = off)")
+    engine_options.add_argument("--restart-heap", type=float, default=512, metavar="MB",
+                                help="restart Chrome between classes once the page's JS heap reaches this size (default: 512, 0 = off)")
+    engine_options.add_argument("--restart-every", type=int, default=250, metavar="CLASSES",
+                                help="restart Chrome after opening this many classes with it (default: 250, 0 = off)")
+    engine_options.add_argument("--profile", default=None,
+                                help="Chrome profile folder to keep the login in between runs")
+    engine_options.add_argument("--fresh-login", action="store_true",
+                                help="log in again instead of reusing the saved session")
+    engine_options.add_argument("--update-driver", action="store_true",
+                                help="look up the latest chromedriver instead of using the cached one")
+    engine_options.add_argument("--deep-links", action="store_true",
+                                help="open each class's attendance by its direct URL instead of clicking through the tree")
+    engine_options.add_argument("--store", default="attendance_snapshots.db",
+                                help="SQLite file that caches finished months' attendance (default: attendance_snapshots.db)")
+    engine_options.add_argument("--no-store", action="store_true",
+                                help="scrape every month again and do not save attendance")
+    engine_options.add_argument("--refresh", action="store_true",
+                                help="ignore saved attendance this run, but save the fresh scrape")
+    engine_options.add_argument("--journal", default="run_journal.jsonl",
+                                help="file that records finished scrapes and registrations (default: run_journal.jsonl)")
+    engine_options.add_argument("--resume", action="store_true",
+                                help="continue an interrupted run, skipping the work its journal records as done")
+    engine_options.add_argument("--spans", default=None,
+                                help="write every timed step of the run to this JSONL file")
+    engine_options.add_argument("--chrome-trace", default=None,
+                                help="write the timed steps as a Chrome trace (open in chrome://tracing or Perfetto)")
+    engine_options.add_argument("--pipeline", action="store_true",
+                                help="scrape the next programs in a second session while registering (register only)")
+    engine_options.add_argument("--pipeline-depth", type=int, default=2,
+                                help="scraped programs allowed to wait for registration (default: 2)")
+    engine_options.add_argument("--results", default=None,
+                                help="stream every roster, alert and registration outcome to this JSONL file")
+    engine_options.add_argument("--results-csv", default=None,
+                                help="stream the same events to this CSV file")
+    engine_options.add_argument("--unattended", action="store_true",
+                                help="never prompt; special enrollment students without a decision are left for the summary")
+    decision_options = argparse.ArgumentParser(add_help=False)
+    decision_options.add_argument("--decisions", default="special_decisions.json",
+                                  help="special enrollment decisions made before the run (default: special_decisions.json)")
+
+    parser = argparse.ArgumentParser(description="Register tennis students from last month's attendance")
+    commands = parser.add_subparsers(dest="command", metavar="{" + ",".join(COMMANDS) + "}")
+    commands.add_parser("scrape", parents=[engine_options],
+                        help="save last month's attendance without registering anyone")
+    planner.add_plan_arguments(commands.add_parser("plan", help="build the enrollment plan from saved attendance"))
+    decide_parser = commands.add_parser("decide", parents=[decision_options],
+                                        help="answer the special enrollment questions for the saved attendance")
+    decide_parser.add_argument("--store", default="attendance_snapshots.db",
+                               help="SQLite store written by a scrape (default: attendance_snapshots.db)")
+    register_options = argparse.ArgumentParser(add_help=False)
+    register_options.add_argument("--promote-waitlist", action="store_true",
+                                  help="also register last month's waitlisted students into open spots (needs --capacity)")
+    register_options.add_argument("--capacity", type=int, default=None,
+                                  help="students a class holds, used to count its open spots")
+    register_options.add_argument("--accounts", default="member_accounts.db",
+                                  help="SQLite file of the member account each student was registered with, "
+                                       "used with --engine http (default: member_accounts.db)")
+    register_options.add_argument("--no-account-cache", action="store_true",
+                                  help="search every student's account by name instead of reusing the saved one")
+    commands.add_parser("register", parents=[engine_options, decision_options, register_options],
+                        help="scrape last month and register this month (the default)")
+    watch_parser = commands.add_parser("watch", parents=[engine_options, decision_options, register_options],
+                                       help="keep checking this month's rosters and register only in the classes that changed")
+    watch_parser.add_argument("--interval", type=float, default=60,
+                              help="minutes between checks (default: 60)")
+    watch_parser.add_argument("--cycles", type=int, default=0,
+                              help="stop after this many checks, e.g. 1 for a daily scheduled task (default: 0 = until stopped)")
+    report_parser = commands.add_parser("report", help="print saved attendance alerts and the last run's failures")
+    report_parser.add_argument("--store", default="attendance_snapshots.db",
+                               help="SQLite store written by a scrape (default: attendance_snapshots.db)")
+    report_parser.add_argument("--journal", default="run_journal.jsonl",
+                               help="journal of the last run (default: run_journal.jsonl)")
+    analyze_parser = commands.add_parser("analyze", help="attendance rate, retention and drop-off across saved months (needs NumPy)")
+    analyze_parser.add_argument("--store", default="attendance_snapshots.db",
+                                help="SQLite store written by a scrape (default: attendance_snapshots.db)")
+    analyze_parser.add_argument("--snapshots", default=None,
+                                help="JSON list of saved snapshots to use instead of the store")
+    analyze_parser.add_argument("--rule", action="append", default=None,
+                                help=f"flag students matching a rule such as 'rate < 0.5' or 'trailing_absences >= 2'; "
+                                     f"repeat to flag on any of several (default: 'present < {LOW_ATTENDANCE_THRESHOLD}')")
+    analyze_parser.add_argument("--json", default=None, help="also write the report to this file")
+    analyze_parser.add_argument("--save-matrix", default=None, help="save the bit-packed attendance matrices to this .npz file")
+    args = parser.parse_args(argv)
+    if getattr(args, "pipeline", False) and args.workers > 1:
+        parser.error("--pipeline runs its own two sessions; leave out --workers")
+    if getattr(args, "promote_waitlist", False) and not args.capacity:
+        parser.error("--promote-waitlist needs --capacity to know how many spots a class has")
+    if args.command == "watch" and (args.no_store or args.pipeline or args.workers > 1):
+        parser.error("watch keeps its fingerprints in the store and runs one session; leave out --no-store, --pipeline and --workers")
+    return args
+
+def make_engine_factory(args, accounts=None, governor=None):
+    """Return a function that opens a new logged-in engine of the requested kind"""
+    if args.engine == "http":
+        from http_engine import HttpEngine
+
+        def make_engine():
+            engine = HttpEngine(args.base_url, accounts=accounts, governor=governor)
+            engine.login(AVAC_USERNAME, AVAC_PASSWORD)
+            return engine
+        return make_engine
+
+    # Deferred so only browser runs pay for importing Selenium
+    from browser import (
+        DriverLifecycle, SeleniumEngine, SessionNotCreatedException, create_driver, login, resolve_driver_path,
+    )
+
+    driver_path = resolve_driver_path(refresh=args.update_driver)
+    # Chrome locks its profile, so only the first session can use it
+    profile_dirs = [args.profile]
+    # Likewise only the first session starts from the saved login; the others log in on their own
+    saved_sessions = [not args.fresh_login]
+
+    def start_driver(profile_dir: str = None, reuse_session: bool = False, cookies: list = None):
+        nonlocal driver_path
+        try:
+            driver = create_driver(driver_path, headless=args.headless, profile_dir=profile_dir, lean=args.lean)
+        except SessionNotCreatedException:
+            # Chrome updated past the cached chromedriver
+            driver_path = resolve_driver_path(refresh=True)
+            driver = create_driver(driver_path, headless=args.headless, profile_dir=profile_dir, lean=args.lean)
+        try:
+            login(driver, reuse_session=reuse_session, base_url=args.base_url, cookies=cookies)
+        except Exception:
+            driver.quit()
+            raise
+        return driver
+
+    def make_engine():
+        profile_dir = profile_dirs.pop() if profile_dirs else None
+        reuse_session = saved_sessions.pop() if saved_sessions else False
+        # A restarted driver keeps the session's profile and picks the login up from its own cookies
+        return SeleniumEngine(start_driver(profile_dir, reuse_session), base_url=args.base_url, deep_links=args.deep_links,
+                              restart=lambda cookies: start_driver(profile_dir, reuse_session, cookies),
+                              lifecycle=DriverLifecycle(args.restart_rss, args.restart_heap, args.restart_every),
+                              governor=governor, reuse_session=reuse_session)
+    return make_engine
+
+def scrape_classes(engine, make_engine=None, sessions: int = 1, store=None, journal=None, sink=None, promotion=None) -> list:
+    """Scrape last month of every program ahead of registering; returns (program_name, day_name, names) per class.
+
+    The programs are sharded across `sessions` sessions, as with --workers;
+    the extra sessions are closed again once their shard is scraped.
+    """
+    programs = engine.list_programs()
+    sessions = max(1, min(sessions, len(programs)))
+    shards = [list(enumerate(programs))[w::sessions] for w in range(sessions)]
+
+    def scrape_shard(worker_id: int, shard: list) -> list:
+        # The first shard uses the already logged-in session
+        shard_engine = engine if worker_id == 0 else None
+        results = []
+        try:
+            if shard_engine is None:
+                shard_engine = make_engine()
+            for i, program in shard:
+                program_names = {}
+                with span("program", program_id=program[0], program=program[1], worker=worker_id + 1):
+                    scrape_program(shard_engine, program, program_names, store, journal, sink, promotion)
+                results.append((i, [(program[1], day_name, names) for day_name, names in program_names.get(program[1], {}).items()]))
+        except Exception as e:
+            # Its programs are scraped again by the registration pass, without a decision for sheet students
+            print(f"\nScraping session {worker_id + 1} stopped: {str(e)}")
+        finally:
+            if shard_engine is not None and shard_engine is not engine:
+                shard_engine.close()
+        return results
+
+    with ThreadPoolExecutor(max_workers=sessions) as pool:
+        results = [result for shard_results in pool.map(scrape_shard, range(sessions), shards) for result in shard_results]
+    return [program_class for _, program_classes in sorted(results, key=lambda result: result[0]) for program_class in program_classes]
+
+def preflight(decisions, classes: list, interactive: bool = True) -> int:
+    """Ask every special enrollment question for classes at once; returns how many are still open.
+
+    classes is a list of (program_name, day_name, student_names).
+    """
+    questions = decisions.pending(classes)
+    if questions and interactive:
+        decisions.ask(questions)
+        decisions.save()
+        questions = decisions.pending(classes)
+    return len(questions)
+
+def decide(args):
+    """Answer the special enrollment questions ahead of a registration run"""
+    snapshots = planner.load_snapshots(args.store)
+    if not snapshots:
+        print("No saved attendance found. Run `python main.py scrape` first.")
+        return
+    decisions = SpecialDecisions(args.decisions)
+    classes = [(snapshot["program_name"], snapshot["day_name"], [student["name"] for student in snapshot["roster"]["students"]])
+               for snapshot in planner.latest_snapshots(snapshots)]
+    remaining = preflight(decisions, classes)
+    print(f"\nDecisions saved to {args.decisions}; {remaining} still open.")
+
+def run(args):
+    """Scrape, and for the register and watch commands also register, with a logged-in engine"""
+    register = args.command in ("register", "watch")
+    decisions = SpecialDecisions(args.decisions) if register else None
+    print("Starting Tennis Registration Tool...")
+    print("Please wait while the browser initializes...")
+    # The browser still has to type each name and wait for the search, so only the HTTP engine gains from the cache
+    use_accounts = register and args.engine == "http" and not args.no_account_cache
+    accounts = AccountCache(args.accounts) if use_accounts else None
+    # Every session's calls to the site go through one governor
+    sessions = 2 if register and args.pipeline else args.workers
+    governor = Governor(args.max_concurrency or sessions, max_rate=args.max_rate)
     try:
-        print("Starting Tennis Registration Tool...")
-        print("Please wait while the browser initializes...")
-        
         # Login process
-        driver.get("https://avac.clubautomation.com/event/view-all?eventId=243922&schedule=434013&date=03/29/2025&do_action=attendance#event-info")
-        driver.implicitly_wait(3)
-        
-        print("Logging in...")
-        driver.find_element(By.NAME, "login").send_keys('YOUR AVAC EMAIL')
-        driver.find_element(By.NAME, "password").send_keys('YOUR AVAC PASSWORD')
-        driver.find_element(By.ID, "loginButton").click()
-        driver.implicitly_wait(3)
-        
-        print("Selecting position...")
-        driver.find_element(By.NAME, "selectPosButton").click()
-        
+        make_engine = make_engine_factory(args, accounts, governor)
+        engine = make_engine()
+    except Exception as e:
+        import traceback
+        print(f"\nAn error occurred: {str(e)}")
+        traceback.print_exc()
+        print("Please check your internet connection and try again.")
+        if accounts:
+            accounts.close()
+        return
+
+    store = None if args.no_store else SnapshotStore(args.store, use_saved=not args.refresh)
+    # watch never writes a journal, so it leaves the last run's journal for `report`
+    journal = None if args.command == "watch" else RunJournal(args.journal, resume=args.resume)
+    promotion = WaitlistPromotion(args.capacity) if register and args.promote_waitlist else None
+    sink = ResultSink(args.results, args.results_csv) if args.results or args.results_csv else None
+    try:
+        if register and decisions.index and not args.unattended and sys.stdin.isatty():
+            # Settle the special enrollment questions for the rosters this run scrapes before registering anyone;
+            # the registration pass then takes them from the journal (or the store, for watch) without scraping again
+            print(f"Scraping every program across {sessions} session(s) before registering, "
+                  "to ask about special enrollment students first...")
+            if args.pipeline:
+                print("Registration only starts once they are answered, so it does not overlap the scrape this run; "
+                      "answer with `decide` and run with --unattended to keep the pipeline.")
+            classes = scrape_classes(engine, make_engine, sessions, store, journal, sink if journal else None, promotion)
+            remaining = preflight(decisions, classes)
+            if remaining:
+                print(f"\n{remaining} special enrollment decision(s) still open; those students will be listed in the summary.")
+            # The site may have logged the session out while the questions were open
+            engine.refresh()
         # Process all programs
-        process_programs(driver)
+        if args.command == "watch":
+            watch(engine, store, args.interval, args.cycles, decisions=decisions, sink=sink, promotion=promotion)
+        elif register and args.pipeline:
+            process_programs_pipelined(engine, make_engine, store=store, journal=journal,
+                                       decisions=decisions, depth=args.pipeline_depth, sink=sink, promotion=promotion)
+        elif args.workers > 1:
+            process_programs_parallel(engine, make_engine, args.workers, store=store, journal=journal,
+                                      register=register, decisions=decisions, sink=sink, promotion=promotion)
+        else:
+            process_programs(engine, store=store, journal=journal, register=register, decisions=decisions, sink=sink,
+                             promotion=promotion)
+        if sink:
+            print(f"\nPer-class results were written to {', '.join(sink.paths)}")
         
-        print("\nRegistration process completed!")
-        print("Please review the summary above for any issues or manual actions needed.")
+        if register:
+            print("\nRegistration process completed!")
+            print("Please review the summary above for any issues or manual actions needed.")
+        else:
+            print("\nAttendance saved. Run `python main.py plan` to review the plan before registering.")
         
     except Exception as e:
         import traceback
@@ -656,7 +839,53 @@ def main():
         traceback.print_exc()
         print("Please check your internet connection and try again.")
     finally:
-        driver.quit()
+        engine.close()
+        if store:
+            store.close()
+        if journal:
+            journal.close()
+        if sink:
+            sink.close()
+        if accounts:
+            accounts.print_summary()
+            accounts.close()
+        TRACER.print_summary()
+        governor.print_summary()
+        if args.engine == "browser":
+            from browser import compare_page_timings
+            compare_page_timings(args.lean)
+        if args.spans:
+            TRACER.write_jsonl(args.spans)
+        if args.chrome_trace:
+            TRACER.write_chrome_trace(args.chrome_trace)
+
+def report(args):
+    """Print the saved attendance alerts and the last run's failed registrations"""
+    snapshots = planner.latest_snapshots(planner.load_snapshots(args.store))
+    if not snapshots:
+        print("No saved attendance found. Run `python main.py scrape` first.")
+    all_names = {}
+    for snapshot in snapshots:
+        names, _ = summarize_attendance(snapshot["roster"], snapshot["program_name"], snapshot["day_name"])
+        if names:
+            all_names.setdefault(snapshot["program_name"], {})[snapshot["day_name"]] = names
+    print_final_summary(all_names, read_failures(args.journal))
+
+def main(argv=None):
+    """Main function to run the registration tool"""
+    args = parse_args(argv)
+    if args.command == "plan":
+        planner.run_plan(args)
+    elif args.command == "decide":
+        decide(args)
+    elif args.command == "report":
+        report(args)
+    elif args.command == "analyze":
+        # Deferred so only this command loads NumPy
+        from analytics import run_analyze
+        run_analyze(args)
+    else:
+        run(args)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
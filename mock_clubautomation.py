@@ -0,0 +1,420 @@
+"""Local stand-in for the ClubAutomation endpoints used by http_engine.py.
+
+It also serves the login, position and view-all pages with the element ids
+main.py clicks on, so both engines can run against it. Run it with
+`python mock_clubautomation.py` and point the tool at it with
+`--base-url http://127.0.0.1:8765`. Nothing is sent to the real AVAC site.
+benchmark.py uses it to time full runs.
+"""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+from html import escape
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+
+from http_engine import ENDPOINTS
+
+
+FIRST_NAMES = ["Ava", "Ben", "Cora", "Dev", "Ella", "Finn", "Gia", "Hugo", "Isla", "Jack", "Kai", "Lena", "Milo", "Nora", "Owen", "Pia"]
+LAST_NAMES = ["Adams", "Baker", "Chen", "Diaz", "Evans", "Ford", "Garcia", "Hill", "Ito", "Jones", "Kim", "Lopez", "Moore", "Nguyen", "Ortiz", "Patel"]
+
+def student_name(index: int, prefix: str = "") -> str:
+    """Unique 'First Last' name for a synthetic student; the prefix marks waitlist/make-up only names"""
+    first = FIRST_NAMES[index % len(FIRST_NAMES)]
+    last = LAST_NAMES[(index // len(FIRST_NAMES)) % len(LAST_NAMES)]
+    rounds = index // (len(FIRST_NAMES) * len(LAST_NAMES))
+    return f"{first} {prefix}{last}{rounds if rounds else ''}"
+
+def make_club(programs: int = 3, students: int = 8, days=("Monday", "Wednesday"), months=("March 2025", "April 2025"), seed: int = 1) -> dict:
+    """Build a synthetic club: every program has the given months and days, last month half full"""
+    rng = random.Random(seed)
+    club = {"programs": [], "members": []}
+    member_ids = {}
+
+    def member(name):
+        if name not in member_ids:
+            member_ids[name] = str(9000 + len(member_ids))
+            club["members"].append({"id": member_ids[name], "name": name})
+        return member_ids[name]
+
+    next_id = 100
+    for p in range(programs):
+        next_id += 1
+        program = {"id": str(next_id), "name": f"Jr. Tennis Level {p + 1}", "sessions": []}
+        for m, month in enumerate(months):
+            next_id += 1
+            session = {"id": str(next_id), "name": month, "days": []}
+            for d, day in enumerate(days):
+                next_id += 1
+                roster = []
+                for s in range(students):
+                    name = student_name((p * len(days) + d) * students + s)
+                    member(name)
+                    dates = [rng.random() < 0.8 for _ in range(4)]
+                    roster.append({"name": name, "phone": f"555-{p:02d}{s:02d}", "dates": dates})
+                if m == len(months) - 1:
+                    roster = [dict(student, dates=[False] * 4) for student in roster[: students // 2]]
+                # The new month's waitlist has not started yet
+                waitlist = [] if m == len(months) - 1 else [student_name((p * len(days) + d) * 2 + w, "Wait") for w in range(2)]
+                for name in waitlist:
+                    member(name)
+                # Last month also had a make-up student from another class
+                makeup = [] if m == len(months) - 1 else [student_name(p * len(days) + d, "Makeup")]
+                for name in makeup:
+                    member(name)
+                session["days"].append({"id": str(next_id), "name": day, "students": roster,
+                                        "waitlist": waitlist, "makeup": makeup})
+            program["sessions"].append(session)
+        club["programs"].append(program)
+    return club
+
+def last_first(name: str) -> str:
+    first, last = name.split(" ", 1)
+    return f"{last}, {first}"
+
+def render_tree(club: dict, program_id=None, session_id=None) -> str:
+    """Render the program, session or day column of the events tree"""
+    if session_id:
+        for program in club["programs"]:
+            for session in program["sessions"]:
+                if session["id"] == session_id:
+                    links = "".join(f'<a id="row_day_{d["id"]}" href="#">{escape(d["name"])}</a>' for d in session["days"])
+                    return f'<div id="session_{session_id}_list">{links}</div>'
+        return ""
+    if program_id:
+        for program in club["programs"]:
+            if program["id"] == program_id:
+                links = "".join(f'<a id="row_session_{s["id"]}" href="#">{escape(s["name"])}</a>' for s in program["sessions"])
+                return f'<div id="program_{program_id}_list">{links}</div>'
+        return ""
+    links = "".join(f'<a id="row_program_{p["id"]}" href="#">{escape(p["name"])}</a>' for p in club["programs"])
+    return f'<div id="all-events-container"><div id="eventsBlock"><div id="programBlock">{links}</div></div></div>'
+
+def render_attendance(day: dict) -> str:
+    """Render an attendance table with the waitlist and make-up separators"""
+    def row(student):
+        dates = "".join(f'<td class="date"><a class="checkbox{" active" if present else ""}"></a></td>' for present in student.get("dates", []))
+        phone = f'<span class="staff-phone">{escape(student["phone"])}</span>' if student.get("phone") else ""
+        return f'<tr><td class="first-col"></td><td class="second-col"><a href="#">{escape(last_first(student["name"]))}</a>{phone}</td>{dates}</tr>'
+
+    rows = [row(student) for student in day["students"]]
+    if day["waitlist"]:
+        rows.append('<tr class="attendance-separator"><td class="separator" colspan="6">Waitlisted</td></tr>')
+        rows.extend(row({"name": name}) for name in day["waitlist"])
+    if day["makeup"]:
+        rows.append('<tr class="attendance-separator"><td class="separator" colspan="6">Make-up</td></tr>')
+        rows.extend(row({"name": name}) for name in day["makeup"])
+    return ('<div class="attendance_container attendance_table_container"><table>'
+            f'<tbody id="table-body">{"".join(rows)}</tbody></table></div>')
+
+def find_day(club: dict, day_id: str):
+    for program in club["programs"]:
+        for session in program["sessions"]:
+            for day in session["days"]:
+                if day["id"] == day_id:
+                    return day
+    return None
+
+def mark_selected(html: str, link_id: str) -> str:
+    return html.replace(f'id="{link_id}"', f'id="{link_id}" class="selected_row"', 1)
+
+def render_events_page(club: dict, query: dict) -> str:
+    """The view-all page; an eventId/schedule/do_action=attendance link opens that class's attendance"""
+    tree = render_tree(club)
+    blocks = {"sessions": "", "days": "", "attendance": "", "day": "null"}
+    program_id, day_id = query.get("eventId"), query.get("schedule")
+    if query.get("do_action") == "attendance":
+        for program in club["programs"]:
+            for session in program["sessions"]:
+                for day in session["days"]:
+                    if program["id"] == program_id and day["id"] == day_id:
+                        tree = mark_selected(tree, f"row_program_{program_id}")
+                        blocks = {
+                            "sessions": mark_selected(render_tree(club, program_id=program_id), f"row_session_{session['id']}"),
+                            "days": mark_selected(render_tree(club, session_id=session["id"]), f"row_day_{day_id}"),
+                            "attendance": render_attendance(day),
+                            "day": json.dumps(day_id),
+                        }
+    return EVENTS_PAGE % {"tree": tree, "endpoints": json.dumps(ENDPOINTS), **blocks}
+
+START_PATH = "/event/view-all"
+
+LOGIN_PAGE = """<!DOCTYPE html>
+<html><head><title>Login</title></head><body>
+<form method="post" action="%(login)s">
+  <input type="text" name="login"> <input type="password" name="password">
+  <button type="submit" id="loginButton">Log In</button>
+</form>
+</body></html>"""
+
+POSITION_PAGE = """<!DOCTYPE html>
+<html><head><title>Select Position</title></head><body>
+<form method="post" action="%(select_position)s">
+  <input type="submit" name="selectPosButton" value="Select">
+</form>
+</body></html>"""
+
+# The view-all page: the same ids and classes main.py clicks on, loaded with XHR like the real site
+EVENTS_PAGE = """<!DOCTYPE html>
+<html><head><title>Events</title>
+<style>.selected_row { font-weight: bold; } #eventsBlock a { display: block; }</style>
+</head><body>
+%(tree)s
+<div id="sessionBlock">%(sessions)s</div>
+<div id="dayBlock">%(days)s</div>
+<input type="button" id="attendance" value="Attendance">
+<a id="registerUserLink" href="#">Register User</a>
+<div id="registerDialog" style="display: none">
+  <input type="text" id="userInput" autocomplete="off">
+  <ul id="ac_ul"></ul>
+  <input type="button" class="button bold" value="Add" id="addButton">
+</div>
+<div id="attendanceArea">%(attendance)s</div>
+<script>
+var ENDPOINTS = %(endpoints)s;
+var state = {day: %(day)s, userId: null, searchTimer: null};
+function request(method, url, body, done) {
+    var xhr = new XMLHttpRequest();
+    xhr.open(method, url);
+    xhr.setRequestHeader('X-Requested-With', 'XMLHttpRequest');
+    if (body) { xhr.setRequestHeader('Content-Type', 'application/x-www-form-urlencoded'); }
+    xhr.onload = function () { done(xhr.responseText); };
+    xhr.send(body);
+}
+function select(link) {
+    var siblings = link.parentNode.querySelectorAll('a');
+    for (var i = 0; i < siblings.length; i++) { siblings[i].classList.remove('selected_row'); }
+    link.classList.add('selected_row');
+}
+function loadAttendance() {
+    request('GET', ENDPOINTS.attendance + '?day_id=' + state.day, null, function (html) {
+        document.getElementById('attendanceArea').innerHTML = html;
+    });
+}
+document.addEventListener('click', function (event) {
+    var link = event.target.closest('a, input[type=button]');
+    if (!link) { return; }
+    var id = link.id || '';
+    if (id.indexOf('row_program_') === 0) {
+        event.preventDefault();
+        select(link);
+        document.getElementById('dayBlock').innerHTML = '';
+        request('GET', ENDPOINTS.tree + '?program_id=' + id.slice(12), null, function (html) {
+            document.getElementById('sessionBlock').innerHTML = html;
+        });
+    } else if (id.indexOf('row_session_') === 0) {
+        event.preventDefault();
+        select(link);
+        request('GET', ENDPOINTS.tree + '?session_id=' + id.slice(12), null, function (html) {
+            document.getElementById('dayBlock').innerHTML = html;
+        });
+    } else if (id.indexOf('row_day_') === 0) {
+        event.preventDefault();
+        select(link);
+        state.day = id.slice(8);
+        document.getElementById('attendanceArea').innerHTML = '';
+    } else if (id === 'attendance' && state.day) {
+        loadAttendance();
+    } else if (id === 'registerUserLink') {
+        event.preventDefault();
+        document.getElementById('registerDialog').style.display = 'block';
+        document.getElementById('userInput').value = '';
+        document.getElementById('ac_ul').innerHTML = '';
+        state.userId = null;
+    } else if (link.closest('#ac_ul')) {
+        event.preventDefault();
+        state.userId = link.getAttribute('data-user-id');
+        document.getElementById('userInput').value = link.textContent;
+        document.getElementById('ac_ul').innerHTML = '';
+    } else if (id === 'addButton' && state.userId) {
+        var body = 'day_id=' + encodeURIComponent(state.day) + '&user_id=' + encodeURIComponent(state.userId);
+        state.userId = null;
+        document.getElementById('userInput').value = '';
+        request('POST', ENDPOINTS.add_registrant, body, loadAttendance);
+    }
+});
+document.getElementById('userInput').addEventListener('input', function () {
+    clearTimeout(state.searchTimer);
+    var text = this.value;
+    state.searchTimer = setTimeout(function () {
+        request('GET', ENDPOINTS.user_search + '?day_id=' + state.day + '&q=' + encodeURIComponent(text), null, function (json) {
+            var items = JSON.parse(json).map(function (account, i) {
+                return '<li><a href="#" name="' + (i + 1) + '" data-user-id="' + account.id + '"><span>' + account.name + '</span></a></li>';
+            });
+            document.getElementById('ac_ul').innerHTML = items.join('');
+        });
+    }, 100);
+});
+</script>
+</body></html>"""
+
+class MockHandler(BaseHTTPRequestHandler):
+    """Serves ENDPOINTS and the pages around them from the club held by the server"""
+
+    def log_message(self, format, *args):
+        pass  # Keep the console quiet
+
+    def _send(self, status: int, body: str, content_type: str = "text/html", cookie: str = None, location: str = None,
+              retry_after: int = None):
+        data = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", f"{content_type}; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        if cookie:
+            self.send_header("Set-Cookie", f"PHPSESSID={cookie}; Path=/")
+        if location:
+            self.send_header("Location", location)
+        if retry_after:
+            self.send_header("Retry-After", str(retry_after))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _delay(self):
+        # Simulated server latency with some jitter
+        latency = self.server.latency
+        if latency:
+            time.sleep(latency * random.uniform(0.5, 1.5))
+
+    def _logged_in(self) -> bool:
+        cookies = self.headers.get("Cookie") or ""
+        return any(part.strip() == f"PHPSESSID={token}" for part in cookies.split(";") for token in self.server.sessions)
+
+    def _is_xhr(self) -> bool:
+        return self.headers.get("X-Requested-With") == "XMLHttpRequest"
+
+    def _flaky(self, path: str) -> bool:
+        """Fail a share of the register dialog's requests, to exercise the retries"""
+        return path in (ENDPOINTS["user_search"], ENDPOINTS["add_registrant"]) and random.random() < self.server.error_rate
+
+    def _serve(self, handle):
+        """Answer a request, or refuse it with a 429 while the server already has `capacity` in flight"""
+        server = self.server
+        with server.active_lock:
+            refused = server.capacity and server.active >= server.capacity
+            if refused:
+                server.refused += 1
+            else:
+                server.active += 1
+        if refused:
+            self._delay()
+            return self._send(429, "Too many requests", retry_after=1)
+        try:
+            handle()
+        finally:
+            with server.active_lock:
+                server.active -= 1
+
+    def do_GET(self):
+        self._serve(self._get)
+
+    def do_POST(self):
+        self._serve(self._post)
+
+    def _get(self):
+        self._delay()
+        url = urlparse(self.path)
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+        if url.path in ("/", "/favicon.ico"):
+            return self._send(200, "")
+        if not self._logged_in():
+            if url.path == START_PATH:
+                return self._send(200, LOGIN_PAGE % ENDPOINTS)
+            return self._send(403, "Not logged in")
+        if self._flaky(url.path):
+            return self._send(503, "Service unavailable")
+        club = self.server.club
+        with self.server.lock:
+            if url.path == START_PATH:
+                return self._send(200, render_events_page(club, query))
+            if url.path == ENDPOINTS["select_position"]:
+                return self._send(200, POSITION_PAGE % ENDPOINTS)
+            if url.path == ENDPOINTS["tree"]:
+                return self._send(200, render_tree(club, query.get("program_id"), query.get("session_id")))
+            if url.path == ENDPOINTS["attendance"]:
+                day = find_day(club, query.get("day_id", ""))
+                if day is None:
+                    return self._send(404, "No such day")
+                return self._send(200, render_attendance(day))
+            if url.path == ENDPOINTS["user_search"]:
+                text = (query.get("q") or "").lower()
+                accounts = [m for m in club["members"] if text and text in m["name"].lower()]
+                return self._send(200, json.dumps(accounts), "application/json")
+        self._send(404, "Not found")
+
+    def _post(self):
+        self._delay()
+        url = urlparse(self.path)
+        length = int(self.headers.get("Content-Length") or 0)
+        form = {key: values[0] for key, values in parse_qs(self.rfile.read(length).decode("utf-8")).items()}
+        if url.path == ENDPOINTS["login"]:
+            if not form.get("login") or not form.get("password"):
+                return self._send(401, "Missing credentials")
+            token = uuid.uuid4().hex
+            self.server.sessions.add(token)
+            if not self._is_xhr():
+                # The login form moves on to the position prompt
+                return self._send(303, "", cookie=token, location=ENDPOINTS["select_position"])
+            return self._send(200, "OK", cookie=token)
+        if not self._logged_in():
+            return self._send(403, "Not logged in")
+        if self._flaky(url.path):
+            return self._send(503, "Service unavailable")
+        if url.path == ENDPOINTS["select_position"]:
+            if not self._is_xhr():
+                return self._send(303, "", location=START_PATH)
+            return self._send(200, "OK")
+        if url.path == ENDPOINTS["add_registrant"]:
+            with self.server.lock:
+                day = find_day(self.server.club, form.get("day_id", ""))
+                member = next((m for m in self.server.club["members"] if m["id"] == form.get("user_id")), None)
+                if day is None or member is None:
+                    return self._send(404, json.dumps({"success": False}), "application/json")
+                if all(student["name"] != member["name"] for student in day["students"]):
+                    day["students"].append({"name": member["name"], "phone": "", "dates": [False] * 4})
+            return self._send(200, json.dumps({"success": True}), "application/json")
+        self._send(404, "Not found")
+
+def start_server(club: dict = None, host: str = "127.0.0.1", port: int = 0, latency: float = 0,
+                 error_rate: float = 0, capacity: int = 0) -> tuple:
+    """Serve a club in a background thread and return (server, base_url)"""
+    server = ThreadingHTTPServer((host, port), MockHandler)
+    server.daemon_threads = True
+    server.club = club if club is not None else make_club()
+    server.sessions = set()
+    server.lock = threading.Lock()
+    server.latency = latency
+    server.error_rate = error_rate
+    # Requests served at once before the rest are refused (0 = no limit)
+    server.capacity = capacity
+    server.active = 0
+    server.refused = 0
+    server.active_lock = threading.Lock()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve a synthetic ClubAutomation club locally")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--programs", type=int, default=3)
+    parser.add_argument("--students", type=int, default=8, help="students per class")
+    parser.add_argument("--latency", type=float, default=0, help="average seconds added to every response")
+    parser.add_argument("--error-rate", type=float, default=0,
+                        help="share of account searches and adds answered with a 503 (default: 0)")
+    parser.add_argument("--capacity", type=int, default=0,
+                        help="requests served at once; more are refused with a 429 (default: no limit)")
+    args = parser.parse_args(argv)
+    server, base_url = start_server(make_club(args.programs, args.students), port=args.port, latency=args.latency,
+                                    error_rate=args.error_rate, capacity=args.capacity)
+    print(f"Mock ClubAutomation running at {base_url} (Ctrl+C to stop)")
+    print(f"Browser start page: {base_url}{START_PATH}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
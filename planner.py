@@ -0,0 +1,160 @@
+"""Offline dry run: build the full enrollment plan from saved attendance.
+
+Reads the rosters saved by a previous scrape (the SQLite store or a JSON
+export of it) and applies the same rules as a live run: everyone on last
+month's roster is registered for the same day, low attendance is flagged,
+waitlisted students are listed for review, and students on the special
+enrollment spreadsheet need a decision. Selenium is never imported, so a plan
+takes well under a second:
+
+    python planner.py --output plan.json --csv plan.csv
+"""
+import argparse
+import csv
+import json
+import os
+import time
+
+from attendance import LOW_ATTENDANCE_THRESHOLD, special_enrollment_index
+from snapshot_store import SnapshotStore
+from special_decisions import SpecialDecisions
+
+
+PLAN_CSV_FIELDS = ["program", "day", "student", "action", "present_count", "phone", "low_attendance"]
+
+def latest_snapshots(snapshots: list) -> list:
+    """Keep the most recently scraped month of each program"""
+    latest_session = {}
+    for snapshot in snapshots:
+        # Snapshots come oldest first, so the last session seen per program wins
+        latest_session[snapshot["program_id"]] = snapshot["session_id"]
+    return [snapshot for snapshot in snapshots if latest_session[snapshot["program_id"]] == snapshot["session_id"]]
+
+def build_plan(snapshots: list, decisions, threshold: int = LOW_ATTENDANCE_THRESHOLD) -> list:
+    """Return one plan entry per program/day with the students to register, confirm, skip and review"""
+    plan = []
+    for snapshot in latest_snapshots(snapshots):
+        roster = snapshot["roster"]
+        entry = {
+            "program": snapshot["program_name"],
+            "day": snapshot["day_name"],
+            "program_id": snapshot["program_id"],
+            "day_id": snapshot["day_id"],
+            "register": [],
+            "confirm_special": [],
+            "skip_special": [],
+            "low_attendance": [],
+            "waitlist": list(roster["waitlist"]),
+        }
+        for student in roster["students"]:
+            to_register, held = decisions.screen([student["name"]], entry["program"], entry["day"])
+            if to_register:
+                entry["register"].append(student["name"])
+            elif held[0][1] == "skipped":
+                entry["skip_special"].append(student["name"])
+            else:
+                entry["confirm_special"].append(student["name"])
+            if student["present_count"] < threshold:
+                entry["low_attendance"].append({
+                    "name": student["name"],
+                    "phone": student["phone"],
+                    "present_count": student["present_count"],
+                })
+        plan.append(entry)
+    return plan
+
+def plan_rows(plan: list) -> list:
+    """Flatten a plan into one row per student and action"""
+    rows = []
+    for entry in plan:
+        low = {student["name"]: student for student in entry["low_attendance"]}
+        for action, key in (("register", "register"), ("confirm_special", "confirm_special"),
+                            ("skip_special", "skip_special"), ("waitlist_review", "waitlist")):
+            for name in entry[key]:
+                student = low.get(name)
+                rows.append({
+                    "program": entry["program"],
+                    "day": entry["day"],
+                    "student": name,
+                    "action": action,
+                    "present_count": student["present_count"] if student else "",
+                    "phone": student["phone"] if student else "",
+                    "low_attendance": "yes" if student else "",
+                })
+    return rows
+
+def load_snapshots(store_path: str = None, snapshot_file: str = None) -> list:
+    """Read saved rosters from a JSON export or the SQLite store"""
+    if snapshot_file:
+        with open(snapshot_file, encoding="utf-8") as snapshot_json:
+            return json.load(snapshot_json)
+    if not os.path.exists(store_path):
+        return []
+    store = SnapshotStore(store_path)
+    try:
+        return store.all_snapshots()
+    finally:
+        store.close()
+
+def write_plan(plan: list, json_path: str = None, csv_path: str = None):
+    if json_path:
+        with open(json_path, "w", encoding="utf-8") as plan_json:
+            json.dump({"generated_at": time.time(), "classes": plan}, plan_json, indent=2)
+    if csv_path:
+        with open(csv_path, "w", newline="", encoding="utf-8") as plan_csv:
+            writer = csv.DictWriter(plan_csv, fieldnames=PLAN_CSV_FIELDS)
+            writer.writeheader()
+            writer.writerows(plan_rows(plan))
+
+def print_plan(plan: list):
+    for entry in plan:
+        print(f"\n{entry['program']} - {entry['day']}:")
+        print(f"  Register: {len(entry['register'])}")
+        for name in entry["confirm_special"]:
+            print(f"  ? Special enrollment decision needed: {name}")
+        for name in entry["skip_special"]:
+            print(f"  - Skipped by special enrollment decision: {name}")
+        for student in entry["low_attendance"]:
+            print(f"  ⚠️  Low attendance: {student['name']} ({student['present_count']} present, {student['phone']})")
+        for name in entry["waitlist"]:
+            print(f"  ⚠️  Waitlisted: {name}")
+
+def add_plan_arguments(parser):
+    """Options of the planner, shared with `main.py plan`"""
+    parser.add_argument("--store", default="attendance_snapshots.db",
+                        help="SQLite store written by main.py (default: attendance_snapshots.db)")
+    parser.add_argument("--snapshots", default=None,
+                        help="JSON list of saved snapshots to use instead of the store")
+    parser.add_argument("--special", default="special_enrollment.csv",
+                        help="special enrollment spreadsheet (default: special_enrollment.csv)")
+    parser.add_argument("--decisions", default="special_decisions.json",
+                        help="special enrollment decisions file (default: special_decisions.json)")
+    parser.add_argument("--threshold", type=int, default=LOW_ATTENDANCE_THRESHOLD,
+                        help=f"present sessions below which a student is flagged (default: {LOW_ATTENDANCE_THRESHOLD})")
+    parser.add_argument("--output", default="plan.json", help="plan JSON file (default: plan.json)")
+    parser.add_argument("--csv", default=None, help="also write the plan as CSV")
+    return parser
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Build the enrollment plan from saved attendance without a browser")
+    return add_plan_arguments(parser).parse_args(argv)
+
+def run_plan(args):
+    started = time.perf_counter()
+    snapshots = load_snapshots(args.store, args.snapshots)
+    if not snapshots:
+        print("No saved attendance found. Run `python main.py scrape` first.")
+        return
+    decisions = SpecialDecisions(args.decisions, special_enrollment_index(args.special))
+    plan = build_plan(snapshots, decisions, args.threshold)
+    write_plan(plan, args.output, args.csv)
+    print_plan(plan)
+    registrations = sum(len(entry["register"]) for entry in plan)
+    print(f"\nPlanned {registrations} registrations across {len(plan)} classes "
+          f"in {(time.perf_counter() - started) * 1000:.0f} ms -> {args.output}")
+
+def main(argv=None):
+    run_plan(parse_args(argv))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""Streams run results to JSONL and/or CSV as they happen.
+
+One line per scraped roster, low-attendance alert, waitlisted student and
+registration outcome, flushed straight away so the files can be tailed while
+the run is going (`tail -f results.jsonl`) and are usable even if it dies.
+"""
+import csv
+import json
+import threading
+import time
+
+
+CSV_FIELDS = ["time", "event", "program", "day", "student", "status", "phone", "present_count", "count", "detail"]
+
+class ResultSink:
+    """Writes one structured event per line to the files it was given"""
+
+    def __init__(self, jsonl_path: str = None, csv_path: str = None):
+        self.paths = [path for path in (jsonl_path, csv_path) if path]
+        self.lock = threading.Lock()
+        self.jsonl_file = open(jsonl_path, "w", encoding="utf-8") if jsonl_path else None
+        self.csv_file = open(csv_path, "w", newline="", encoding="utf-8") if csv_path else None
+        self.csv_writer = None
+        if self.csv_file:
+            self.csv_writer = csv.DictWriter(self.csv_file, fieldnames=CSV_FIELDS, extrasaction="ignore")
+            self.csv_writer.writeheader()
+            self.csv_file.flush()
+
+    def emit(self, event: str, **fields):
+        entry = {"time": time.time(), "event": event, **fields}
+        with self.lock:
+            if self.jsonl_file:
+                self.jsonl_file.write(json.dumps(entry) + "\n")
+                self.jsonl_file.flush()
+            if self.csv_writer:
+                row = dict(entry)
+                # Lists (a roster's names) go into one cell
+                for key, value in row.items():
+                    if isinstance(value, list):
+                        row[key] = "; ".join(str(item) for item in value)
+                self.csv_writer.writerow(row)
+                self.csv_file.flush()
+
+    def roster(self, program_name: str, day_name: str, roster: dict, threshold: int):
+        """The scraped roster of a class, then one event per low-attendance and waitlisted student"""
+        names = [student["name"] for student in roster["students"]]
+        self.emit("roster", program=program_name, day=day_name, count=len(names), detail=names,
+                  waitlist=list(roster["waitlist"]), makeup=list(roster["makeup"]))
+        for student in roster["students"]:
+            if student["present_count"] < threshold:
+                self.emit("low_attendance", program=program_name, day=day_name, student=student["name"],
+                          phone=student["phone"], present_count=student["present_count"])
+        for name in roster["waitlist"]:
+            self.emit("waitlist", program=program_name, day=day_name, student=name)
+
+    def registration(self, program_name: str, day_name: str, student_name: str, status: str, detail: str = None):
+        extra = {"detail": detail} if detail else {}
+        self.emit("registration", program=program_name, day=day_name, student=student_name, status=status, **extra)
+
+    def close(self):
+        with self.lock:
+            for results_file in (self.jsonl_file, self.csv_file):
+                if results_file:
+                    results_file.close()
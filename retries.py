@@ -0,0 +1,79 @@
+"""Failure classification and the retry policy for registrations.
+
+Every failed add is given one of the FAILURE_LABELS kinds. Transient ones
+(a stale element, a timeout, an expired session, a server error, an add that
+never showed up on the roster, an unexpected error) are retried on the spot
+with exponential backoff and jitter; whatever still fails is queued for one
+more pass at the end of the run. Ambiguous and missing accounts need a person to look at them,
+so only those are left for the final report. A class whose page or last
+month's attendance did not load goes to the end-of-run pass as a whole, and
+is reported with its students if it still does not load.
+"""
+import random
+import time
+
+from spans import span
+
+
+STALE_ELEMENT = "stale_element"
+TIMEOUT = "timeout"
+SESSION_EXPIRED = "session_expired"
+NOT_ADDED = "not_added"
+SERVER_ERROR = "server_error"
+ERROR = "error"
+AMBIGUOUS_ACCOUNT = "ambiguous_account"
+ACCOUNT_NOT_FOUND = "account_not_found"
+# Whole-class failures: the class page or last month's attendance did not load, so nobody was tried
+CLASS_NOT_OPENED = "class_not_opened"
+ATTENDANCE_NOT_READ = "attendance_not_read"
+
+FAILURE_LABELS = {
+    STALE_ELEMENT: "page changed while registering",
+    TIMEOUT: "timed out",
+    SESSION_EXPIRED: "login session expired",
+    NOT_ADDED: "not on the roster after adding",
+    SERVER_ERROR: "site returned an error",
+    ERROR: "unexpected error",
+    AMBIGUOUS_ACCOUNT: "multiple accounts, pick one by hand",
+    ACCOUNT_NOT_FOUND: "no matching account, enroll by hand",
+    CLASS_NOT_OPENED: "class page did not open",
+    ATTENDANCE_NOT_READ: "last month's attendance did not load",
+}
+
+# Only these need a person; every other kind is worth another try
+MANUAL_FAILURES = {AMBIGUOUS_ACCOUNT, ACCOUNT_NOT_FOUND}
+
+# Tries per student before the failure is queued for the end-of-run pass
+RETRY_ATTEMPTS = 3
+RETRY_BASE_DELAY = 0.5  # seconds
+RETRY_MAX_DELAY = 8
+
+def is_transient(failure: str) -> bool:
+    return failure is not None and failure not in MANUAL_FAILURES
+
+def failure_label(failure: str) -> str:
+    return FAILURE_LABELS.get(failure, failure)
+
+def backoff_delay(attempt: int, base: float = RETRY_BASE_DELAY, cap: float = RETRY_MAX_DELAY) -> float:
+    """Full jitter: a random wait of up to base * 2**attempt seconds, capped"""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+def with_retries(attempt_once, recover=None, attempts: int = RETRY_ATTEMPTS, sleep=time.sleep):
+    """Call attempt_once(attempt) until it returns None (done) or a failure a retry will not fix.
+
+    Between tries it backs off and calls recover(failure) so the engine can log
+    in again or re-read the roster. Returns the last failure kind, or None.
+    """
+    failure = None
+    for attempt in range(attempts):
+        if attempt:
+            with span("register.backoff", failure=failure, attempt=attempt):
+                sleep(backoff_delay(attempt - 1))
+                if recover:
+                    recover(failure)
+        failure = attempt_once(attempt)
+        if not is_transient(failure):
+            return failure
+        if attempt + 1 < attempts:
+            print(f"  ↻ Retrying ({failure_label(failure)})")
+    return failure
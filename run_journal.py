@@ -0,0 +1,116 @@
+"""Append-only journal of finished work, used to resume an interrupted run.
+
+Every scraped day, registration outcome and finished program is written as
+one JSON line and flushed to disk straight away, so the journal survives a
+Chrome crash or a killed terminal. With --resume the journal is read back and
+everything it records as done is skipped.
+"""
+import json
+import os
+import threading
+import time
+
+
+class RunJournal:
+    """Records scrapes and registrations and answers whether they already happened"""
+
+    def __init__(self, path: str, resume: bool = False):
+        self.path = path
+        self.lock = threading.Lock()
+        self.scrapes = {}        # (program_id, session_id, day_id) -> (day_name, names, waitlist)
+        self.registrations = {}  # (program_id, day_id, student) -> status
+        self.finished_programs = set()
+        if resume:
+            self._load()
+        # A fresh run starts a new journal, a resumed one keeps appending
+        self.file = open(path, "a" if resume else "w", encoding="utf-8")
+
+    def _load(self):
+        try:
+            with open(self.path, encoding="utf-8") as journal_file:
+                for line in journal_file:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # A line cut short by the crash
+                    self._apply(entry)
+        except FileNotFoundError:
+            pass
+
+    def _apply(self, entry: dict):
+        kind = entry.get("type")
+        if kind == "scrape":
+            key = (entry["program_id"], entry["session_id"], entry["day_id"])
+            self.scrapes[key] = (entry["day"], entry["names"], entry.get("waitlist", []))
+        elif kind == "register":
+            self.registrations[(entry["program_id"], entry["day_id"], entry["student"])] = entry["status"]
+        elif kind == "program_done":
+            self.finished_programs.add(entry["program_id"])
+
+    def record(self, kind: str, **fields):
+        """Append one entry and make sure it is on disk before returning"""
+        entry = {"type": kind, "time": time.time(), **fields}
+        with self.lock:
+            self._apply(entry)
+            self.file.write(json.dumps(entry) + "\n")
+            self.file.flush()
+            os.fsync(self.file.fileno())
+
+    def scraped(self, program_id: str, session_id: str, day_id: str):
+        """Names recorded for a scraped day, or None if it still has to be scraped"""
+        with self.lock:
+            scrape = self.scrapes.get((program_id, session_id, day_id))
+        return None if scrape is None else scrape[1]
+
+    def scraped_waitlist(self, program_id: str, session_id: str, day_id: str) -> list:
+        """Waitlisted names recorded for a scraped day"""
+        with self.lock:
+            scrape = self.scrapes.get((program_id, session_id, day_id))
+        return [] if scrape is None else scrape[2]
+
+    def registered(self, program_id: str, day_id: str, student: str) -> bool:
+        """Whether a student was already handled for a day (failures are retried)"""
+        with self.lock:
+            return self.registrations.get((program_id, day_id, student)) == "ok"
+
+    def program_done(self, program_id: str) -> bool:
+        with self.lock:
+            return program_id in self.finished_programs
+
+    def program_names(self, program_id: str) -> dict:
+        """Names of every scraped day of a program, by day name"""
+        with self.lock:
+            return {day_name: names for (scraped_program, _, _), (day_name, names, _) in self.scrapes.items()
+                    if scraped_program == program_id and names}
+
+    def close(self):
+        with self.lock:
+            self.file.close()
+
+def read_failures(path: str) -> list:
+    """Registrations whose last recorded outcome in a journal was a failure"""
+    statuses = {}
+    try:
+        with open(path, encoding="utf-8") as journal_file:
+            for line in journal_file:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                if entry.get("type") == "register":
+                    statuses[(entry["program_id"], entry["day_id"], entry["student"])] = entry
+    except FileNotFoundError:
+        return []
+    failures = []
+    for entry in statuses.values():
+        # Students skipped by a special enrollment decision were handled as asked
+        if entry["status"] in ("ok", "skipped"):
+            continue
+        student = entry["student"]
+        if entry["status"] == "pending":
+            student = f"{student} (special enrollment decision needed)"
+        failure = {"program": entry["program"], "day": entry["day"], "student": student}
+        if entry.get("failure"):
+            failure["failure"] = entry["failure"]
+        failures.append(failure)
+    return failures
@@ -0,0 +1,10 @@
+"""Site address and account used by both engines"""
+
+BASE_URL = "https://avac.clubautomation.com"
+AVAC_USERNAME = 'YOUR AVAC EMAIL'
+AVAC_PASSWORD = 'YOUR AVAC PASSWORD'
+START_PATH = "/event/view-all?eventId=243922&schedule=434013&date=03/29/2025&do_action=attendance#event-info"
+# Direct link to one class's attendance view, in the same form as START_PATH
+# (eventId is the program, schedule the class day). Only used with --deep-links;
+# set to None if the site stops honoring it.
+ATTENDANCE_LINK_PATH = "/event/view-all?eventId={program_id}&schedule={day_id}&do_action=attendance#event-info"
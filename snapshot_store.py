@@ -0,0 +1,181 @@
+"""Local SQLite cache of scraped attendance.
+
+Once a newer month exists, last month's attendance no longer changes, so the
+roster of each finished program/session/day is saved here the first time it is
+scraped. Later runs read it back instead of opening the attendance page again.
+The roster fingerprint of each class handled by a registration is kept too,
+so `main.py watch` can tell which classes changed since, along with the names
+the class was left with; a student who later disappears from the roster was
+removed by staff, and is remembered so no run adds them back.
+"""
+import json
+import sqlite3
+import threading
+import time
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS session_days (
+    program_id TEXT NOT NULL,
+    session_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    day_id TEXT NOT NULL,
+    day_name TEXT NOT NULL,
+    PRIMARY KEY (program_id, session_id, day_id)
+);
+CREATE TABLE IF NOT EXISTS snapshots (
+    program_id TEXT NOT NULL,
+    session_id TEXT NOT NULL,
+    day_id TEXT NOT NULL,
+    program_name TEXT NOT NULL,
+    day_name TEXT NOT NULL,
+    roster TEXT NOT NULL,
+    finished INTEGER NOT NULL,
+    scraped_at REAL NOT NULL,
+    PRIMARY KEY (program_id, session_id, day_id)
+);
+CREATE TABLE IF NOT EXISTS fingerprints (
+    program_id TEXT NOT NULL,
+    session_id TEXT NOT NULL,
+    day_id TEXT NOT NULL,
+    fingerprint TEXT NOT NULL,
+    checked_at REAL NOT NULL,
+    PRIMARY KEY (program_id, session_id, day_id)
+);
+CREATE TABLE IF NOT EXISTS class_names (
+    program_id TEXT NOT NULL,
+    session_id TEXT NOT NULL,
+    day_id TEXT NOT NULL,
+    names TEXT NOT NULL,
+    PRIMARY KEY (program_id, session_id, day_id)
+);
+CREATE TABLE IF NOT EXISTS removed_students (
+    program_id TEXT NOT NULL,
+    session_id TEXT NOT NULL,
+    day_id TEXT NOT NULL,
+    name_key TEXT NOT NULL,
+    removed_at REAL NOT NULL,
+    PRIMARY KEY (program_id, session_id, day_id, name_key)
+);
+"""
+
+class SnapshotStore:
+    """Attendance rosters keyed by program, session and day id"""
+
+    def __init__(self, path: str, use_saved: bool = True):
+        self.path = path
+        # With use_saved off everything is scraped again, but still saved
+        self.use_saved = use_saved
+        # Shared by the worker threads of a parallel run
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.executescript(SCHEMA)
+
+    def get_days(self, program_id: str, session_id: str):
+        """Return the saved (day_id, day_name) list of a finished session, or None"""
+        if not self.use_saved:
+            return None
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT day_id, day_name FROM session_days WHERE program_id = ? AND session_id = ? ORDER BY position",
+                (program_id, session_id),
+            ).fetchall()
+        return [tuple(row) for row in rows] or None
+
+    def put_days(self, program_id: str, session_id: str, days: list):
+        with self.lock, self.connection:
+            self.connection.execute("DELETE FROM session_days WHERE program_id = ? AND session_id = ?", (program_id, session_id))
+            self.connection.executemany(
+                "INSERT INTO session_days (program_id, session_id, position, day_id, day_name) VALUES (?, ?, ?, ?, ?)",
+                [(program_id, session_id, position, day_id, day_name) for position, (day_id, day_name) in enumerate(days)],
+            )
+
+    def get(self, program_id: str, session_id: str, day_id: str, finished_only: bool = True):
+        """Return the saved roster of a day, or None if it has to be scraped"""
+        if not self.use_saved:
+            return None
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT roster, finished FROM snapshots WHERE program_id = ? AND session_id = ? AND day_id = ?",
+                (program_id, session_id, day_id),
+            ).fetchone()
+        if row is None or (finished_only and not row[1]):
+            return None
+        return json.loads(row[0])
+
+    def put(self, program_id: str, session_id: str, day_id: str, program_name: str, day_name: str, roster: dict, finished: bool):
+        with self.lock, self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO snapshots "
+                "(program_id, session_id, day_id, program_name, day_name, roster, finished, scraped_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (program_id, session_id, day_id, program_name, day_name, json.dumps(roster), int(finished), time.time()),
+            )
+
+    def get_fingerprint(self, program_id: str, session_id: str, day_id: str):
+        """The roster fingerprint a class had when it was last fully handled, or None"""
+        if not self.use_saved:
+            return None
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT fingerprint FROM fingerprints WHERE program_id = ? AND session_id = ? AND day_id = ?",
+                (program_id, session_id, day_id),
+            ).fetchone()
+        return row[0] if row else None
+
+    def put_fingerprint(self, program_id: str, session_id: str, day_id: str, fingerprint: str):
+        with self.lock, self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO fingerprints (program_id, session_id, day_id, fingerprint, checked_at) VALUES (?, ?, ?, ?, ?)",
+                (program_id, session_id, day_id, fingerprint, time.time()),
+            )
+
+    def put_class_names(self, program_id: str, session_id: str, day_id: str, roster_names: set):
+        """The normalized names a registration pass left a class with"""
+        with self.lock, self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO class_names (program_id, session_id, day_id, names) VALUES (?, ?, ?, ?)",
+                (program_id, session_id, day_id, json.dumps(sorted(roster_names))),
+            )
+
+    def removed_students(self, program_id: str, session_id: str, day_id: str, roster_names: set) -> set:
+        """Remember who left a class's roster since a registration pass last left it, and return everyone who has.
+
+        Unlike the saved attendance this is read even with use_saved off: it is
+        what staff did to the class, not a cache.
+        """
+        with self.lock, self.connection:
+            row = self.connection.execute(
+                "SELECT names FROM class_names WHERE program_id = ? AND session_id = ? AND day_id = ?",
+                (program_id, session_id, day_id),
+            ).fetchone()
+            if row is not None:
+                self.connection.executemany(
+                    "INSERT OR IGNORE INTO removed_students (program_id, session_id, day_id, name_key, removed_at) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    [(program_id, session_id, day_id, name_key, time.time())
+                     for name_key in set(json.loads(row[0])) - set(roster_names)],
+                )
+            rows = self.connection.execute(
+                "SELECT name_key FROM removed_students WHERE program_id = ? AND session_id = ? AND day_id = ?",
+                (program_id, session_id, day_id),
+            ).fetchall()
+        return {name_key for name_key, in rows}
+
+    def all_snapshots(self) -> list:
+        """Every saved roster as a dict, oldest first"""
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT program_id, session_id, day_id, program_name, day_name, roster, finished, scraped_at "
+                "FROM snapshots ORDER BY scraped_at"
+            ).fetchall()
+        keys = ("program_id", "session_id", "day_id", "program_name", "day_name", "roster", "finished", "scraped_at")
+        snapshots = [dict(zip(keys, row)) for row in rows]
+        for snapshot in snapshots:
+            snapshot["roster"] = json.loads(snapshot["roster"])
+            snapshot["finished"] = bool(snapshot["finished"])
+        return snapshots
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
@@ -0,0 +1,169 @@
+"""Lightweight timing spans for the navigation and registration steps.
+
+Wrap a step with `with span("select_session", session_id=...)` or decorate a
+helper with `@traced("select_session")`. Spans nest per thread and inherit the
+program/day/student attributes of the span they run inside. At the end of a
+run they can be written as JSONL or Chrome trace events (open the latter in
+chrome://tracing or Perfetto) and summarized as p50/p95 latency per step.
+Counter tracks (`TRACER.counter("governor", limit=...)`) record values that
+change over the run and are drawn as graphs in the Chrome trace.
+"""
+from contextlib import contextmanager
+import functools
+import inspect
+import json
+import math
+import os
+import threading
+import time
+
+
+# Arguments copied onto a span when a traced helper is called with them, and their span attribute
+SPAN_ARGUMENTS = {
+    "program_id": "program_id",
+    "session_id": "session_id",
+    "day_id": "day_id",
+    "program_name": "program",
+    "day_name": "day",
+    "student_name": "student",
+}
+
+class Tracer:
+    """Collects finished spans from every thread of a run"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.spans = []
+        self.counters = []
+        self.local = threading.local()
+        self.started = time.perf_counter()
+        self.epoch = time.time()
+
+    def _stack(self) -> list:
+        if not hasattr(self.local, "stack"):
+            self.local.stack = []
+        return self.local.stack
+
+    @contextmanager
+    def span(self, name: str, **attrs):
+        stack = self._stack()
+        # Child spans carry the program/day/student of the span they run inside
+        inherited = dict(stack[-1]["attrs"]) if stack else {}
+        inherited.update({key: value for key, value in attrs.items() if value is not None})
+        record = {"name": name, "attrs": inherited, "start": time.perf_counter(),
+                  "thread": threading.get_ident(), "depth": len(stack)}
+        stack.append(record)
+        try:
+            yield record["attrs"]
+        except BaseException as e:
+            record["attrs"]["error"] = type(e).__name__
+            raise
+        finally:
+            stack.pop()
+            record["duration"] = time.perf_counter() - record["start"]
+            with self.lock:
+                self.spans.append(record)
+
+    def counter(self, name: str, **values):
+        """Record the current values of a counter track"""
+        record = {"name": name, "start": time.perf_counter(), "values": values}
+        with self.lock:
+            self.counters.append(record)
+
+    def snapshot(self) -> list:
+        with self.lock:
+            return list(self.spans)
+
+    def counter_snapshot(self) -> list:
+        with self.lock:
+            return list(self.counters)
+
+    def write_jsonl(self, path: str):
+        """One span per line, with wall-clock start times"""
+        with open(path, "w", encoding="utf-8") as spans_file:
+            for record in self.snapshot():
+                spans_file.write(json.dumps({
+                    "name": record["name"],
+                    "start": self.epoch + record["start"] - self.started,
+                    "duration_ms": round(record["duration"] * 1000, 3),
+                    "thread": record["thread"],
+                    **record["attrs"],
+                }) + "\n")
+            for record in self.counter_snapshot():
+                spans_file.write(json.dumps({
+                    "name": record["name"],
+                    "start": self.epoch + record["start"] - self.started,
+                    "counter": record["values"],
+                }) + "\n")
+
+    def write_chrome_trace(self, path: str):
+        """Chrome trace-event format ('X' complete and 'C' counter events, microseconds)"""
+        events = [{
+            "name": record["name"],
+            "ph": "X",
+            "ts": round((record["start"] - self.started) * 1e6),
+            "dur": round(record["duration"] * 1e6),
+            "pid": os.getpid(),
+            "tid": record["thread"],
+            "args": record["attrs"],
+        } for record in self.snapshot()]
+        events.extend({
+            "name": record["name"],
+            "ph": "C",
+            "ts": round((record["start"] - self.started) * 1e6),
+            "pid": os.getpid(),
+            "args": record["values"],
+        } for record in self.counter_snapshot())
+        with open(path, "w", encoding="utf-8") as trace_file:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, trace_file)
+
+    def summary(self) -> list:
+        """(name, count, p50 ms, p95 ms, total s) per step, slowest total first"""
+        durations = {}
+        for record in self.snapshot():
+            durations.setdefault(record["name"], []).append(record["duration"])
+        rows = []
+        for name, values in durations.items():
+            values.sort()
+            rows.append((name, len(values), percentile(values, 50) * 1000, percentile(values, 95) * 1000, sum(values)))
+        return sorted(rows, key=lambda row: row[4], reverse=True)
+
+    def print_summary(self):
+        rows = self.summary()
+        if not rows:
+            return
+        print("\n=== Step Timings ===")
+        print(f"  {'step':<28} {'count':>6} {'p50 ms':>9} {'p95 ms':>9} {'total s':>9}")
+        for name, count, p50, p95, total in rows:
+            print(f"  {name:<28} {count:>6} {p50:>9.1f} {p95:>9.1f} {total:>9.2f}")
+
+def percentile(sorted_values: list, pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = min(len(sorted_values) - 1, max(0, math.ceil(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+TRACER = Tracer()
+
+def span(name: str, **attrs):
+    """Time a block of code as a span of the run's tracer"""
+    return TRACER.span(name, **attrs)
+
+def traced(name: str = None):
+    """Decorator that times every call of a helper, copying its program/day/student arguments"""
+    def decorate(function):
+        signature = inspect.signature(function)
+        wanted = [argument for argument in SPAN_ARGUMENTS if argument in signature.parameters]
+        span_name = name or function.__name__
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            attrs = {}
+            if wanted:
+                bound = signature.bind_partial(*args, **kwargs)
+                attrs = {SPAN_ARGUMENTS[argument]: bound.arguments.get(argument) for argument in wanted}
+            with TRACER.span(span_name, **attrs):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorate
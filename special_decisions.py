@@ -0,0 +1,106 @@
+"""Special enrollment decisions, made before the browser starts.
+
+Students on the special enrollment sheet used to stop the run with a y/n
+prompt in the middle of registering, so an unattended run could sit at the
+prompt until the site logged it out. Now every planned student is matched
+against the sheet up front, the open questions are asked together (or read
+from a decisions file filled in beforehand), and the registration pass only
+looks the answers up. Students still without an answer are not registered and
+are listed in the final summary.
+
+The decisions file is a JSON list of entries such as
+    {"student": "Jane Doe", "program": "Jr. Tennis", "day": "Monday", "enroll": false}
+Leave out program and day to apply an answer to every class of the student.
+"""
+import json
+
+from attendance import format_student_name, match_special_enrollment, special_enrollment_index, special_enrollment_key
+
+
+class SpecialDecisions:
+    """Enroll/skip answers for students on the special enrollment sheet"""
+
+    def __init__(self, path: str = None, index: dict = None):
+        self.path = path
+        self.index = special_enrollment_index() if index is None else index
+        self.entries = []
+        self.decisions = {}  # (program, day, student key) -> enroll; program/day None for every class
+        if path:
+            self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, encoding="utf-8") as decisions_file:
+                entries = json.load(decisions_file)
+        except FileNotFoundError:
+            return
+        for entry in entries:
+            self._apply(entry)
+
+    def _apply(self, entry: dict):
+        self.entries.append(entry)
+        key = (entry.get("program"), entry.get("day"), special_enrollment_key(entry["student"]))
+        self.decisions[key] = bool(entry["enroll"])
+
+    def match(self, student_name: str, day_name: str):
+        """The sheet row that applies to a student in a class, or None"""
+        return match_special_enrollment(self.index, student_name, day_name)
+
+    def lookup(self, program_name: str, day_name: str, student_name: str):
+        """True to enroll, False to skip, None when nobody has decided yet"""
+        student_key = special_enrollment_key(student_name)
+        for key in ((program_name, day_name, student_key), (None, None, student_key)):
+            if key in self.decisions:
+                return self.decisions[key]
+        return None
+
+    def pending(self, classes: list) -> list:
+        """(program, day, student, sheet row) for every sheet student in classes still needing an answer.
+
+        classes is a list of (program_name, day_name, student_names).
+        """
+        questions = []
+        for program_name, day_name, student_names in classes:
+            for student_name in student_names:
+                entry = self.match(student_name, day_name)
+                if entry is not None and self.lookup(program_name, day_name, student_name) is None:
+                    questions.append((program_name, day_name, student_name, entry))
+        return questions
+
+    def ask(self, questions: list):
+        """Ask every open question in one sitting and remember the answers"""
+        print(f"\n{len(questions)} student(s) on the special enrollment spreadsheet need a decision:")
+        for program_name, day_name, student_name, entry in questions:
+            note = f" ({entry['comment']})" if entry["comment"] else ""
+            print(f"  {program_name} - {day_name}: {format_student_name(student_name)}{note}")
+        print("Answer y to enroll as normal, n to skip, or press Enter to decide later.")
+        for program_name, day_name, student_name, _ in questions:
+            while True:
+                user_input = input(f"  Enroll {format_student_name(student_name)} in {program_name} - {day_name}? (y/n): ").strip().lower()
+                if user_input in ('y', 'n'):
+                    self._apply({"student": format_student_name(student_name), "program": program_name,
+                                 "day": day_name, "enroll": user_input == 'y'})
+                    break
+                if user_input == '':
+                    break
+
+    def save(self):
+        if not self.path:
+            return
+        with open(self.path, "w", encoding="utf-8") as decisions_file:
+            json.dump(self.entries, decisions_file, indent=2)
+
+    def screen(self, student_names: list, program_name: str, day_name: str) -> tuple:
+        """Split a class's students into (to_register, held); held is (name, "skipped" or "pending")"""
+        to_register = []
+        held = []
+        for student_name in student_names:
+            if self.match(student_name, day_name) is None:
+                to_register.append(student_name)
+                continue
+            decision = self.lookup(program_name, day_name, student_name)
+            if decision:
+                to_register.append(student_name)
+            else:
+                held.append((student_name, "pending" if decision is None else "skipped"))
+        return to_register, held
@@ -0,0 +1,552 @@
+"""Regression tests that run against mock_clubautomation.py; no browser or network needed.
+
+    python -m unittest test_registration
+"""
+from contextlib import redirect_stdout
+from types import SimpleNamespace
+from unittest import mock
+import csv
+import io
+import json
+import os
+import tempfile
+import threading
+import unittest
+
+import requests
+
+from account_cache import AccountCache
+from analytics import parse_rule
+from attendance import (
+    format_student_name, normalize_name, parse_attendance_html, parse_attendance_rows, plan_registrations, roster_name_set,
+)
+from governor import SLOW_STREAK, Governor
+from http_engine import HttpEngine
+from main import preflight, process_programs, process_programs_pipelined, scrape_classes, watch_cycle
+from mock_clubautomation import find_day, make_club, render_attendance, start_server
+from result_sink import ResultSink
+from retries import ACCOUNT_NOT_FOUND, ATTENDANCE_NOT_READ, CLASS_NOT_OPENED
+from run_journal import RunJournal, read_failures
+from snapshot_store import SnapshotStore
+from special_decisions import SpecialDecisions
+from waitlist_promotion import WaitlistPromotion
+
+
+DAY = {
+    "id": "1",
+    "name": "Monday",
+    "students": [
+        {"name": "Ann Lee", "phone": "555-0100", "dates": [True, False, True, True]},
+        {"name": "Bo Park", "phone": "", "dates": [False, False, False, True]},
+    ],
+    "waitlist": ["Cy Wait"],
+    "makeup": ["Di Makeup"],
+}
+
+class AttendanceParsingTest(unittest.TestCase):
+
+    def test_sections(self):
+        rows = parse_attendance_html(render_attendance(DAY))
+        roster = parse_attendance_rows(rows)
+        self.assertEqual([student["name"] for student in roster["students"]], ["Ann Lee", "Bo Park"])
+        self.assertEqual([student["present_count"] for student in roster["students"]], [3, 1])
+        self.assertEqual(roster["students"][0]["phone"], "555-0100")
+        self.assertEqual(roster["students"][1]["phone"], "No phone number available")
+        self.assertEqual(roster["waitlist"], ["Cy Wait"])
+        self.assertEqual(roster["makeup"], ["Di Makeup"])
+        # Everyone on the table counts as already in the class, whatever the section
+        self.assertEqual(roster_name_set(rows), {"ann lee", "bo park", "cy wait", "di makeup"})
+
+    def test_plan_registrations(self):
+        to_register, already = plan_registrations(["Lee, Ann", "Eve Stone", "Fay Moss"], {"ann lee"}, skip=["Moss, Fay"])
+        self.assertEqual(to_register, ["Eve Stone"])
+        self.assertEqual(already, ["Lee, Ann"])
+
+class RuleTest(unittest.TestCase):
+
+    def test_parse_rule(self):
+        self.assertEqual(parse_rule("present < 3"), ("present", "<", 3.0))
+        self.assertEqual(parse_rule("rate<0.5"), ("rate", "<", 0.5))
+        self.assertEqual(parse_rule("trailing_absences >= 2"), ("trailing_absences", ">=", 2.0))
+        with self.assertRaises(ValueError):
+            parse_rule("attendance is low")
+
+class HttpEngineTest(unittest.TestCase):
+
+    def setUp(self):
+        self.club = make_club(programs=1, students=4)
+        self.server, base_url = start_server(self.club)
+        self.engine = HttpEngine(base_url)
+        with redirect_stdout(io.StringIO()):
+            self.engine.login("test", "test")
+        program_id = self.engine.list_programs()[0][0]
+        session_id = self.engine.list_sessions(program_id)[-1][0]
+        self.day_id = self.engine.list_days(program_id, session_id)[0][0]
+        self.class_ids = (program_id, session_id, self.day_id)
+        # Last month's students not yet on this month's roster
+        previous_day = self.club["programs"][0]["sessions"][-2]["days"][0]
+        enrolled = {student["name"] for student in find_day(self.club, self.day_id)["students"]}
+        self.missing = [student["name"] for student in previous_day["students"] if student["name"] not in enrolled]
+
+    def tearDown(self):
+        self.engine.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def register(self, names):
+        self.assertTrue(self.engine.open_class(*self.class_ids))
+        with redirect_stdout(io.StringIO()), mock.patch("retries.backoff_delay", return_value=0):
+            return self.engine.register_students(names, "Jr. Tennis Level 1", "Monday")
+
+    def test_registers_missing_students(self):
+        results = self.register(self.missing)
+        self.assertEqual(results, [(name, None) for name in self.missing])
+        roster = {student["name"] for student in find_day(self.club, self.day_id)["students"]}
+        self.assertTrue(set(self.missing) <= roster)
+
+    def test_retries_server_errors(self):
+        # The first search for each student fails with a 503
+        searches = []
+        def flaky(handler, path):
+            if path != "/event/register-user-search":
+                return False
+            searches.append(path)
+            return len(searches) % 2 == 1
+        with mock.patch("mock_clubautomation.MockHandler._flaky", flaky):
+            results = self.register(self.missing[:2])
+        self.assertEqual(results, [(name, None) for name in self.missing[:2]])
+        self.assertEqual(len(searches), 4)
+
+    def test_unknown_account_is_not_retried(self):
+        with mock.patch.object(self.engine, "try_register", wraps=self.engine.try_register) as attempts:
+            results = self.register(["Nobody Known"])
+        self.assertEqual(results, [("Nobody Known", ACCOUNT_NOT_FOUND)])
+        self.assertEqual(attempts.call_count, 1)
+
+class MockClubTestCase(unittest.TestCase):
+    """A mock club served for each test, logged-in HttpEngine sessions on it and a scratch folder"""
+
+    programs = 2
+
+    def setUp(self):
+        self.club = make_club(programs=self.programs, students=4)
+        self.server, self.base_url = start_server(self.club)
+        self.engines = []
+        self.folder = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        for engine in self.engines:
+            engine.close()
+        self.server.shutdown()
+        self.server.server_close()
+        self.folder.cleanup()
+
+    def make_engine(self):
+        engine = HttpEngine(self.base_url)
+        with redirect_stdout(io.StringIO()):
+            engine.login("test", "test")
+        self.engines.append(engine)
+        return engine
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.folder.name, name)
+
+    def last_month(self, program: int = 0, day: int = 0) -> list:
+        return [student["name"] for student in self.club["programs"][program]["sessions"][-2]["days"][day]["students"]]
+
+class SnapshotStoreTest(MockClubTestCase):
+
+    def scrape(self, store) -> mock.MagicMock:
+        """Scrape every program with a fresh session; returns the spy on its read_attendance"""
+        engine = self.make_engine()
+        with mock.patch.object(engine, "read_attendance", wraps=engine.read_attendance) as read, \
+                redirect_stdout(io.StringIO()):
+            process_programs(engine, store=store, register=False, summary=False)
+        return read
+
+    def test_finished_months_are_scraped_once(self):
+        store = SnapshotStore(self.path("snapshots.db"))
+        self.assertEqual(self.scrape(store).call_count, 4)
+        self.assertEqual(self.scrape(store).call_count, 0)
+        program = self.club["programs"][0]
+        previous = program["sessions"][-2]
+        snapshot = store.get(program["id"], previous["id"], previous["days"][0]["id"])
+        self.assertEqual([student["name"] for student in snapshot["students"]], self.last_month())
+        store.close()
+        # --refresh scrapes again, but still saves
+        refresh = SnapshotStore(self.path("snapshots.db"), use_saved=False)
+        self.assertEqual(self.scrape(refresh).call_count, 4)
+        refresh.close()
+
+    def test_empty_rosters_are_not_saved(self):
+        self.club["programs"][0]["sessions"][-2]["days"][0]["students"] = []
+        store = SnapshotStore(self.path("snapshots.db"))
+        self.scrape(store)
+        # The empty class may be a page that did not load, so it is read again next time
+        self.assertEqual(self.scrape(store).call_count, 1)
+        store.close()
+
+class ResumeTest(MockClubTestCase):
+
+    def test_resume_skips_finished_work(self):
+        engine = self.make_engine()
+        journal = RunJournal(self.path("journal.jsonl"))
+        register = engine.register_students
+        def crash_in_second_program(names, program_name, day_name):
+            if program_name == "Jr. Tennis Level 2":
+                raise RuntimeError("Chrome crashed")
+            return register(names, program_name, day_name)
+        with mock.patch.object(engine, "register_students", crash_in_second_program), \
+                redirect_stdout(io.StringIO()), self.assertRaises(RuntimeError):
+            process_programs(engine, journal=journal)
+        journal.close()
+
+        engine = self.make_engine()
+        journal = RunJournal(self.path("journal.jsonl"), resume=True)
+        with mock.patch.object(engine, "read_attendance", wraps=engine.read_attendance) as read, \
+                redirect_stdout(io.StringIO()) as output:
+            _, failures = process_programs(engine, journal=journal)
+        journal.close()
+        self.assertEqual(failures, [])
+        self.assertIn("Skipping Jr. Tennis Level 1 (finished in the previous run)", output.getvalue())
+        # Both programs were scraped before the crash, so nothing is read again
+        read.assert_not_called()
+        roster = {student["name"] for student in self.club["programs"][1]["sessions"][-1]["days"][0]["students"]}
+        self.assertTrue(set(self.last_month(program=1)) <= roster)
+        self.assertEqual(read_failures(self.path("journal.jsonl")), [])
+
+    def test_report_lists_the_last_outcome_of_each_registration(self):
+        journal = RunJournal(self.path("journal.jsonl"))
+        entry = {"program_id": "1", "day_id": "2", "program": "Jr. Tennis", "day": "Monday"}
+        journal.record("register", student="Ann Lee", status="failed", failure="timeout", **entry)
+        journal.record("register", student="Ann Lee", status="ok", **entry)
+        journal.record("register", student="Bo Park", status="failed", failure="ambiguous_account", **entry)
+        journal.record("register", student="Cy Wait", status="pending", **entry)
+        journal.close()
+        self.assertEqual([(failure["student"], failure.get("failure")) for failure in read_failures(self.path("journal.jsonl"))],
+                         [("Bo Park", "ambiguous_account"), ("Cy Wait (special enrollment decision needed)", None)])
+
+class PreflightTest(MockClubTestCase):
+
+    def test_scrape_is_shared_across_sessions(self):
+        engine = self.make_engine()
+        journal = RunJournal(self.path("journal.jsonl"))
+        with redirect_stdout(io.StringIO()):
+            classes = scrape_classes(engine, self.make_engine, 2, journal=journal)
+        journal.close()
+        # One extra session scraped the second program, and the classes come back in program order
+        self.assertEqual(len(self.engines), 2)
+        self.assertEqual([(program, day) for program, day, _ in classes],
+                         [(f"Jr. Tennis Level {p}", day) for p in (1, 2) for day in ("Monday", "Wednesday")])
+        self.assertEqual(classes[0][2], self.last_month())
+        # The registration pass takes the rosters from the journal instead of scraping again
+        self.assertEqual(len(RunJournal(self.path("journal.jsonl"), resume=True).scrapes), 4)
+
+    def test_questions_are_about_this_runs_rosters(self):
+        with redirect_stdout(io.StringIO()):
+            classes = scrape_classes(self.make_engine())
+        student = self.last_month()[0]
+        index = {normalize_name(format_student_name(student)): [{"name": student, "days": [], "comment": ""}]}
+        decisions = SpecialDecisions(self.path("decisions.json"), index=index)
+        self.assertEqual(preflight(decisions, classes, interactive=False), 1)
+        with redirect_stdout(io.StringIO()), mock.patch("builtins.input", return_value="n"):
+            self.assertEqual(preflight(decisions, classes), 0)
+        with open(self.path("decisions.json"), encoding="utf-8") as decisions_file:
+            self.assertFalse(json.load(decisions_file)[0]["enroll"])
+        self.assertEqual(decisions.screen([student], "Jr. Tennis Level 1", "Monday"), ([], [(student, "skipped")]))
+
+class AccountCacheTest(MockClubTestCase):
+
+    programs = 1
+
+    def setUp(self):
+        super().setUp()
+        self.accounts = AccountCache(self.path("accounts.db"))
+        self.engine = self.make_engine()
+        self.engine.accounts = self.accounts
+        program = self.club["programs"][0]
+        self.day = program["sessions"][-1]["days"][0]
+        self.class_ids = (program["id"], program["sessions"][-1]["id"], self.day["id"])
+        enrolled = {student["name"] for student in self.day["students"]}
+        self.student = next(name for name in self.last_month() if name not in enrolled)
+
+    def tearDown(self):
+        self.accounts.close()
+        super().tearDown()
+
+    def register(self):
+        self.assertTrue(self.engine.open_class(*self.class_ids))
+        with redirect_stdout(io.StringIO()), mock.patch("retries.backoff_delay", return_value=0):
+            return self.engine.register_students([self.student], "Jr. Tennis Level 1", "Monday")
+
+    def drop(self):
+        self.day["students"] = [student for student in self.day["students"] if student["name"] != self.student]
+
+    def searches(self):
+        return mock.patch.object(self.engine, "_get", wraps=self.engine._get)
+
+    def test_saved_account_skips_the_search(self):
+        self.assertEqual(self.register(), [(self.student, None)])
+        self.assertIsNotNone(self.accounts.get(self.student))
+        # Next month: the same student is added from the saved account
+        self.drop()
+        with self.searches() as get:
+            self.assertEqual(self.register(), [(self.student, None)])
+        self.assertNotIn("user_search", [call.args[0] for call in get.call_args_list])
+        self.assertEqual(self.accounts.stats["hits"], 1)
+
+    def test_wrong_saved_account_is_dropped_and_searched_again(self):
+        self.accounts.put(self.student, "404404", self.student)
+        with self.searches() as get:
+            self.assertEqual(self.register(), [(self.student, None)])
+        self.assertIn("user_search", [call.args[0] for call in get.call_args_list])
+        self.assertEqual(self.accounts.stats["invalidated"], 1)
+        self.assertNotEqual(self.accounts.get(self.student)[0], "404404")
+
+class PipelineTest(MockClubTestCase):
+
+    programs = 3
+
+    def pipeline(self, make_engine=None):
+        with redirect_stdout(io.StringIO()):
+            return process_programs_pipelined(self.make_engine(), make_engine or self.make_engine, depth=1)
+
+    def test_registers_every_program_in_order(self):
+        all_names, failures = self.pipeline()
+        self.assertEqual(failures, [])
+        self.assertEqual(list(all_names), [program["name"] for program in self.club["programs"]])
+        for p, program in enumerate(self.club["programs"]):
+            roster = {student["name"] for student in program["sessions"][-1]["days"][0]["students"]}
+            self.assertTrue(set(self.last_month(program=p)) <= roster)
+
+    def test_scraper_is_drained_when_registration_stops(self):
+        def broken_register_session():
+            engine = self.make_engine()
+            engine.list_sessions = mock.Mock(side_effect=RuntimeError("register session lost"))
+            return engine
+        with self.assertRaises(RuntimeError):
+            self.pipeline(broken_register_session)
+        # The scraper was blocked on the full queue; it must not be left running
+        self.assertNotIn("scrape-stage", [thread.name for thread in threading.enumerate()])
+
+    def test_programs_after_a_scrape_error_are_reported(self):
+        engine = self.make_engine()
+        list_days = engine.list_days
+        def fail_second_program(program_id, session_id):
+            if program_id == self.club["programs"][1]["id"]:
+                raise RuntimeError("scrape session lost")
+            return list_days(program_id, session_id)
+        engine.list_days = fail_second_program
+        with redirect_stdout(io.StringIO()):
+            _, failures = process_programs_pipelined(engine, self.make_engine, depth=1)
+        self.assertEqual([failure["program"] for failure in failures], ["Jr. Tennis Level 2", "Jr. Tennis Level 3"])
+
+class WaitlistPromotionTest(MockClubTestCase):
+
+    programs = 1
+
+    def test_open_spots_are_counted_after_the_continuing_students(self):
+        promotion = WaitlistPromotion(capacity=5)
+        promotion.collect("Jr. Tennis", "Monday", ["Park, Bo", "Cy Wait", "Di Wait"])
+        # Bo is already on the roster and Eve is continuing, so neither takes a waitlist spot
+        promoted, waiting = promotion.promote("Jr. Tennis", "Monday", 3, ["Eve Stone"], {"bo park"})
+        self.assertEqual((promoted, waiting), (["Cy Wait"], ["Di Wait"]))
+        self.assertEqual(promotion.promote("Jr. Tennis", "Monday", 5, [], set()), ([], ["Park, Bo", "Cy Wait", "Di Wait"]))
+
+    def test_waitlisted_students_are_registered_in_the_same_pass(self):
+        day = self.club["programs"][0]["sessions"][-1]["days"][0]
+        waitlist = self.club["programs"][0]["sessions"][-2]["days"][0]["waitlist"]
+        # Two of the four continuing students are already on the roster; one spot is left after the other two
+        promotion = WaitlistPromotion(capacity=5)
+        engine = self.make_engine()
+        with mock.patch.object(engine, "open_class", wraps=engine.open_class) as open_class, \
+                redirect_stdout(io.StringIO()):
+            _, failures = process_programs(engine, summary=False, promotion=promotion)
+        self.assertEqual(failures, [])
+        roster = [student["name"] for student in day["students"]]
+        self.assertEqual(len(roster), 5)
+        self.assertIn(waitlist[0], roster)
+        self.assertNotIn(waitlist[1], roster)
+        # One visit per class: promoting needs no extra page load
+        self.assertEqual(open_class.call_count, 2)
+
+class ResultSinkTest(MockClubTestCase):
+
+    def test_results_are_streamed_instead_of_kept(self):
+        sink = ResultSink(self.path("results.jsonl"), self.path("results.csv"))
+        with redirect_stdout(io.StringIO()):
+            all_names, failures = process_programs(self.make_engine(), summary=False, sink=sink)
+        sink.close()
+        # The summary no longer holds the names; the files do
+        self.assertEqual((all_names, failures), ({}, []))
+        with open(self.path("results.jsonl"), encoding="utf-8") as results_file:
+            events = [json.loads(line) for line in results_file]
+        rosters = [event for event in events if event["event"] == "roster"]
+        self.assertEqual(len(rosters), 4)
+        self.assertEqual(rosters[0]["detail"], self.last_month())
+        self.assertEqual(rosters[0]["waitlist"], self.club["programs"][0]["sessions"][-2]["days"][0]["waitlist"])
+        registrations = {(event["day"], event["student"]): event["status"] for event in events
+                         if event["event"] == "registration" and event["program"] == "Jr. Tennis Level 1"}
+        self.assertEqual(set(registrations.values()), {"ok", "already_registered"})
+        self.assertEqual({student for day, student in registrations if day == "Monday"}, set(self.last_month()))
+        with open(self.path("results.csv"), newline="", encoding="utf-8") as results_csv:
+            rows = list(csv.DictReader(results_csv))
+        self.assertEqual(len(rows), len(events))
+        self.assertEqual(rows[0]["detail"], "; ".join(self.last_month()))
+
+class WatchTest(MockClubTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.engine = self.make_engine()
+        self.store = SnapshotStore(self.path("snapshots.db"))
+        with redirect_stdout(io.StringIO()):
+            process_programs(self.engine, store=self.store, summary=False)
+
+    def tearDown(self):
+        self.store.close()
+        super().tearDown()
+
+    def watch(self):
+        with redirect_stdout(io.StringIO()) as output:
+            self.assertEqual(watch_cycle(self.engine, self.store), [])
+        return output.getvalue()
+
+    def test_unchanged_classes_are_not_revisited(self):
+        with mock.patch.object(self.engine, "register_students", wraps=self.engine.register_students) as register:
+            output = self.watch()
+        self.assertIn("0 class(es) had changed", output)
+        register.assert_not_called()
+
+    def test_student_removed_by_staff_is_not_added_back(self):
+        day = self.club["programs"][1]["sessions"][-1]["days"][0]
+        removed = self.last_month(program=1)[0]
+        day["students"] = [student for student in day["students"] if student["name"] != removed]
+        output = self.watch()
+        self.assertIn("1 class(es) had changed", output)
+        self.assertIn(f"Not adding back {removed}", output)
+        self.assertNotIn(removed, {student["name"] for student in day["students"]})
+        # The class is settled again, so the next check leaves it alone
+        self.assertIn("0 class(es) had changed", self.watch())
+
+    def test_class_without_saved_names_is_filled_in(self):
+        # Without the names a class was left with (a store from before they were saved) nobody counts as removed
+        day = self.club["programs"][0]["sessions"][-1]["days"][1]
+        self.store.connection.execute("DELETE FROM class_names")
+        day["students"] = day["students"][:1]
+        self.assertIn("1 class(es) had changed", self.watch())
+        self.assertTrue(set(self.last_month(day=1)) <= {student["name"] for student in day["students"]})
+
+def fail_class(engine, method: str, day_id: str, times: int):
+    """Make engine.<method> fail for one day the first `times` calls for it, like a page that does not load"""
+    real = getattr(engine, method)
+    calls = []
+    def flaky(program_id, session_id, class_day_id, *args):
+        if class_day_id == day_id and len(calls) < times:
+            calls.append(class_day_id)
+            return None if method == "read_attendance" else False
+        return real(program_id, session_id, class_day_id, *args)
+    return mock.patch.object(engine, method, flaky)
+
+class RetryPassTest(MockClubTestCase):
+    """Classes that do not open or scrape go to the end-of-run pass like failed registrations"""
+
+    programs = 1
+
+    def setUp(self):
+        super().setUp()
+        self.engine = self.make_engine()
+        self.this_month = self.club["programs"][0]["sessions"][-1]["days"][0]
+        self.previous_month = self.club["programs"][0]["sessions"][-2]["days"][0]
+
+    def run_programs(self):
+        with redirect_stdout(io.StringIO()), mock.patch("retries.backoff_delay", return_value=0):
+            return process_programs(self.engine, summary=False)[1]
+
+    def roster(self) -> set:
+        return {student["name"] for student in self.this_month["students"]}
+
+    def test_class_that_opens_on_retry_is_registered(self):
+        with fail_class(self.engine, "open_class", self.this_month["id"], times=1):
+            failures = self.run_programs()
+        self.assertEqual(failures, [])
+        self.assertTrue(set(self.last_month()) <= self.roster())
+
+    def test_class_that_never_opens_lists_its_students(self):
+        with fail_class(self.engine, "open_class", self.this_month["id"], times=2):
+            failures = self.run_programs()
+        # Without the roster nobody can be ruled out, so the whole class is listed
+        self.assertEqual({failure["student"] for failure in failures}, set(self.last_month()))
+        self.assertEqual({failure["failure"] for failure in failures}, {CLASS_NOT_OPENED})
+
+    def test_class_whose_attendance_loads_on_retry_is_registered(self):
+        with fail_class(self.engine, "read_attendance", self.previous_month["id"], times=1):
+            failures = self.run_programs()
+        self.assertEqual(failures, [])
+        self.assertTrue(set(self.last_month()) <= self.roster())
+
+    def test_class_whose_attendance_never_loads_is_listed(self):
+        with fail_class(self.engine, "read_attendance", self.previous_month["id"], times=2):
+            failures = self.run_programs()
+        self.assertEqual([(failure["day"], failure["failure"]) for failure in failures], [("Monday", ATTENDANCE_NOT_READ)])
+
+def refused(status: int) -> requests.HTTPError:
+    return requests.HTTPError(response=SimpleNamespace(status_code=status, headers={}))
+
+class GovernorTest(unittest.TestCase):
+
+    def test_grows_back_after_clean_calls(self):
+        governor = Governor(4)
+        governor.limit = 2.0
+        for _ in range(20):
+            with governor.slot("call"):
+                pass
+        self.assertGreater(governor.limit, 2.0)
+        self.assertLessEqual(governor.limit, 4.0)
+
+    def test_halves_on_refusal(self):
+        governor = Governor(4)
+        with self.assertRaises(requests.HTTPError):
+            with governor.slot("call"):
+                raise refused(429)
+        self.assertEqual(governor.limit, 2.0)
+        self.assertEqual(governor.stats["overloads"], 1)
+
+    def test_ignores_errors_that_are_not_overload(self):
+        governor = Governor(4)
+        for error in (KeyError("name"), refused(404)):
+            with self.assertRaises(type(error)):
+                with governor.slot("call"):
+                    raise error
+        self.assertEqual(governor.limit, 4.0)
+        self.assertEqual(governor.stats["overloads"], 0)
+
+    def test_engine_timeouts_count_as_overload(self):
+        governor = Governor(4)
+        with self.assertRaises(requests.Timeout):
+            with governor.slot("call", (requests.Timeout,)):
+                raise requests.Timeout()
+        self.assertEqual(governor.limit, 2.0)
+
+    def test_only_sustained_slowness_lowers_the_limit(self):
+        governor = Governor(4)
+        clean = {"overload": False}
+        for _ in range(10):
+            governor._release("call", 0.05, clean)
+        for _ in range(SLOW_STREAK - 1):
+            governor._release("call", 1.0, clean)
+        self.assertEqual(governor.stats["decreases"], 0)
+        governor._release("call", 1.0, clean)
+        self.assertEqual(governor.stats["decreases"], 1)
+        self.assertEqual(governor.limit, 2.0)
+
+    def test_varied_healthy_latency_keeps_the_limit(self):
+        governor = Governor(3)
+        clean = {"overload": False}
+        for latency in [0.05, 0.25, 0.1, 0.2, 0.15] * 20:
+            governor._release("call", latency, clean)
+        self.assertEqual(governor.stats["decreases"], 0)
+        self.assertEqual(governor.limit, 3.0)
+
+if __name__ == "__main__":
+    unittest.main()
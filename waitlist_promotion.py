@@ -0,0 +1,37 @@
+"""Promote last month's waitlisted students into open spots of this month's class.
+
+The waitlist of every scraped class is kept while the run scrapes. When the
+run then registers that class, the open spots are the class capacity minus
+the students already on this month's roster and the continuing students about
+to be added; that many waitlisted students are registered in the same pass,
+so promoting them needs no extra visit to the attendance page.
+"""
+import threading
+
+from attendance import format_student_name, normalize_name
+
+
+class WaitlistPromotion:
+    """Last month's waitlists, and how many of them fit in this month's classes"""
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.lock = threading.Lock()
+        self.waitlists = {}  # (program_name, day_name) -> waitlisted names, in waitlist order
+
+    def collect(self, program_name: str, day_name: str, waitlist: list):
+        with self.lock:
+            self.waitlists[(program_name, day_name)] = list(waitlist)
+
+    def promote(self, program_name: str, day_name: str, enrolled_count: int, continuing: list, roster_names: set) -> tuple:
+        """(students to promote, students still waiting) for a class with enrolled_count on its roster.
+
+        continuing are the students about to be registered; waitlisted students
+        already on the roster or among them take no spot.
+        """
+        with self.lock:
+            waitlist = self.waitlists.get((program_name, day_name), [])
+        taken = set(roster_names) | {normalize_name(format_student_name(name)) for name in continuing}
+        candidates = [name for name in waitlist if normalize_name(format_student_name(name)) not in taken]
+        open_spots = max(0, self.capacity - enrolled_count - len(continuing))
+        return candidates[:open_spots], candidates[open_spots:]